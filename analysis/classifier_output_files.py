@@ -0,0 +1,56 @@
+"""
+Functions to read the files with the classifier output produced by the classifier algorithms.
+Files with extension .bin are in the binary format described in module classifier/classifier_output.py,
+files with extension .yaml are the aggregates of a run described in module classifier/aggregates.py,
+any other file is in the CSV format.
+"""
+import numpy
+import yaml
+
+"""Record of the binary classifier output files, the same as classifier_output.RECORD_DTYPE."""
+RECORD_DTYPE = numpy.dtype ([
+    ('predicted.class', '<i1'),
+    ('real.class', '<i1'),
+    ('run', '<i4'),
+])
+
+
+def is_binary (filename):
+    return filename.endswith ('.bin')
+
+
+def is_aggregates (filename):
+    return filename.endswith ('.yaml')
+
+
+def read_aggregates (filename):
+    """
+    Read the confusion matrix of an aggregates file, which has the layout of function classifier_output_matrix.
+    """
+    with open (filename, 'r') as fd:
+        dictionary = yaml.safe_load (fd)
+    return numpy.array (dictionary ['confusion.matrix'], dtype=numpy.int64)
+
+
+def read_binary (filename):
+    """
+    Read a binary classifier output file.
+    Class numbers start at one.  A predicted class number of zero means the classifier produced no output.
+    :return: a tuple with the arrays of predicted class numbers, real class numbers and repeat indexes.
+    """
+    records = numpy.fromfile (filename, dtype=RECORD_DTYPE)
+    return (
+        records ['predicted.class'].astype (int),
+        records ['real.class'].astype (int),
+        records ['run'].astype (int),
+    )
+
+
+def classifier_output_matrix (predicted, real, number_classes, dtype=numpy.int16):
+    """
+    Count how many records of each real class were assigned to each predicted class.
+    :return: a matrix with a row per real class and a column per predicted class plus a last column for no output.
+    """
+    result = numpy.zeros ((number_classes, number_classes + 1), dtype=dtype)
+    numpy.add.at (result, (real - 1, numpy.where (predicted == 0, number_classes, predicted - 1)), 1)
+    return result
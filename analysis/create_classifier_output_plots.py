@@ -6,6 +6,8 @@ import math
 import numpy
 import sys
 
+import classifier_output_files
+
 DECISION_TREE = 1
 NEURAL_NETWORK = 2
 GENETIC_PROGRAMING = 3
@@ -168,13 +170,25 @@ td.special { border: none 2pt }  /* The top-left cell */
     fd.close ()
 
 def read_neural_network_output (filename, number_classes):
+    if classifier_output_files.is_aggregates (filename):
+        result = classifier_output_files.read_aggregates (filename)
+        if result.shape != (number_classes, number_classes + 1):
+            print ('Neural network aggregates do not have {} classes!'.format (number_classes))
+            sys.exit (1)
+        return result
+    if classifier_output_files.is_binary (filename):
+        predicted, real, _runs = classifier_output_files.read_binary (filename)
+        if ((real < 1) | (real > number_classes) | (predicted < 0) | (predicted > number_classes)).any ():
+            print ('Neural network output does not have {} classes!'.format (number_classes))
+            sys.exit (1)
+        return classifier_output_files.classifier_output_matrix (predicted, real, number_classes)
     # read the data
     with open (filename, 'r') as fdr:
         reader = csv.DictReader (fdr, delimiter = ',', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
         data = [row for row in reader]
     # check the data
     for row in data:
-        if len (row) != 2 * number_classes:
+        if len ([key for key in row if key != 'run']) != 2 * number_classes:
             print ('Neural network output does not have {} classes! There is a row with {} values'.format (number_classes, len (row)))
             sys.exit (1)
     # compute the classifier output matrix
@@ -200,13 +214,27 @@ def read_neural_network_output (filename, number_classes):
     return result
 
 def read_decision_tree_output (filename, number_classes):
+    if classifier_output_files.is_aggregates (filename):
+        result = classifier_output_files.read_aggregates (filename)
+        if result.shape != (number_classes, number_classes + 1):
+            print ('Decision tree aggregates do not have {} classes!'.format (number_classes))
+            sys.exit (1)
+        return result
+    if classifier_output_files.is_binary (filename):
+        predicted, real, _runs = classifier_output_files.read_binary (filename)
+        if ((real < 1) | (real > number_classes) | (predicted < 1) | (predicted > number_classes)).any ():
+            print ('Decision tree output does not have {} classes!'.format (number_classes))
+            sys.exit (1)
+        result = classifier_output_files.classifier_output_matrix (predicted, real, number_classes)
+        print (result)
+        return result
     # read the data
     with open (filename, 'r') as fdr:
         reader = csv.DictReader (fdr, delimiter = ',', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
         data = [row for row in reader]
     # check the data
     for row in data:
-        if len (row) != 2 or not (1 <= row ['real.class'] <= number_classes) or not (1 <= row ['predicted.class'] <= number_classes):
+        if len ([key for key in row if key != 'run']) != 2 or not (1 <= row ['real.class'] <= number_classes) or not (1 <= row ['predicted.class'] <= number_classes):
             print ('Decision tree output does not have {} classes! There is a row with {} values'.format (number_classes, len (row)))
             sys.exit (1)
     # compute the classifier output matrix
@@ -0,0 +1,55 @@
+"""
+Functions to read the files with the decision trees produced by the decision tree classifier.
+Directories with extension .trees are the binary tree stores described in module classifier/tree_store.py,
+any other file is in the CSV format with a tree per row.
+"""
+import csv
+import os.path
+
+import numpy
+
+"""Record of the index of a tree store, the same as tree_store.INDEX_DTYPE."""
+INDEX_DTYPE = numpy.dtype ([
+    ('time', '<f8'),
+    ('run', '<i4'),
+    ('node.count', '<i4'),
+    ('offset', '<i8'),
+])
+
+"""Type of the node arrays of a tree store with the children and the features."""
+NODE_DTYPE = numpy.dtype ('<i4')
+
+
+def is_tree_store (filename):
+    return filename.rstrip (os.path.sep).endswith ('.trees')
+
+
+def read_trees (filename):
+    """
+    Read the trees of a CSV file or a tree store.
+    :return: an iterator over tuples with the arrays of left children, right children and features of each tree.
+    """
+    if is_tree_store (filename):
+        return _read_tree_store (filename)
+    else:
+        return _read_csv (filename)
+
+
+def _read_csv (filename):
+    with open (filename, 'r') as fd:
+        for row in csv.reader (fd, delimiter=',', quoting=csv.QUOTE_NONNUMERIC):
+            number_nodes = int (row [2])
+            nodes = numpy.array (row [3:3 + 3 * number_nodes], dtype=numpy.int64).reshape (3, number_nodes)
+            yield nodes [0], nodes [1], nodes [2]
+
+
+def _read_tree_store (directory):
+    index = numpy.fromfile (os.path.join (directory, 'index.bin'), dtype=INDEX_DTYPE)
+    arrays = [
+        numpy.fromfile (os.path.join (directory, name + '.bin'), dtype=NODE_DTYPE)
+        for name in ['children_left', 'children_right', 'feature']
+    ]
+    for record in index:
+        start = int (record ['offset'])
+        end = start + int (record ['node.count'])
+        yield tuple (array [start:end] for array in arrays)
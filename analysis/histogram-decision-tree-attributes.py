@@ -1,8 +1,14 @@
 import argparse
 import csv
+import functools
 import matplotlib.pyplot
+import multiprocessing
+import numpy
+import os
 import sklearn.tree._tree
 
+import decision_tree_files
+
 
 def plot_histogram (histogram, attribute_labels, suffix, max_depth):
     figure = matplotlib.pyplot.figure (
@@ -25,36 +31,71 @@ def plot_histogram (histogram, attribute_labels, suffix, max_depth):
     figure.savefig ('histogram{}.png'.format (suffix))
 
 
-def analyse_decision_trees (suffix, filenames, attribute_labels, max_depth):
-    number_attributes = len (attribute_labels)
-    histogram = [0] * number_attributes
-    for filename in filenames:
-        with open (filename, 'r') as fd:
-            # print ('Processing {}...'.format (filename))
-            freader = csv.reader (fd, delimiter=',', quoting=csv.QUOTE_NONNUMERIC)
-            for row in freader:
-                number_nodes = int (row [2])
-                depth = [0] * number_nodes
-                for index_node in range (number_nodes):
-                    child_left = int (row [3 + index_node])
-                    child_right = int (row [3 + index_node + number_nodes])
-                    attribute_index = int (row [3 + index_node + 2 * number_nodes])
-                    if child_left != sklearn.tree._tree.TREE_LEAF:
-                        depth [child_left] = depth [index_node] + 1
-                    if child_right != sklearn.tree._tree.TREE_LEAF:
-                        depth [child_right] = depth [index_node] + 1
-                    if (child_left != sklearn.tree._tree.TREE_LEAF or child_right != sklearn.tree._tree.TREE_LEAF) \
-                            and (max_depth is None or depth [index_node] < max_depth):
-                        histogram [attribute_index] += 1
-    useful_labels = [
-        al if c > 0 else None
-        for al, c in zip (attribute_labels, histogram)
-    ]
-    plot_histogram (
-        histogram,
-        useful_labels,
-        suffix + ('' if max_depth is None else '_{}'.format (max_depth)),
-        max_depth)
+def attribute_depth_counts (children_left, children_right, feature, number_attributes):
+    """
+    Count the nodes of a tree that test each attribute at each depth.
+    The depths are computed a level at a time, from the root to the leaves.
+    :return: a matrix with a row per depth and a column per attribute.
+    """
+    internal = (children_left != sklearn.tree._tree.TREE_LEAF) | (children_right != sklearn.tree._tree.TREE_LEAF)
+    depth = numpy.zeros (len (children_left), dtype=numpy.int64)
+    frontier = numpy.array ([0])
+    level = 0
+    while len (frontier) > 0:
+        depth [frontier] = level
+        frontier = frontier [internal [frontier]]
+        frontier = numpy.concatenate ((children_left [frontier], children_right [frontier]))
+        frontier = frontier [frontier != sklearn.tree._tree.TREE_LEAF]
+        level += 1
+    result = numpy.zeros ((level, number_attributes), dtype=numpy.int64)
+    numpy.add.at (result, (depth [internal], feature [internal]), 1)
+    return result
+
+
+def analyse_file (filename, number_attributes):
+    """
+    Count the nodes of the trees of a file that test each attribute at each depth.
+    """
+    result = numpy.zeros ((0, number_attributes), dtype=numpy.int64)
+    for children_left, children_right, feature in decision_tree_files.read_trees (filename):
+        result = add_counts (result, attribute_depth_counts (children_left, children_right, feature, number_attributes))
+    return result
+
+
+def add_counts (counts_a, counts_b):
+    """
+    Add two matrices of counts per depth with different numbers of depths.
+    """
+    if len (counts_a) < len (counts_b):
+        counts_a, counts_b = counts_b, counts_a
+    result = counts_a.copy ()
+    result [:len (counts_b)] += counts_b
+    return result
+
+
+def analyse_decision_trees (filenames, number_attributes, jobs):
+    """
+    Count the nodes of the trees of all the files that test each attribute at each depth, reading the files in a
+    process pool.
+    """
+    result = numpy.zeros ((0, number_attributes), dtype=numpy.int64)
+    with multiprocessing.Pool (jobs) as pool:
+        for counts in pool.imap_unordered (functools.partial (analyse_file, number_attributes=number_attributes), filenames):
+            result = add_counts (result, counts)
+    return result
+
+
+def depth_histogram (cumulative_counts, max_depth):
+    """
+    Return the histogram of attribute usage of the nodes within max_depth hops from the root node.
+    :param cumulative_counts: the cumulative sum over the depths of the counts per depth.
+    """
+    if len (cumulative_counts) == 0 or max_depth == 0:
+        return numpy.zeros (cumulative_counts.shape [1], dtype=numpy.int64)
+    elif max_depth is None:
+        return cumulative_counts [-1]
+    else:
+        return cumulative_counts [min (max_depth, len (cumulative_counts)) - 1]
 
 
 def main ():
@@ -63,8 +104,19 @@ def main ():
         freader = csv.reader (fd, delimiter='\t', quoting=csv.QUOTE_NONNUMERIC)
         attribute_labels = freader.__next__ ()
         print ('There are {} attributes'.format (len (attribute_labels)))
+    counts = analyse_decision_trees (args.filename, len (attribute_labels), args.jobs)
+    cumulative_counts = numpy.cumsum (counts, axis=0)
     for max_depth in [None, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 15, 20]:
-        analyse_decision_trees (args.suffix, args.filename, attribute_labels, max_depth)
+        histogram = depth_histogram (cumulative_counts, max_depth)
+        useful_labels = [
+            al if c > 0 else None
+            for al, c in zip (attribute_labels, histogram)
+        ]
+        plot_histogram (
+            histogram,
+            useful_labels,
+            args.suffix + ('' if max_depth is None else '_{}'.format (max_depth)),
+            max_depth)
 
 
 def process_arguments ():
@@ -88,9 +140,16 @@ def process_arguments ():
         'filename',
         type=str,
         nargs='+',
-        help='A CSV file containing decision trees, each one in a line.'
+        help='A CSV file containing decision trees, each one in a line, or a tree store directory.'
+    )
+    parser.add_argument (
+        '--jobs',
+        type=int,
+        default=os.cpu_count (),
+        help='Number of processes reading the files, by default the number of CPUs.'
     )
     return parser.parse_args ()
 
 
-main ()
+if __name__ == '__main__':
+    main ()
@@ -9,6 +9,8 @@ import numpy
 from sklearn.metrics import confusion_matrix
 from sklearn.utils.multiclass import unique_labels
 
+import classifier_output_files
+
 
 ORDER_TRUE_PREDICTED = 'true-predicted'
 ORDER_PREDICTED_TRUE = 'predicted-true'
@@ -149,6 +151,9 @@ def read_nn_data (list_files_name: List[str]):
 
 
 def read_neural_network_output (filename, number_classes):
+    if classifier_output_files.is_binary (filename):
+        predicted, real, _runs = classifier_output_files.read_binary (filename)
+        return numpy.column_stack ((predicted, numpy.where (real == 0, -1, real)))
     # read the data
     with open (filename, 'r') as fdr:
         reader = csv.DictReader (
@@ -159,7 +164,7 @@ def read_neural_network_output (filename, number_classes):
         data = [row for row in reader]
     # check the data
     for row in data:
-        if len (row) != 2 * number_classes:
+        if len ([key for key in row if key != 'run']) != 2 * number_classes:
             print ('Neural network output does not have {} classes! There is a row with {} values'.format (
                 number_classes,
                 len (row)))
@@ -0,0 +1,106 @@
+"""
+Benchmark of the histogram mode of the decision tree, see module binning.
+
+Decision trees are trained on synthetic data sets with the exact splitter on the attribute values and on the bin
+indexes of the samples, for several numbers of rows and bins.  For each setting we measure the median time to fit a
+tree, the time to quantize the samples, which is paid once per process, and the mean score on the test sets.  A data
+sets file (see function dataset.load_data_sets) can be given to measure real data instead.
+
+Run from the repository root with:
+
+PYTHONPATH=classifier python -m benchmark.decision_tree_bins
+"""
+
+import argparse
+import numpy
+import sklearn.tree
+import time
+
+import binning
+import dataset
+import scoring
+
+"""Numbers of rows of the synthetic data sets."""
+ROWS = [1000, 10000, 50000]
+
+"""Number of attributes of the synthetic data sets."""
+COLUMNS = 64
+
+"""Number of classes of the synthetic data sets."""
+CLASSES = 3
+
+"""Numbers of bins of the histogram mode, None being the exact splitter."""
+BINS = [None, 256, 64, 16]
+
+def main ():
+    args = parse_arguments ()
+    if args.data_sets is None:
+        list_samples = [('synthetic', create_samples (rows)) for rows in ROWS]
+    else:
+        list_samples = [(args.data_sets, dataset.Samples (dataset.load_data_sets (args.data_sets)))]
+    print ('"data","rows","bins","bin.time.s","fit.time.s","score"')
+    for name, samples in list_samples:
+        for max_bins in BINS:
+            bin_time, fit_time, score = measure (samples, max_bins, args.max_depth, args.repeats)
+            print ('"{0}",{1},{2},{3:.4f},{4:.4f},{5:.4f}'.format (
+                name, len (samples.xs), 'NA' if max_bins is None else max_bins, bin_time, fit_time, score))
+
+def create_samples (rows):
+    """
+    Create samples whose classes have normal attributes with different means.
+    """
+    RNG = numpy.random.RandomState (0)
+    return dataset.samples_from_arrays (
+        [RNG.normal (loc = RNG.random_sample (COLUMNS), size = (rows // CLASSES, COLUMNS)) for _index in range (CLASSES)],
+        [index + 1 for index in range (CLASSES)])
+
+def measure (samples, max_bins, max_depth, repeats):
+    """
+    Return the time to quantize the samples, the median time to fit a tree and the mean score on the test sets.
+    """
+    start = time.time ()
+    binned = None if max_bins is None else binning.Binned_Samples (samples.xs, max_bins)
+    bin_time = time.time () - start
+    fit_times = []
+    scores = []
+    for index in range (repeats):
+        RNG = numpy.random.RandomState ([0, index])
+        train, test = dataset.split_data_sets_train_test (samples, 0.3, RNG, dataset.SPLIT_VECTORIZED)
+        if binned is not None:
+            train, test = binned.function (train), binned.function (test)
+        classifier = sklearn.tree.DecisionTreeClassifier (max_depth = max_depth, random_state = RNG)
+        start = time.time ()
+        classifier.fit (train.xs, train.ys)
+        fit_times.append (time.time () - start)
+        scores.append (scoring.compute_score (classifier.predict (test.xs), test.ys) [0])
+    return bin_time, numpy.median (fit_times), numpy.mean (scores)
+
+def parse_arguments ():
+    parser = argparse.ArgumentParser (
+        description = 'Measure the fit time and score of decision trees trained on attribute values and on bin indexes.'
+    )
+    parser.add_argument (
+        '--data-sets',
+        type = str,
+        default = None,
+        metavar = 'PATH',
+        help = 'data sets file to measure instead of the synthetic data sets'
+    )
+    parser.add_argument (
+        '--max-depth',
+        type = int,
+        default = None,
+        metavar = 'N',
+        help = 'maximum depth of the trees, by default unlimited'
+    )
+    parser.add_argument (
+        '--repeats',
+        type = int,
+        default = 5,
+        metavar = 'N',
+        help = 'number of train and test splits of each measurement'
+    )
+    return parser.parse_args ()
+
+if __name__ == '__main__':
+    main ()
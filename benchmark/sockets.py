@@ -0,0 +1,181 @@
+"""
+Benchmark of the socket settings of module socket_operations.
+
+A stream of messages like the tasks sent by the master is pushed from a thread to a pull socket, as fast as possible,
+and we measure the messages per second for each transport, number of I/O threads and high-water mark.  Each setting
+runs in a new process, as the I/O threads of the context cannot be changed after creating sockets.  We also measure the
+request and reply round trips of a client that asks for the socket of the endpoint before each request, with the
+socket pool and with a new socket per request.
+
+Run from the repository root with:
+
+python -m benchmark.sockets
+"""
+
+import argparse
+import multiprocessing
+import numpy
+import threading
+import time
+import zmq
+
+import socket_operations
+
+"""Endpoints of each transport."""
+TRANSPORTS = [
+    ('tcp', 'tcp://127.0.0.1:5560'),
+    ('ipc', 'ipc:///tmp/optigrape-benchmark-sockets'),
+    ('inproc', 'inproc://benchmark-sockets'),
+]
+
+"""Numbers of I/O threads."""
+IO_THREADS = [1, 2]
+
+"""High-water marks, None being the ZeroMQ default of 1000 messages."""
+HWMS = [None, 10, 100000]
+
+"""Milliseconds that the pull socket waits for a message before the stream measurement is given up."""
+RECEIVE_TIMEOUT = 10000
+
+def main ():
+    args = parse_arguments ()
+    message = create_message (args.rows)
+    print ('"transport","io.threads","hwm","messages.s","MB.s"')
+    for transport, endpoint in TRANSPORTS:
+        for io_threads in IO_THREADS:
+            for hwm in HWMS:
+                result = in_process (measure_stream, endpoint, io_threads, hwm, message, args.messages)
+                if result is None:
+                    print ('"{0}",{1},{2},NA,NA'.format (transport, io_threads, 1000 if hwm is None else hwm))
+                else:
+                    rate, size = result
+                    print ('"{0}",{1},{2},{3:.0f},{4:.1f}'.format (
+                        transport, io_threads, 1000 if hwm is None else hwm, rate, rate * size / 1e6))
+    print ('"transport","sockets","round.trips.s"')
+    for transport, endpoint in TRANSPORTS:
+        for pooled in [True, False]:
+            rate = in_process (measure_round_trips, endpoint, pooled, args.round_trips)
+            print ('"{0}","{1}",{2:.0f}'.format (transport, 'pooled' if pooled else 'new', rate))
+
+def create_message (rows):
+    """
+    Create a message similar to a campaign task, with a feature matrix of the given number of rows, if any.
+    """
+    result = {
+        'id': 0,
+        'run': ('decision-tree', 'data.dataset', 'parameters.yaml', 1),
+        'data_sets_id': '0' * 40,
+        'index_repeat': 0,
+        'fraction_test': 0.3,
+        'split_mode': 'compatible',
+        'data_type': 'float64',
+        'time_limit': None,
+    }
+    if rows > 0:
+        result ['xs'] = numpy.random.RandomState (0).random_sample ((rows, 64))
+    return result
+
+def in_process (function, *args):
+    """
+    Run a measurement in a new process and return its result.
+    """
+    receiver, sender = multiprocessing.Pipe (False)
+    process = multiprocessing.Process (target = _measure, args = (sender, function, args))
+    process.start ()
+    sender.close ()
+    result = receiver.recv ()
+    process.join ()
+    return result
+
+def _measure (connection, function, args):
+    connection.send (function (*args))
+    connection.close ()
+
+def measure_stream (endpoint, io_threads, hwm, message, number_messages):
+    """
+    Return the messages per second pushed by a thread to a pull socket, and the size of a message in bytes, or None
+    if a message does not arrive within RECEIVE_TIMEOUT.
+    """
+    socket_operations.configure (io_threads = io_threads, send_hwm = hwm, receive_hwm = hwm, linger = 0)
+    receiver = socket_operations.bind_endpoint (zmq.PULL, endpoint)
+    received = threading.Event ()
+    def push ():
+        sender = socket_operations.connect_endpoint (zmq.PUSH, endpoint)
+        for _index in range (number_messages):
+            socket_operations.send (sender, message)
+        # with a zero linger period, closing the socket drops the messages still queued
+        received.wait ()
+        sender.close ()
+    thread = threading.Thread (target = push)
+    # a sender blocked on a full queue does not keep the process alive after a timeout
+    thread.daemon = True
+    start = time.time ()
+    thread.start ()
+    for _index in range (number_messages):
+        if receiver.poll (RECEIVE_TIMEOUT) == 0:
+            return None
+        socket_operations.recv (receiver)
+    elapsed = time.time () - start
+    received.set ()
+    thread.join ()
+    size = socket_operations.transferred (receiver, socket_operations.RECEIVED) / float (number_messages)
+    socket_operations.close_all ()
+    return number_messages / elapsed, size
+
+def measure_round_trips (endpoint, pooled, number_round_trips):
+    """
+    Return the request and reply round trips per second of a client that gets the socket of the endpoint before each
+    request, either from the pool or as a new socket that is closed after the reply.
+    """
+    socket_operations.configure (linger = 0)
+    server = socket_operations.bind_endpoint (zmq.REP, endpoint)
+    def serve ():
+        for _index in range (number_round_trips):
+            socket_operations.send (server, socket_operations.recv (server))
+    thread = threading.Thread (target = serve)
+    thread.start ()
+    start = time.time ()
+    for index in range (number_round_trips):
+        if pooled:
+            client = socket_operations.connect_endpoint (zmq.REQ, endpoint)
+        else:
+            client = socket_operations.context.socket (zmq.REQ)
+            client.setsockopt (zmq.LINGER, 0)
+            client.connect (endpoint)
+        socket_operations.send_recv (client, {'index': index})
+        if not pooled:
+            client.close ()
+    elapsed = time.time () - start
+    thread.join ()
+    socket_operations.close_all ()
+    return number_round_trips / elapsed
+
+def parse_arguments ():
+    parser = argparse.ArgumentParser (
+        description = 'Measure the message rate of the master and worker sockets under different settings.'
+    )
+    parser.add_argument (
+        '--messages',
+        type = int,
+        default = 20000,
+        metavar = 'N',
+        help = 'number of messages of each stream measurement'
+    )
+    parser.add_argument (
+        '--rows',
+        type = int,
+        default = 0,
+        metavar = 'N',
+        help = 'number of rows of a feature matrix added to each message, zero for task messages only'
+    )
+    parser.add_argument (
+        '--round-trips',
+        type = int,
+        default = 2000,
+        metavar = 'N',
+        help = 'number of request and reply round trips of each socket pool measurement'
+    )
+    return parser.parse_args ()
+
+if __name__ == '__main__':
+    main ()
@@ -0,0 +1,106 @@
+"""
+Benchmark of the message transport in module socket_operations.
+
+Messages with a feature matrix, a prediction array and the weights of a neural network are sent between two sockets,
+using the zero-copy multipart format and the single pickled frame format.  For each message size we measure the
+round-trip latency of a single message and the throughput of a batch of messages.
+
+Run from the repository root with:
+
+python -m benchmark.transport
+"""
+
+import argparse
+import numpy
+import time
+import zmq
+
+import socket_operations
+
+"""Number of rows of the feature matrix of each message."""
+ROWS = [16, 256, 4096, 65536]
+
+"""Number of columns of the feature matrix."""
+COLUMNS = 64
+
+def main ():
+    args = parse_arguments ()
+    sender = socket_operations.bind_endpoint (zmq.PAIR, args.endpoint)
+    receiver = socket_operations.connect_endpoint (zmq.PAIR, args.endpoint)
+    print ('"rows","bytes","format","latency.ms","throughput.MB.s"')
+    for rows in ROWS:
+        message = create_message (rows)
+        size = message_size (message)
+        for name, zero_copy in [('pickle', False), ('zero-copy', True)]:
+            latency = measure_latency (sender, receiver, message, zero_copy, args.repeats)
+            throughput = measure_throughput (sender, receiver, message, zero_copy, args.batch)
+            print ('{0},{1},"{2}",{3:.4f},{4:.1f}'.format (rows, size, name, latency * 1000, size * throughput / 1e6))
+    sender.close ()
+    receiver.close ()
+
+def create_message (rows):
+    """
+    Create a message similar to the ones exchanged by the master and the workers.
+    """
+    RNG = numpy.random.RandomState (0)
+    return {
+        'id': 0,
+        'xs': RNG.random_sample ((rows, COLUMNS)),
+        'ys': RNG.randint (0, 3, size = rows),
+        'coefs': [RNG.random_sample ((COLUMNS, 32)), RNG.random_sample ((32, 3))],
+    }
+
+def message_size (message):
+    return message ['xs'].nbytes + message ['ys'].nbytes + sum (c.nbytes for c in message ['coefs'])
+
+def measure_latency (sender, receiver, message, zero_copy, repeats):
+    """
+    Return the median time to send a message and receive it.
+    """
+    result = []
+    for _index in range (repeats):
+        start = time.time ()
+        socket_operations.send (sender, message, zero_copy)
+        socket_operations.recv (receiver)
+        result.append (time.time () - start)
+    return numpy.median (result)
+
+def measure_throughput (sender, receiver, message, zero_copy, batch):
+    """
+    Return the number of messages per second when a batch of messages is sent before receiving them.
+    """
+    start = time.time ()
+    for _index in range (batch):
+        socket_operations.send (sender, message, zero_copy)
+    for _index in range (batch):
+        socket_operations.recv (receiver)
+    return batch / (time.time () - start)
+
+def parse_arguments ():
+    parser = argparse.ArgumentParser (
+        description = 'Compare the zero-copy and the pickle formats of the messages exchanged by the master and the workers.'
+    )
+    parser.add_argument (
+        '--endpoint',
+        type = str,
+        default = 'tcp://127.0.0.1:5559',
+        help = 'endpoint of the benchmark sockets.  Use tcp://, ipc:// or inproc:// to measure each transport.'
+    )
+    parser.add_argument (
+        '--repeats',
+        type = int,
+        default = 50,
+        metavar = 'N',
+        help = 'number of messages used to measure latency'
+    )
+    parser.add_argument (
+        '--batch',
+        type = int,
+        default = 20,
+        metavar = 'N',
+        help = 'number of messages used to measure throughput'
+    )
+    return parser.parse_args ()
+
+if __name__ == '__main__':
+    main ()
@@ -0,0 +1,266 @@
+"""
+Running aggregates of the rows of classifier runs, kept by the sinks as repeats arrive.
+
+For each run and grid point we keep the confusion matrix of the classifier output on the test sets, with a row per
+real class and a column per predicted class plus a last column for no output (the layout used by the analysis scripts),
+and the count, mean and sum of squared deviations (Welford's algorithm) of columns all.score and random.chance.win.
+The accuracy of each class is computed from the confusion matrix.
+
+The aggregates of a run are checkpointed to a YAML file per grid point every CHECKPOINT_INTERVAL seconds and when the
+run ends.  Files are replaced atomically, so they can be read while the run progresses.  This module can also be run to
+combine the files of runs that only differ in the seed and write a summary table, which only reads the aggregates.
+"""
+
+import argparse
+import csv
+import math
+import numpy
+import os
+import os.path
+import time
+import yaml
+
+import classifier_output
+import scoring
+
+"""Seconds between checkpoints of the aggregates of a run."""
+CHECKPOINT_INTERVAL = 30
+
+"""Columns of the results files whose mean and variance are kept."""
+STATISTICS_COLUMNS = ['all.score', 'random.chance.win']
+
+"""Extension of the aggregates files."""
+EXTENSION = 'yaml'
+
+class Statistics:
+    """
+    Count, mean and sum of squared deviations from the mean of a sequence of values, updated with Welford's algorithm.
+    """
+    def __init__ (self, count = 0, mean = 0.0, m2 = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add (self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def combine (self, other):
+        """
+        Add the values summarised by other statistics (Chan et al. parallel algorithm).
+        """
+        count = self.count + other.count
+        if count == 0:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    def variance (self):
+        """
+        Return the sample variance, or zero if there are less than two values.
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dictionary (self):
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self.m2,
+            'variance': self.variance (),
+        }
+
+    @staticmethod
+    def from_dictionary (dictionary):
+        return Statistics (dictionary ['count'], dictionary ['mean'], dictionary ['m2'])
+
+class Aggregates:
+    """
+    Aggregates of the repeats of a run with some parameters.
+    """
+    def __init__ (self, number_classes):
+        self.number_classes = number_classes
+        self.repeats = 0
+        self.confusion_matrix = numpy.zeros ((number_classes, number_classes + 1), dtype = numpy.int64)
+        self.statistics = dict ((name, Statistics ()) for name in STATISTICS_COLUMNS)
+
+    def add (self, results, classifier_ys, test_ys):
+        """
+        Add a repeat.
+        :param results: dictionary mapping the columns of the results file to their values.
+        :param classifier_ys: the classifier output on the test set.
+        :param test_ys: the classes of the test set.
+        """
+        real = classifier_output.class_numbers (test_ys).astype (numpy.int64) - 1
+        predicted = classifier_output.class_numbers (classifier_ys).astype (numpy.int64) - 1
+        if ((real < 0) | (real >= self.number_classes)).any ():
+            raise Exception ('[E] The test set has classes outside 1 to {}'.format (self.number_classes))
+        # predicted classes that are not valid class numbers count as no output
+        predicted [(predicted < 0) | (predicted >= self.number_classes)] = scoring.NO_CLASS
+        self.confusion_matrix += scoring.confusion_matrix (predicted, real, self.number_classes)
+        for name, statistics in self.statistics.items ():
+            statistics.add (float (results [name]))
+        self.repeats += 1
+
+    def combine (self, other):
+        """
+        Add the repeats of other aggregates.
+        :type other: Aggregates
+        """
+        self.repeats += other.repeats
+        self.confusion_matrix += other.confusion_matrix
+        for name, statistics in self.statistics.items ():
+            statistics.combine (other.statistics [name])
+
+    def class_accuracy (self):
+        """
+        Return the fraction of the test samples of each class that were correctly classified.
+        """
+        totals = self.confusion_matrix.sum (axis = 1)
+        hits = numpy.diag (self.confusion_matrix [:, :self.number_classes])
+        return [float (h) / t if t > 0 else 0.0 for h, t in zip (hits, totals)]
+
+    def to_dictionary (self):
+        result = {
+            'repeats': self.repeats,
+            'classes': self.number_classes,
+            'confusion.matrix': self.confusion_matrix.tolist (),
+            'class.accuracy': self.class_accuracy (),
+        }
+        for name, statistics in self.statistics.items ():
+            result [name] = statistics.to_dictionary ()
+        return result
+
+    @staticmethod
+    def from_dictionary (dictionary):
+        result = Aggregates (dictionary ['classes'])
+        result.repeats = dictionary ['repeats']
+        result.confusion_matrix = numpy.array (dictionary ['confusion.matrix'], dtype = numpy.int64)
+        for name in STATISTICS_COLUMNS:
+            result.statistics [name] = Statistics.from_dictionary (dictionary [name])
+        return result
+
+class Aggregate_Sink:
+    """
+    Updates the aggregates of a run with the rows written to another sink, and checkpoints them.
+    Rows of a run with a grid arrive ordered by repeat and then by grid point, so the grid point of a row is given by
+    the number of rows received so far.
+    """
+    def __init__ (self, algorithm, sink, directory, partition, checkpoint_interval = CHECKPOINT_INTERVAL):
+        """
+        :type algorithm: base_algorithm.Base_Algorithm
+        :param sink: the sink that writes the rows.
+        :param directory: where the aggregates files are written.
+        :param partition: list of (key, value) pairs identifying the run, see function base_algorithm.run_partition.
+        """
+        self.sink = sink
+        self.directory = directory
+        self.partition = partition
+        self.points = [algorithm.parameters] if algorithm.grid is None else algorithm.grid
+        self.aggregates = [Aggregates (algorithm.number_classes) for _point in self.points]
+        self.names = [name for name, _type in algorithm.results_columns ()]
+        self.number_rows = 0
+        self.checkpoint_interval = checkpoint_interval
+        self.last_checkpoint = time.time ()
+        if not os.path.isdir (directory):
+            os.makedirs (directory)
+
+    def write_repeat (self, index_repeat, repeat):
+        results_row, _classifier_row, classifier_ys, test_ys = repeat
+        self.aggregates [self.number_rows % len (self.points)].add (dict (zip (self.names, results_row)), classifier_ys, test_ys)
+        self.number_rows += 1
+        self.sink.write_repeat (index_repeat, repeat)
+        if time.time () - self.last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint ()
+
+    def checkpoint (self):
+        """
+        Write the aggregates of each grid point.
+        """
+        for index_point, (parameters, aggregates) in enumerate (zip (self.points, self.aggregates)):
+            dictionary = dict (self.partition)
+            dictionary.update (aggregates.to_dictionary ())
+            dictionary ['point'] = index_point
+            dictionary ['point.parameters'] = parameters
+            filename = aggregates_filename (self.directory, self.partition, index_point)
+            with open (filename + '.tmp', 'w') as fd:
+                yaml.safe_dump (dictionary, fd, default_flow_style = False)
+            os.rename (filename + '.tmp', filename)
+        self.last_checkpoint = time.time ()
+
+    def close (self):
+        self.checkpoint ()
+        self.sink.close ()
+
+def aggregates_filename (directory, partition, index_point):
+    return os.path.join (directory, '{0}_point={1}.{2}'.format (
+        '_'.join ('{}={}'.format (key, value) for key, value in partition),
+        index_point,
+        EXTENSION))
+
+def load (directory):
+    """
+    Read the aggregates files of a directory.
+    :return: a list of tuples with the dictionary read from a file and its aggregates.
+    """
+    result = []
+    for basename in sorted (os.listdir (directory)):
+        if basename.endswith ('.' + EXTENSION):
+            with open (os.path.join (directory, basename), 'r') as fd:
+                dictionary = yaml.safe_load (fd)
+            result.append ((dictionary, Aggregates.from_dictionary (dictionary)))
+    return result
+
+def main ():
+    args = parse_arguments ()
+    keys = ['algorithm', 'data_sets', 'parameters', 'fraction_test', 'point']
+    groups = {}
+    for dictionary, aggregates in load (args.DIRECTORY):
+        key = tuple (dictionary [name] for name in keys)
+        if key in groups:
+            groups [key][1].combine (aggregates)
+            groups [key][2].append (dictionary ['seed'])
+        else:
+            groups [key] = (dictionary ['point.parameters'], aggregates, [dictionary ['seed']])
+    number_classes = max ([aggregates.number_classes for _parameters, aggregates, _seeds in groups.values ()] + [0])
+    with open (args.output, 'w') as fd:
+        writer = csv.writer (fd, delimiter = ',', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
+        writer.writerow (keys + ['point.parameters', 'seeds', 'repeats'] + [
+            '{}.{}'.format (name, statistic) for name in STATISTICS_COLUMNS for statistic in ['mean', 'std']
+        ] + ['class.accuracy.{}'.format (index) for index in range (1, number_classes + 1)])
+        for key in sorted (groups.keys ()):
+            parameters, aggregates, seeds = groups [key]
+            writer.writerow (list (key) + [
+                yaml.safe_dump (parameters, default_flow_style = True, width = float ('inf')).strip (),
+                len (seeds),
+                aggregates.repeats,
+            ] + [
+                value
+                for name in STATISTICS_COLUMNS
+                for value in [aggregates.statistics [name].mean, math.sqrt (aggregates.statistics [name].variance ())]
+            ] + aggregates.class_accuracy ())
+    print ("Wrote {0} aggregates of {1} files to {2}".format (len (groups), sum (len (g [2]) for g in groups.values ()), args.output))
+
+def parse_arguments ():
+    parser = argparse.ArgumentParser (
+        description = 'Combine the aggregates of runs that only differ in the seed and write a summary table.'
+    )
+    parser.add_argument (
+        'DIRECTORY',
+        type = str,
+        help = 'the directory with the aggregates files'
+    )
+    parser.add_argument (
+        '--output',
+        type = str,
+        required = True,
+        metavar = 'PATH',
+        help = 'the CSV file to create'
+    )
+    return parser.parse_args ()
+
+if __name__ == '__main__':
+    main ()
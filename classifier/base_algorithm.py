@@ -1,132 +1,286 @@
 import argparse
 import collections
 import datetime
+import itertools
+import multiprocessing
 import numpy
 import os.path
 import time
+import yaml
 
+import aggregates
+import classifier_output
+import columnar_store
 import command_line_arguments
 import dataset
+import profiler
+import result_sink
+import scoring
+import shards
+
+"""The algorithm whose repeats are run by the processes of a pool.  Pool processes inherit it when they are forked."""
+_POOL_ALGORITHM = None
+
+"""
+The rows produced by a repeat, or by a grid point of a repeat: the repeat index, a dictionary with the results columns,
+the classifier row (see method Base_Algorithm.file_classifier_row), the classifier output on the test set and the
+correct classes.
+"""
+Repeat = collections.namedtuple ('Repeat', ['index_repeat', 'results', 'classifier', 'classifier_ys', 'test_ys'])
 
 class Base_Algorithm:
     """
     Contains functions used by all classifier algorithms.
-    Derived classes should implement the methods load_parameters, open_results_file, open_classifier_file and run.
-    """
-    def __init__(self):
-        """
-        Instantiate a classifier using command line options and run it.
-        """
-        args = parse_arguments ()
-        self.RNG = numpy.random.RandomState (args.RNG_seed)
-        self.data_sets = dataset.load_data_sets (args.data_sets)
-        self.parameters = self.load_parameters (args.learning_parameters)
-        self.suffix = self.__filename_suffix (args)
-        results_file, self.results_writer = self.open_results_file ()
-        classifier_file, self.classifier_writer = self.open_classifier_file ()
-        output_file, self._output_writer = self.open_output_file ()
-        for index in range (args.number_repeats):
-            self.run (args.fraction_test, index)
-        results_file.close ()
-        classifier_file.close ()
-        output_file.close ()
+    Derived classes should define attributes NAME and PARAMETERS and implement the methods load_parameters, results_columns, classifier_columns, open_results_file, open_classifier_file, open_output_file and evaluate.
+    Method run performs a single repeat and returns the rows to write, so that repeats can be run in other processes.
+    Method evaluate fits and evaluates a classifier with given parameters on a train and test set.
+    If a parameter grid is given (see function load_grid), every point of the grid is evaluated on the same train and test sets of each repeat.
+    The rows can be written by a sink, see module result_sink.
+    The phases of a run are recorded by a profiler, see module profiler.
 
-    @staticmethod
-    def __filename_suffix (args):
-        # type: (argparse.Namespace) -> str
-        """
-        Compute a filename suffix used in the file with the classification task results and in the file with the classifier data.
-        :param args:
-        :return:
-        """
-        data = datetime.datetime.now ().__str__ ().split ('.') [0]
-        data = data.replace (' ', '-').replace (':', '-')
-        result = "{0}_{1}_{2}_{3}_{4}_{5}_{6}".format (
-            os.path.basename (args.data_sets),
-            os.path.basename (args.learning_parameters),
-            args.RNG_seed,
-            args.fraction_test,
-            os.getenv ("SGE_TASK_ID"),
-            os.getenv ("JOB_ID"),
-            data
-        )
-        return result
-
-    def run_classifier (self, classifier, train, test, index_repeat):
+    An algorithm can be used from other Python code, for instance:
+
+    samples = dataset.samples_from_arrays ([rows_1, rows_2], ['class-1', 'class-2'])
+    algorithm = decision_tree.Decision_Tree (samples, {'criterion': 'gini', 'max_depth': 4, 'min_samples_split': 2}, 7)
+    repeats = algorithm.execute (0.3, 30)
+
+    Function main runs an algorithm from the command line.
+    """
+    NAME = None
+
+    """Key of the classifier parameters in the parameters file."""
+    PARAMETERS = None
+
+    def __init__ (self, samples, parameters, RNG_seed, grid = None, split_mode = dataset.SPLIT_COMPATIBLE, a_profiler = None):
+        """
+        Prepare a classifier algorithm.  Nothing is run until method execute or method repeats is called.
+        :type samples: dataset.Samples
+        :param parameters: dictionary with the classifier parameters.
+        :param RNG_seed: the pseudo-random number generator seed.
+        :param grid: list of dictionaries with the parameters of each grid point, or None to only use the classifier parameters.
+        :param split_mode: one of dataset.SPLIT_MODES.
+        :type a_profiler: profiler.Profiler
+        """
+        self.samples = samples
+        self.parameters = parameters
+        self.RNG_seed = RNG_seed
+        self.grid = grid
+        self.split_mode = split_mode
+        self.profiler = profiler.Profiler () if a_profiler is None else a_profiler
+        self.number_classes = len (samples.list_data_sets)
+
+    def execute (self, fraction_test, number_repeats, jobs = None, sink = None):
+        """
+        Run all the repeats, or all the grid points of all the repeats.
+        Calling this method again with the same arguments gives the same results.
+        :param fraction_test: fraction of the data set to be used as test set.
+        :param number_repeats: how many repeats to perform.
+        :param jobs: number of processes or None, see method run_repeats.
+        :param sink: where the rows are written, or None.  The sink is not closed.
+        :return: a list of Repeat tuples.
+        """
+        return list (self.repeats (fraction_test, number_repeats, jobs, sink))
+
+    def repeats (self, fraction_test, number_repeats, jobs = None, sink = None, units = None):
+        """
+        Generator version of method execute, which does not keep the rows of previous repeats in memory.
+        :param units: the units of a shard, see method shard_repeats, or None to run all the repeats.
+        """
+        if units is not None:
+            repeats = self.shard_repeats (fraction_test, units)
+        elif self.grid is None:
+            repeats = self.run_repeats (fraction_test, number_repeats, jobs)
+        else:
+            repeats = self.sweep_repeats (fraction_test, number_repeats, jobs)
+        names = [name for name, _type in self.results_columns ()]
+        for index, repeat in repeats:
+            if sink is not None:
+                with self.profiler.phase ('write', index):
+                    sink.write_repeat (index, repeat)
+            results_row, classifier_row, classifier_ys, test_ys = repeat
+            yield Repeat (index, dict (zip (names, results_row)), classifier_row, classifier_ys, test_ys)
+
+    def run_repeats (self, fraction_test, number_repeats, jobs):
+        """
+        Run all the repeats and yield their rows in repeat order.
+        If jobs is None, repeats run in this process and share a pseudo-random number generator seeded with the seed.
+        Otherwise, each repeat uses its own generator (see function repeat_RNG) and, if jobs is greater than one, repeats run in a pool of that many processes.
+        Results then only depend on the seed and on the repeat index, not on the number of processes.
+        :param fraction_test: fraction of the data set to be used as test set.
+        :param number_repeats: how many repeats to perform.
+        :param jobs: number of processes or None.
+        :return: a generator of tuples with the repeat index and the rows of the repeat.
+        """
+        if jobs is None:
+            RNG = numpy.random.RandomState (self.RNG_seed)
+            for index in range (number_repeats):
+                with self.profiler.repeat (index):
+                    repeat = self.run (fraction_test, index, RNG)
+                yield index, repeat
+        elif jobs == 1:
+            for index in range (number_repeats):
+                with self.profiler.repeat (index):
+                    repeat = self.run (fraction_test, index, repeat_RNG (self.RNG_seed, index))
+                yield index, repeat
+        else:
+            tasks = [(fraction_test, index) for index in range (number_repeats)]
+            for index, repeat in zip (range (number_repeats), self.pool_map (_run_pool_repeat, tasks, jobs)):
+                yield index, repeat
+
+    def sweep_repeats (self, fraction_test, number_repeats, jobs):
+        """
+        Evaluate every grid point in every repeat and yield their rows ordered by repeat and then by grid point.
+        The train and test sets of a repeat are drawn once, with the generator of the repeat (see function repeat_RNG).
+        Each grid point then continues from a copy of this generator, so it gets the same rows as a run with option --jobs and the parameters of the point.
+        :param fraction_test: fraction of the data set to be used as test set.
+        :param number_repeats: how many repeats to perform.
+        :param jobs: number of processes, or None to run in this process.
+        :return: a generator of tuples with the repeat index and the rows of a grid point.
+        """
+        splits = []
+        for index in range (number_repeats):
+            RNG = repeat_RNG (self.RNG_seed, index)
+            with self.profiler.repeat (index):
+                with self.profiler.phase ('split'):
+                    train_indexes, test_indexes = self.samples.split (fraction_test, RNG, self.split_mode)
+            splits.append ((index, train_indexes, test_indexes, RNG.get_state ()))
+        if jobs is None or jobs == 1:
+            for index, train_indexes, test_indexes, state in splits:
+                train = self.samples.function (train_indexes)
+                test = self.samples.function (test_indexes)
+                for parameters in self.grid:
+                    with self.profiler.repeat (index):
+                        repeat = self.evaluate (train, test, index, state_RNG (state), parameters)
+                    yield index, repeat
+        else:
+            tasks = [
+                (index, train_indexes, test_indexes, state, index_point)
+                for index, train_indexes, test_indexes, state in splits
+                for index_point in range (len (self.grid))
+            ]
+            for task, repeat in zip (tasks, self.pool_map (_run_pool_point, tasks, jobs)):
+                yield task [0], repeat
+
+    def shard_repeats (self, fraction_test, units):
+        """
+        Run the units of a shard and yield their rows in unit order.
+        A unit is a repeat, or a grid point of a repeat, and gets the same rows as in methods run_repeats and
+        sweep_repeats when jobs is not None.  The train and test sets of a repeat are drawn once for all its grid points.
+        :param fraction_test: fraction of the data set to be used as test set.
+        :param units: the list returned by function shards.shard_units.
+        :return: a generator of tuples with the repeat index and the rows of a unit.
+        """
+        for index, repeat_units in itertools.groupby (units, key = lambda unit: unit [1]):
+            RNG = repeat_RNG (self.RNG_seed, index)
+            if self.grid is None:
+                with self.profiler.repeat (index):
+                    repeat = self.run (fraction_test, index, RNG)
+                yield index, repeat
+                continue
+            with self.profiler.repeat (index):
+                with self.profiler.phase ('split'):
+                    train_indexes, test_indexes = self.samples.split (fraction_test, RNG, self.split_mode)
+            train = self.samples.function (train_indexes)
+            test = self.samples.function (test_indexes)
+            state = RNG.get_state ()
+            for _unit, _index, index_point in repeat_units:
+                with self.profiler.repeat (index):
+                    repeat = self.evaluate (train, test, index, state_RNG (state), self.grid [index_point])
+                yield index, repeat
+
+    def pool_map (self, function, tasks, jobs):
+        """
+        Apply a function to the given tasks in a pool of processes and yield the results in task order.
+        The function is run in a pool process and should return a tuple with its result and what the profiler of the pool process recorded.
+        """
+        global _POOL_ALGORITHM
+        _POOL_ALGORITHM = self
+        pool = multiprocessing.Pool (jobs)
+        try:
+            for result, profile in pool.imap (function, tasks):
+                self.profiler.merge (profile)
+                yield result
+        finally:
+            pool.close ()
+            pool.join ()
+            _POOL_ALGORITHM = None
+
+    def run (self, fraction_test, index_repeat, RNG):
+        """
+        Perform a repeat: split the data sets into a train and a test set and evaluate the classifier with the parameters of the run.
+        :return: the tuple returned by method evaluate.
+        """
+        with self.profiler.phase ('split') as phase:
+            train, test = dataset.split_data_sets_train_test (self.samples, fraction_test, RNG, self.split_mode)
+            phase.arrays (train = train.xs, test = test.xs)
+        return self.evaluate (train, test, index_repeat, RNG, self.parameters)
+
+    def run_repeat (self, fraction_test, index_repeat):
+        """
+        Perform a single repeat with its own pseudo-random number generator (see function repeat_RNG).
+        If there is a grid, all its points are evaluated on the same train and test sets.
+        The rows are the same as the ones of this repeat in methods run_repeats and sweep_repeats when jobs is not None.
+        :return: a list with the rows of the repeat, or with the rows of each grid point.
+        """
+        RNG = repeat_RNG (self.RNG_seed, index_repeat)
+        with self.profiler.repeat (index_repeat):
+            if self.grid is None:
+                return [self.run (fraction_test, index_repeat, RNG)]
+            with self.profiler.phase ('split'):
+                train_indexes, test_indexes = self.samples.split (fraction_test, RNG, self.split_mode)
+            train = self.samples.function (train_indexes)
+            test = self.samples.function (test_indexes)
+            state = RNG.get_state ()
+            return [
+                self.evaluate (train, test, index_repeat, state_RNG (state), parameters)
+                for parameters in self.grid
+            ]
+
+    def run_classifier (self, classifier, train, test):
         """
         Runs the given classifier on the given training set and evaluate it on the test set.
         The classifier should provide a fit and predict methods
         :param classifier: One of the classifiers defined in the sklearn package.
         :param train: the training set.
         :param test: the test set.
-        :return: a tuple with current time, classification score and the probability of randomly guessing the correct class.
+        :return: a tuple with current time, classifier output on the test set, classification score and the probability of randomly guessing the correct class.
         """
         current_time = time.time ()
-        classifier.fit (train.xs, train.ys)
-        ys = classifier.predict (test.xs)
-        self._write_classifier_output (ys, test.ys, index_repeat)
-        score = self.compute_score (ys, test.ys)
+        with self.profiler.phase ('fit'):
+            classifier.fit (train.xs, train.ys)
+        with self.profiler.phase ('predict'):
+            ys = classifier.predict (test.xs)
+        with self.profiler.phase ('score'):
+            score = self.compute_score (ys, test.ys)
+            hit = self.random_chance_to_hit (train, test)
         print ("Score is {0}".format (score))
-        hit = self.random_chance_to_hit (train, test)
-        return current_time, score, hit
+        return current_time, ys, score, hit
 
     @staticmethod
     def compute_score (classifier_ys, test_ys):
         """
         Compute the classification score, meaning the fraction of correctly classified records.
-        The arguments are either a list of integers or a list of list of objects.
+        The arguments are either an array of integers or a two-dimensional array with one row per record.
         The first case is the output of uni-dimensional classifiers, while the second case is the output of multi-dimensional classifiers.
         :param classifier_ys: The classifier output.
         :param test_ys: The correct class.
-        :return: A floating point number representing the classification score.
-        """
-        all_score = 0
-        partial_count = {}
-        if isinstance (classifier_ys [0], numpy.ndarray) and isinstance (test_ys [0], list):
-            for an_y, a_test_y in zip (classifier_ys, test_ys):
-                key = tuple (a_test_y)
-                if key not in partial_count:
-                    partial_count [key] = [0, 0]
-                if all ([ay == at for ay, at in zip (an_y, a_test_y)]):
-                    all_score += 1
-                    partial_count [key][0] += 1
-                partial_count [key][1] += 1
-        elif isinstance (classifier_ys [0], int) and isinstance (test_ys [0], int):
-            for an_y, a_test_y in zip (classifier_ys, test_ys):
-                key = a_test_y
-                if key not in partial_count:
-                    partial_count [key] = [0, 0]
-                if an_y == a_test_y:
-                    all_score += 1
-                    partial_count [key] [0] += 1
-                partial_count [key] [1] += 1
-        else:
-            print '{}'.format (type (classifier_ys [0]))
-            print '{}'.format (type (test_ys [0]))
-            raise Exception ('[E] Unknown class type of {} {}'.format (classifier_ys, test_ys))
-        classes = partial_count.keys ()
-        classes.sort ()
-        partial_score = [
-            partial_count [key][0] / float (partial_count [key][1])
-            for key in classes
-        ]
-        all_score = all_score / float (len (test_ys))
-        result = [all_score] + partial_score
-        return result
-
-    def _write_classifier_output (self, classifier_ys, test_ys, index_repeat):
-        if isinstance (classifier_ys [0], numpy.ndarray) and isinstance (test_ys [0], list):
-            for an_y, a_test_y in zip (classifier_ys, test_ys):
-                row = list (an_y) + a_test_y + [index_repeat]
-                self._output_writer.writerow (row)
-        elif isinstance (classifier_ys [0], int) and isinstance (test_ys [0], int):
-            for an_y, a_test_y in zip (classifier_ys, test_ys):
-                row = [an_y, a_test_y, index_repeat]
-                self._output_writer.writerow (row)
-        else:
-            print '{}'.format (type (classifier_ys [0]))
-            print '{}'.format (type (test_ys [0]))
-            raise Exception ('[E] Unknown class type of {} {}'.format (classifier_ys, test_ys))
+        :return: A list with the overall classification score followed by the score of each class.
+        """
+        return scoring.compute_score (classifier_ys, test_ys)
+
+    @staticmethod
+    def open_classifier_output (filename_prefix, header_row, suffix, output_format):
+        """
+        Create the writer of the file with the classifier output.
+        :param filename_prefix: the name of the file without the suffix and the extension.
+        :param header_row: the column names used in the CSV format.
+        :param suffix: the filename suffix of the run.
+        :param output_format: one of classifier_output.FORMATS.
+        """
+        return classifier_output.open_writer (
+            output_format,
+            '{0}_output_{1}'.format (filename_prefix, suffix),
+            header_row)
 
     @staticmethod
     def random_chance_to_hit (train, test):
@@ -137,45 +291,266 @@ class Base_Algorithm:
         :type train: dataset.Function
         :type test: dataset.Function
         """
+        return scoring.random_chance_to_hit (train.IDs, test.IDs)
 
-        def compute_classes_occurrence (l):
-            # type: (collections.Iterable) -> dict
-            r = {}
-            for x in l:
-                if x in r:
-                    r [x] = r [x] + 1
-                else:
-                    r [x] = 1
-            return r
+    @staticmethod
+    def load_parameters (filename):
+        raise Exception ('Not overloaded')
 
-        count_classes_train = compute_classes_occurrence (train.IDs)
-        count_classes_test = compute_classes_occurrence (test.IDs)
-        result = sum ([count_classes_train [key] * count_classes_test [key] for key in count_classes_test.keys ()])
-        result = result / float (len (train.IDs) * len (test.IDs))
-        return result
+    def results_columns (self):
+        raise Exception ('Not overloaded')
 
-    def load_parameters (self, filename):
+    def classifier_columns (self):
         raise Exception ('Not overloaded')
 
-    def open_results_file (self):
+    def open_results_file (self, suffix):
         raise Exception ('Not overloaded')
 
-    def open_classifier_file (self):
+    def open_classifier_file (self, suffix, classifier_format):
         raise Exception ('Not overloaded')
 
-    def open_output_file (self):
+    def open_output_file (self, suffix, output_format):
         raise Exception ('Not overloaded')
 
-    def run (self, fraction_test, index):
+    def file_classifier_row (self, classifier_row):
+        """
+        Return the classifier row as written to the CSV files and to the columnar store.
+        Algorithms whose classifier row has values only needed by the binary classifier format, or keeps the classifier
+        in another form, override this method.
+        """
+        return classifier_row
+
+    def write_classifier (self, classifier_writer, results_row, classifier_row):
+        """
+        Write the classifier row of a repeat with the writer returned by method open_classifier_file.
+        Algorithms with a binary classifier format override this method.
+        """
+        classifier_writer.writerow (self.file_classifier_row (classifier_row))
+
+    def evaluate (self, train, test, index_repeat, RNG, parameters):
         raise Exception ('Not overloaded')
 
+def main (algorithm_class):
+    """
+    Run a classifier algorithm using command line options.
+    :param algorithm_class: a class derived from Base_Algorithm.
+    """
+    args = parse_arguments ()
+    a_profiler = profiler.Profiler (args.profile)
+    with a_profiler.phase ('load') as phase:
+        data_sets = dataset.load_data_sets (args.data_sets, args.data_type, args.cache_directory)
+        samples = dataset.Samples (data_sets)
+        parameters = algorithm_class.load_parameters (args.learning_parameters)
+        grid = load_grid (args.learning_parameters, algorithm_class.PARAMETERS, parameters)
+        phase.arrays (samples = samples.xs)
+    algorithm = algorithm_class (samples, parameters, args.RNG_seed, grid, args.split_mode, a_profiler)
+    suffix = filename_suffix (args.data_sets, args.learning_parameters, args.RNG_seed, args.fraction_test)
+    partition = run_partition (algorithm.NAME, args.data_sets, args.learning_parameters, args.RNG_seed, args.fraction_test)
+    key = shards.run_key (args.data_sets, args.learning_parameters, args.RNG_seed, args.fraction_test)
+    header = {
+        'run_key': key,
+        'parameters': parameters,
+        'grid': grid,
+        'number_repeats': args.number_repeats,
+        'number_points': 1 if grid is None else len (grid),
+        'split_mode': args.split_mode,
+        'data_type': args.data_type,
+    }
+    units = None
+    merged = None
+    if args.shard is not None and args.merge_shards is not None:
+        raise Exception ('[E] Options --shard and --merge-shards cannot be used together')
+    elif args.merge_shards is not None:
+        # the shard files are checked before creating the results files
+        merged = shards.merge_shards (args.merge_shards, algorithm.NAME, key, header)
+    if args.shard is not None:
+        shard_index, shard_count = shards.parse_shard (args.shard)
+        units = shards.shard_units (args.number_repeats, header ['number_points'], shard_index, shard_count)
+        print ("Performing {0} units in shard {1} of {2}".format (len (units), shard_index, shard_count))
+        sink = shards.Shard_Sink (
+            shards.shard_filename (args.shard_directory, algorithm.NAME, key, shard_index, shard_count),
+            units,
+            dict (header, shard_index = shard_index, shard_count = shard_count))
+    elif args.results_store is None:
+        sink = result_sink.CSV_Sink (algorithm, suffix, args.output_format, args.classifier_format)
+    else:
+        sink = result_sink.Columnar_Sink (algorithm, args.results_store, partition)
+    if args.aggregates is not None and args.shard is None:
+        sink = aggregates.Aggregate_Sink (algorithm, sink, args.aggregates, partition)
+    if merged is not None:
+        for index_repeat, repeat in merged:
+            with a_profiler.phase ('write', index_repeat):
+                sink.write_repeat (index_repeat, repeat)
+    else:
+        for _repeat in algorithm.repeats (args.fraction_test, args.number_repeats, args.jobs, sink, units):
+            pass
+    sink.close ()
+    # the profile goes with the rows of the run, so runs that write to a store or shard add no file to this directory
+    if args.shard is not None:
+        suffix = '{0}_shard-{1}-of-{2}'.format (suffix, shard_index, shard_count)
+        profile_directory = args.shard_directory
+    elif args.results_store is not None:
+        profile_directory = columnar_store.partition_path (args.results_store, partition)
+    else:
+        profile_directory = os.curdir
+    a_profiler.write (
+        os.path.join (profile_directory, '{0}_profile_{1}'.format (algorithm.NAME, suffix)),
+        dict (
+            partition,
+            number_repeats = args.number_repeats,
+            jobs = args.jobs,
+            grid_points = None if grid is None else len (grid)))
+
+def filename_suffix (data_sets, learning_parameters, RNG_seed, fraction_test):
+    # type: (str, str, int, float) -> str
+    """
+    Compute a filename suffix used in the file with the classification task results and in the file with the classifier data.
+    :param data_sets: the file with the data sets.
+    :param learning_parameters: the file with the classifier parameters.
+    :return:
+    """
+    data = datetime.datetime.now ().__str__ ().split ('.') [0]
+    data = data.replace (' ', '-').replace (':', '-')
+    result = "{0}_{1}_{2}_{3}_{4}_{5}_{6}".format (
+        os.path.basename (data_sets),
+        os.path.basename (learning_parameters),
+        RNG_seed,
+        fraction_test,
+        os.getenv ("SGE_TASK_ID"),
+        os.getenv ("JOB_ID"),
+        data
+    )
+    return result
+
+def run_partition (name, data_sets, learning_parameters, RNG_seed, fraction_test):
+    """
+    Compute the partition of a run in a columnar store, see function columnar_store.partition_path.
+    :param name: the algorithm name.
+    :param data_sets: the file with the data sets.
+    :param learning_parameters: the file with the classifier parameters.
+    """
+    return [
+        ('algorithm', name),
+        ('data_sets', os.path.basename (data_sets)),
+        ('parameters', os.path.basename (learning_parameters)),
+        ('seed', RNG_seed),
+        ('fraction_test', fraction_test),
+    ]
+
+def load_grid (filename, key, parameters):
+    """
+    Read the grid of parameters to sweep, declared under the key of the classifier parameters followed by _grid, for instance:
+
+    decision_tree:
+      criterion: gini
+      max_depth: 4
+      min_samples_split: 2
+    decision_tree_grid:
+      max_depth: [2, 4, 8]
+      min_samples_split: [2, 10]
+
+    Each grid point is the classifier parameters with the values of one combination of the grid lists.
+    :param key: the key of the classifier parameters.
+    :param parameters: the classifier parameters.
+    :return: the list of grid points, or None if the file does not declare a grid.
+    """
+    with open (filename, "r") as fd:
+        dictionary = yaml.load (fd)
+    grid = dictionary.get ('{}_grid'.format (key))
+    if grid is None:
+        return None
+    result = parameter_grid (parameters, grid)
+    print ("Sweeping {0} grid points".format (len (result)))
+    return result
+
+def repeat_RNG (RNG_seed, index_repeat):
+    # type: (int, int) -> numpy.random.RandomState
+    """
+    Create the pseudo-random number generator of a repeat.
+    Its stream is independent of the other repeats and only depends on the seed and on the repeat index.
+    """
+    return numpy.random.RandomState ([RNG_seed, index_repeat])
+
+def state_RNG (state):
+    # type: (tuple) -> numpy.random.RandomState
+    """
+    Create a pseudo-random number generator in the given state.
+    """
+    result = numpy.random.RandomState ()
+    result.set_state (state)
+    return result
+
+def parameter_grid (parameters, grid):
+    # type: (dict, dict) -> list
+    """
+    Compute the points of a parameter grid.
+    :param parameters: the classifier parameters.
+    :param grid: dictionary mapping parameter names to the list of values to sweep.
+    :return: a list with a copy of the classifier parameters for each combination of grid values, the last parameter name in alphabetical order varying fastest.
+    """
+    names = sorted (grid.keys ())
+    for name in names:
+        if name not in parameters:
+            raise Exception ('[E] Unknown parameter {} in the grid'.format (name))
+        if not isinstance (grid [name], list) or len (grid [name]) == 0:
+            raise Exception ('[E] The grid values of parameter {} should be a non-empty list'.format (name))
+    result = []
+    for values in itertools.product (*[grid [name] for name in names]):
+        point = dict (parameters)
+        point.update (zip (names, values))
+        result.append (point)
+    return result
+
+def _run_pool_repeat (arguments):
+    """
+    Run a repeat of the algorithm in _POOL_ALGORITHM inside a pool process.
+    :param arguments: a tuple with the fraction of the data set to be used as test set and the repeat index.
+    :return: a tuple with the rows of the repeat and what its profiler recorded.
+    """
+    fraction_test, index_repeat = arguments
+    algorithm = _POOL_ALGORITHM
+    algorithm.profiler = algorithm.profiler.fork ()
+    with algorithm.profiler.repeat (index_repeat):
+        repeat = algorithm.run (fraction_test, index_repeat, repeat_RNG (algorithm.RNG_seed, index_repeat))
+    return repeat, algorithm.profiler.export ()
+
+def _run_pool_point (arguments):
+    """
+    Evaluate a grid point of the algorithm in _POOL_ALGORITHM inside a pool process.
+    :param arguments: a tuple with the repeat index, the train and test indexes, the generator state after the split and the grid point index.
+    :return: a tuple with the rows of the grid point and what its profiler recorded.
+    """
+    index_repeat, train_indexes, test_indexes, state, index_point = arguments
+    algorithm = _POOL_ALGORITHM
+    algorithm.profiler = algorithm.profiler.fork ()
+    with algorithm.profiler.repeat (index_repeat):
+        repeat = algorithm.evaluate (
+            algorithm.samples.function (train_indexes),
+            algorithm.samples.function (test_indexes),
+            index_repeat,
+            state_RNG (state),
+            algorithm.grid [index_point])
+    return repeat, algorithm.profiler.export ()
+
 def parse_arguments ():
     parser = argparse.ArgumentParser (
         description = "Optigrape worker"
     )
     command_line_arguments.data_sets_file (parser)
+    command_line_arguments.data_type (parser)
+    command_line_arguments.cache_directory (parser)
     command_line_arguments.fraction_test (parser)
+    command_line_arguments.split_mode (parser)
     command_line_arguments.learning_parameters_file (parser)
     command_line_arguments.RNG_seed (parser)
     command_line_arguments.number_repeats (parser)
+    command_line_arguments.jobs (parser)
+    command_line_arguments.output_format (parser)
+    command_line_arguments.classifier_format (parser)
+    command_line_arguments.results_store (parser)
+    command_line_arguments.shard (parser)
+    command_line_arguments.shard_directory (parser)
+    command_line_arguments.merge_shards (parser)
+    command_line_arguments.aggregates (parser)
+    command_line_arguments.profile (parser)
     return parser.parse_args ()
@@ -0,0 +1,51 @@
+"""
+Files of the binary classifier stores, see modules tree_store and weight_store.
+
+A store keeps the arrays of all its classifiers in append-only files of typed values, and an index file with a
+fixed-size record per classifier that gives the offset and length of its values in each array file.  The values of a
+classifier are written before its index record, so a reader only sees complete classifiers.  A write that is
+interrupted before its index record leaves values that no record refers to, and maybe part of a record.  They are
+discarded when the store is opened again for writing: the index file is truncated to its whole records (see function
+whole_records) and every array file to the end of the values of the last record (see function open_append).
+"""
+
+import numpy
+import os
+import os.path
+
+def whole_records (filename, dtype):
+    """
+    Return the size in bytes of the whole records of a file, which is empty if it does not exist.
+    """
+    size = os.path.getsize (filename) if os.path.exists (filename) else 0
+    return size - size % dtype.itemsize
+
+def open_append (filename, size):
+    """
+    Open a file for appending after its first size bytes, discarding the rest.
+    """
+    fd = open (filename, 'ab')
+    if os.path.getsize (filename) < size:
+        fd.close ()
+        raise Exception ('[E] Store file {} is shorter than its index, {} bytes expected'.format (filename, size))
+    fd.truncate (size)
+    return fd
+
+def read_records (filename, dtype):
+    """
+    Read the records of an index file, which has none if it does not exist.
+    """
+    if os.path.exists (filename):
+        return numpy.fromfile (filename, dtype = dtype)
+    else:
+        return numpy.zeros (0, dtype = dtype)
+
+def memmap (filename, dtype):
+    """
+    Memory map an array file read-only.
+    """
+    # empty files cannot be memory mapped
+    if os.path.getsize (filename) == 0:
+        return numpy.zeros (0, dtype = dtype)
+    else:
+        return numpy.memmap (filename, dtype = dtype, mode = 'r')
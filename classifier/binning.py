@@ -0,0 +1,87 @@
+"""
+Quantization of the samples into a matrix of bin indexes, used by the histogram mode of the decision tree.
+
+Each attribute is divided into at most max_bins bins by a sorted array of edges.  The bin of a value is the number of
+edges that are lower than the value, so a tree node that sends bin indexes up to b to the left child is equivalent to
+a node with threshold edges [b] on the real values.  This holds for the fractional thresholds chosen by sklearn, as
+they are rounded down to a bin index.  The structure of a tree trained on bin indexes can then be written with real
+thresholds, see function real_thresholds.
+
+When an attribute has at most max_bins distinct values, the edges are the midpoints between consecutive values and
+every split of the exact splitter is available.  Otherwise the edges are quantiles of the attribute.
+
+The bin indexes of some samples are computed once and kept while the samples are alive, so all the repeats and grid
+points run in a process share them.
+"""
+
+import numpy
+import weakref
+
+import dataset
+
+"""Maximum number of bins of an attribute, so that bin indexes fit in an unsigned byte."""
+MAX_BINS = 256
+
+"""Bin indexes of the samples alive in this process, by samples and by number of bins."""
+_binned = weakref.WeakKeyDictionary ()
+
+class Binned_Samples:
+    def __init__ (self, xs, max_bins):
+        """
+        Quantize a matrix of attribute values.
+        :param xs: two-dimensional array with a row per record.
+        :param max_bins: maximum number of bins of an attribute, between 2 and MAX_BINS.
+        """
+        if not 2 <= max_bins <= MAX_BINS:
+            raise Exception ('[E] The number of bins should be between 2 and {}, got {}'.format (MAX_BINS, max_bins))
+        self.max_bins = max_bins
+        self.edges = [attribute_edges (column, max_bins) for column in xs.T]
+        self.xs = numpy.empty (xs.shape, dtype = numpy.uint8)
+        for index, (column, edges) in enumerate (zip (xs.T, self.edges)):
+            self.xs [:, index] = numpy.searchsorted (edges, column, side = 'left')
+
+    def function (self, function):
+        """
+        Return a copy of a function of the samples with the bin indexes of its rows as inputs.
+        :type function: dataset.Function
+        :rtype: dataset.Function
+        """
+        result = dataset.Function ()
+        result.indexes = function.indexes
+        result.xs = self.xs [function.indexes]
+        result.ys = function.ys
+        result.IDs = function.IDs
+        return result
+
+    def real_thresholds (self, tree):
+        """
+        Return the thresholds of a tree trained on bin indexes as thresholds on the attribute values.
+        Leaves keep the threshold used by sklearn.
+        :type tree: sklearn.tree._tree.Tree
+        """
+        result = numpy.array (tree.threshold, dtype = numpy.float64)
+        for index_node in numpy.flatnonzero (tree.children_left != -1):
+            result [index_node] = self.edges [tree.feature [index_node]][int (numpy.floor (tree.threshold [index_node]))]
+        return result
+
+def attribute_edges (column, max_bins):
+    """
+    Compute the edges of the bins of an attribute.
+    :return: a sorted array with at most max_bins - 1 edges.
+    """
+    values = numpy.unique (column)
+    if len (values) <= max_bins:
+        return (values [:-1] + values [1:]) / 2.0
+    quantiles = numpy.percentile (column, numpy.linspace (0, 100, max_bins + 1) [1:-1])
+    return numpy.unique (quantiles)
+
+def binned_samples (samples, max_bins):
+    """
+    Return the bin indexes of some samples, computing them if they are not kept in this process.
+    :type samples: dataset.Samples
+    :rtype: Binned_Samples
+    """
+    per_samples = _binned.setdefault (samples, {})
+    if max_bins not in per_samples:
+        per_samples [max_bins] = Binned_Samples (samples.xs, max_bins)
+    return per_samples [max_bins]
@@ -0,0 +1,367 @@
+"""
+Campaigns of classifier runs distributed by the master to the workers.
+
+A campaign is described by a YAML file with the following structure:
+
+algorithms: [decision-tree, neural-network]
+data_sets: [FILE1.dataset, FILE2.dataset]
+parameters: [PARAMETERS1.yaml, PARAMETERS2.yaml]
+seeds: [1, 2, 3]
+fraction_test: 0.3
+number_repeats: 30
+split_mode: compatible
+data_type: float64
+output_format: csv
+classifier_format: csv
+results_store: DIRECTORY
+aggregates: DIRECTORY
+
+The last six keys are optional.  A campaign has a run for each combination of algorithm, data sets file, parameters
+file and seed, and each run has number_repeats tasks, one per repeat.  A task is performed by a worker with the
+pseudo-random number generator of its repeat (see function base_algorithm.repeat_RNG), so a run gives the same rows as
+a command line run with option --jobs.  If the parameters file declares a grid, the task evaluates all its points.
+
+Tasks reference the samples of their data sets file by an identifier computed from its contents (see function
+dataset.data_sets_id).  Workers keep the samples they used in a cache (see module samples_cache), and load the missing
+ones either from the data sets file, if the worker sees the same file system as the master, or from the master.
+
+The master writes the rows of each run in the usual results files, or in the columnar store if results_store is given.
+If aggregates is given, the master also keeps the confusion matrix and scores of each run and checkpoints them to that
+directory (see module aggregates).
+"""
+
+import collections
+import threading
+import traceback
+import yaml
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+import aggregates
+import base_algorithm
+import classifier_output
+import dataset
+import decision_tree
+import neural_network
+import result_sink
+import samples_cache
+
+"""Classifier algorithms that can be used in a campaign, by name."""
+ALGORITHMS = collections.OrderedDict ([
+    (decision_tree.Decision_Tree.NAME, decision_tree.Decision_Tree),
+    (neural_network.Neural_Network.NAME, neural_network.Neural_Network),
+])
+
+"""Values of the optional keys of a campaign description."""
+DEFAULTS = {
+    'split_mode': dataset.SPLIT_COMPATIBLE,
+    'data_type': dataset.DATA_TYPE,
+    'output_format': classifier_output.CSV,
+    'classifier_format': classifier_output.CSV,
+    'results_store': None,
+    'aggregates': None,
+}
+
+"""
+A run of a campaign: a classifier algorithm applied to the data sets of a file, with the parameters of a file and a seed.
+"""
+Run = collections.namedtuple ('Run', ['algorithm', 'data_sets', 'parameters', 'seed'])
+
+class Campaign:
+    def __init__ (self, filename):
+        """
+        Read a campaign description.
+        """
+        with open (filename, "r") as fd:
+            dictionary = yaml.safe_load (fd)
+        for key, value in DEFAULTS.items ():
+            dictionary.setdefault (key, value)
+        for name in dictionary ['algorithms']:
+            if name not in ALGORITHMS:
+                raise Exception ('[E] Unknown algorithm {} in campaign {}'.format (name, filename))
+        self.filename = filename
+        self.fraction_test = dictionary ['fraction_test']
+        self.number_repeats = dictionary ['number_repeats']
+        self.split_mode = dictionary ['split_mode']
+        self.data_type = dictionary ['data_type']
+        self.output_format = dictionary ['output_format']
+        self.classifier_format = dictionary ['classifier_format']
+        self.results_store = dictionary ['results_store']
+        self.aggregates = dictionary ['aggregates']
+        self.runs = [
+            Run (algorithm, data_sets, parameters, seed)
+            for data_sets in dictionary ['data_sets']
+            for algorithm in dictionary ['algorithms']
+            for parameters in dictionary ['parameters']
+            for seed in dictionary ['seeds']
+        ]
+        self.data_sets_ids = dict (
+            (data_sets, dataset.data_sets_id (data_sets, self.data_type))
+            for data_sets in dictionary ['data_sets']
+        )
+        self.data_sets_files = dict ((an_id, data_sets) for data_sets, an_id in self.data_sets_ids.items ())
+        self.samples = {}
+
+    def load_samples (self, data_sets):
+        """
+        Return the samples of a data sets file, which are loaded only once.
+        :rtype: dataset.Samples
+        """
+        if data_sets not in self.samples:
+            self.samples [data_sets] = dataset.Samples (dataset.load_data_sets (data_sets, self.data_type))
+        return self.samples [data_sets]
+
+    def cost_features (self, run):
+        """
+        Return the features of the tasks of a run used by the cost model (see module cost_model): the algorithm, the
+        contents of its section and grid in the parameters file, and the size of the data sets.
+        """
+        samples = self.load_samples (run.data_sets)
+        with open (run.parameters, "r") as fd:
+            dictionary = yaml.safe_load (fd)
+        key = ALGORITHMS [run.algorithm].PARAMETERS
+        parameters = {
+            'parameters': dictionary.get (key),
+            'grid': dictionary.get ('{}_grid'.format (key)),
+        }
+        return {
+            'algorithm': run.algorithm,
+            'parameters': yaml.safe_dump (parameters, default_flow_style = True).strip (),
+            'rows': int (samples.xs.shape [0]),
+            'columns': int (samples.xs.shape [1]),
+        }
+
+    def tasks (self, time_limit = None):
+        """
+        Return the list of tasks of the campaign, ordered by run and then by repeat.
+        A task is a dictionary that is sent to a worker.
+        :param time_limit: number of seconds after which a worker kills a task, or None.
+        """
+        result = []
+        for run in self.runs:
+            for index_repeat in range (self.number_repeats):
+                result.append ({
+                    'id': len (result),
+                    'run': tuple (run),
+                    'data_sets_id': self.data_sets_ids [run.data_sets],
+                    'index_repeat': index_repeat,
+                    'fraction_test': self.fraction_test,
+                    'split_mode': self.split_mode,
+                    'data_type': self.data_type,
+                    'time_limit': time_limit,
+                })
+        return result
+
+def create_algorithm (run, samples, split_mode):
+    """
+    Create the classifier algorithm of a run.
+    :type run: Run
+    :type samples: dataset.Samples
+    :rtype: base_algorithm.Base_Algorithm
+    """
+    algorithm_class = ALGORITHMS [run.algorithm]
+    parameters = algorithm_class.load_parameters (run.parameters)
+    grid = base_algorithm.load_grid (run.parameters, algorithm_class.PARAMETERS, parameters)
+    return algorithm_class (samples, parameters, run.seed, grid, split_mode)
+
+class Executor:
+    """
+    Performs tasks in a worker.
+    The samples are kept in a cache, and the algorithm of the last run is kept, as consecutive tasks usually belong to the same run.
+    """
+    def __init__ (self, capacity, fetch_samples):
+        """
+        :param capacity: maximum size in bytes of the cached samples.
+        :param fetch_samples: function that returns the samples of a task that are not in the cache.
+        """
+        self.cache = samples_cache.Samples_Cache (capacity)
+        self.fetch_samples = fetch_samples
+        self.run = None
+        self.algorithm = None
+
+    def execute (self, task):
+        """
+        Perform a task.
+        :return: a list with the rows of the repeat, or of each grid point of the repeat.
+        """
+        self.prepare (task)
+        return self.algorithm.run_repeat (task ['fraction_test'], task ['index_repeat'])
+
+    def prepare (self, task):
+        """
+        Get the samples and create the algorithm of a task.
+        :rtype: base_algorithm.Base_Algorithm
+        """
+        run = Run (*task ['run'])
+        samples = self.cache.get (task ['data_sets_id'])
+        if samples is None:
+            samples = self.fetch_samples (task)
+            self.cache.put (task ['data_sets_id'], samples)
+        if run != self.run or samples is not self.algorithm.samples:
+            self.algorithm = create_algorithm (run, samples, task ['split_mode'])
+            self.run = run
+        return self.algorithm
+
+def samples_message (samples):
+    """
+    Create the message used by the master to send samples to a worker.
+    The rows of each data set are views of the stacked matrix, so they are sent without copies (see module socket_operations).
+    :type samples: dataset.Samples
+    """
+    return {
+        'rows': [d.rows for d in samples.list_data_sets],
+        'classes': [d.class_name for d in samples.list_data_sets],
+        'data_type': samples.xs.dtype.name,
+    }
+
+def samples_from_message (message):
+    """
+    Create the samples sent by the master.
+    :rtype: dataset.Samples
+    """
+    return dataset.samples_from_arrays (message ['rows'], message ['classes'], message ['data_type'])
+
+class Run_Writer:
+    """
+    Writes the rows of the tasks of a run in repeat order, as they may arrive in any order.
+    """
+    def __init__ (self, sink):
+        self.sink = sink
+        self.next_repeat = 0
+        self.pending = {}
+
+    def add (self, index_repeat, repeats):
+        """
+        Add the rows of a task and write the rows of the repeats that can be written in order.
+        :param repeats: the list returned by Executor.execute.
+        """
+        self.pending [index_repeat] = repeats
+        while self.next_repeat in self.pending:
+            self.write (self.next_repeat)
+            self.next_repeat += 1
+
+    def write (self, index_repeat):
+        for repeat in self.pending.pop (index_repeat):
+            self.sink.write_repeat (index_repeat, repeat)
+
+    def close (self):
+        """
+        Write the rows of the remaining repeats, if some repeat failed, and close the sink.
+        """
+        for index_repeat in sorted (self.pending.keys ()):
+            self.write (index_repeat)
+        self.sink.close ()
+
+class Campaign_Writer:
+    """
+    Writes the rows of the tasks of a campaign with a sink per run.
+    The sink of a run is opened when its first task arrives and closed when all its repeats are written, so only the
+    runs in progress have open files.
+    """
+    def __init__ (self, a_campaign):
+        """
+        :type a_campaign: Campaign
+        """
+        self.campaign = a_campaign
+        self.writers = {}
+
+    def add (self, task, repeats):
+        """
+        Write the rows of a task.
+        :param repeats: the list returned by Executor.execute.
+        """
+        run = Run (*task ['run'])
+        if run not in self.writers:
+            self.writers [run] = Run_Writer (self.open_sink (run))
+        writer = self.writers [run]
+        writer.add (task ['index_repeat'], repeats)
+        if writer.next_repeat == self.campaign.number_repeats:
+            writer.close ()
+            del self.writers [run]
+
+    def open_sink (self, run):
+        """
+        Create the sink of a run.
+        The data sets are loaded to know how many classes the run has.
+        """
+        algorithm = create_algorithm (run, self.campaign.load_samples (run.data_sets), self.campaign.split_mode)
+        partition = base_algorithm.run_partition (
+            run.algorithm, run.data_sets, run.parameters, run.seed, self.campaign.fraction_test)
+        if self.campaign.results_store is None:
+            suffix = base_algorithm.filename_suffix (run.data_sets, run.parameters, run.seed, self.campaign.fraction_test)
+            sink = result_sink.CSV_Sink (algorithm, suffix, self.campaign.output_format, self.campaign.classifier_format)
+        else:
+            sink = result_sink.Columnar_Sink (algorithm, self.campaign.results_store, partition)
+        if self.campaign.aggregates is not None:
+            sink = aggregates.Aggregate_Sink (algorithm, sink, self.campaign.aggregates, partition)
+        return sink
+
+    def close (self):
+        """
+        Close the sinks of the runs that did not receive all their repeats.
+        """
+        for writer in self.writers.values ():
+            writer.close ()
+        self.writers = {}
+
+class Background_Writer:
+    """
+    Writes the rows of the tasks of a campaign in a thread, so that a slow file system does not delay the dispatch of
+    tasks.  The thread writes all the rows that arrived while it was writing before waiting again.
+    """
+    def __init__ (self, writer):
+        """
+        :type writer: Campaign_Writer
+        """
+        self.writer = writer
+        self.queue = queue.Queue ()
+        self.error = None
+        self.thread = threading.Thread (target = self.run, name = 'writer')
+        self.thread.daemon = True
+        self.thread.start ()
+
+    def add (self, task, repeats):
+        """
+        Queue the rows of a task.
+        :param repeats: the list returned by Executor.execute.
+        """
+        if self.error is not None:
+            raise Exception ('[E] Writing the results failed:\n{}'.format (self.error))
+        self.queue.put ((task, repeats))
+
+    def backlog (self):
+        """
+        Return the number of tasks whose rows are waiting to be written.
+        """
+        return self.queue.qsize ()
+
+    def run (self):
+        stop = False
+        while not stop:
+            batch = [self.queue.get ()]
+            while True:
+                try:
+                    batch.append (self.queue.get_nowait ())
+                except queue.Empty:
+                    break
+            for item in batch:
+                if item is None:
+                    stop = True
+                elif self.error is None:
+                    try:
+                        self.writer.add (*item)
+                    except Exception:
+                        self.error = traceback.format_exc ()
+
+    def close (self):
+        """
+        Write the queued rows and close the writer.
+        """
+        self.queue.put (None)
+        self.thread.join ()
+        self.writer.close ()
+        if self.error is not None:
+            raise Exception ('[E] Writing the results failed:\n{}'.format (self.error))
@@ -0,0 +1,117 @@
+"""
+Writers of the files with the classifier output on the test set of each repeat.
+
+Each repeat is written in one block.  There are two formats:
+
+csv     one row per test sample with the predicted class, the real class and the repeat index.
+        The classes are written as they are represented in the data sets: a class number for the decision tree,
+        a one-hot vector for the neural network.
+
+binary  an append-only file of fixed-size records (see RECORD_DTYPE) with the predicted class number, the real class
+        number and the repeat index.  A vector whose first one is in column n-1 is stored as class number n, while a
+        neural network output without any one is stored as zero.  This is how the analysis scripts read the CSV
+        format.  The file can be read with numpy.fromfile (filename, dtype = RECORD_DTYPE).
+"""
+
+import csv
+import numpy
+
+CSV = 'csv'
+BINARY = 'binary'
+
+FORMATS = [CSV, BINARY]
+
+"""Extension of the files in each format."""
+EXTENSIONS = {
+    CSV: 'csv',
+    BINARY: 'bin',
+}
+
+"""Record of the binary classifier output files."""
+RECORD_DTYPE = numpy.dtype ([
+    ('predicted.class', '<i1'),
+    ('real.class', '<i1'),
+    ('run', '<i4'),
+])
+
+"""Line terminator of the CSV format, the same used by the csv module."""
+LINE_TERMINATOR = '\r\n'
+
+"""Buffer size of the classifier output files."""
+BUFFER_SIZE = 1 << 20
+
+def class_numbers (ys):
+    # type: (numpy.ndarray) -> numpy.ndarray
+    """
+    Convert class labels to class numbers.
+    Scalar labels are class numbers.  Vector labels are decoded as the one-based column of their first one, or zero if there is none.
+    """
+    ys = numpy.asarray (ys)
+    if ys.ndim == 1:
+        return ys
+    ones = ys == 1
+    return numpy.where (ones.any (axis = 1), ones.argmax (axis = 1) + 1, 0)
+
+class CSV_Writer:
+    def __init__ (self, filename, header_row):
+        self.file = open (filename, 'w', BUFFER_SIZE)
+        self.file.write (','.join ('"{}"'.format (h) for h in header_row) + LINE_TERMINATOR)
+        self.writer = csv.writer (self.file, delimiter = ',', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
+
+    def write (self, classifier_ys, test_ys, index_repeat):
+        """
+        Write the classifier output of a repeat.
+        :param classifier_ys: The classifier output, a one or two-dimensional array.
+        :param test_ys: The correct classes, with the same shape as the classifier output.
+        :param index_repeat: the repeat index.
+        """
+        number_records = len (test_ys)
+        classifier_ys = numpy.reshape (classifier_ys, (number_records, -1))
+        test_ys = numpy.reshape (test_ys, (number_records, -1))
+        if classifier_ys.dtype.kind in 'iu' and test_ys.dtype.kind in 'iu':
+            block = numpy.column_stack ((classifier_ys, test_ys, numpy.full (number_records, index_repeat)))
+            text = block.astype (numpy.int64).astype (str)
+            self.file.write (''.join (','.join (row) + LINE_TERMINATOR for row in text))
+        else:
+            # float and string classes are formatted by the csv module, as numpy formats them differently
+            self.writer.writerows (
+                list (an_y) + list (a_test_y) + [index_repeat]
+                for an_y, a_test_y in zip (classifier_ys, test_ys))
+
+    def close (self):
+        self.file.close ()
+
+class Binary_Writer:
+    def __init__ (self, filename):
+        self.file = open (filename, 'ab', BUFFER_SIZE)
+
+    def write (self, classifier_ys, test_ys, index_repeat):
+        """
+        Append the classifier output of a repeat.
+        :param classifier_ys: The classifier output, a one or two-dimensional array.
+        :param test_ys: The correct classes, with the same shape as the classifier output.
+        :param index_repeat: the repeat index.
+        """
+        records = numpy.empty (len (test_ys), dtype = RECORD_DTYPE)
+        records ['predicted.class'] = class_numbers (classifier_ys)
+        records ['real.class'] = class_numbers (test_ys)
+        records ['run'] = index_repeat
+        records.tofile (self.file)
+
+    def close (self):
+        self.file.close ()
+
+def open_writer (output_format, filename_prefix, header_row):
+    """
+    Create the writer of a classifier output file.
+    :param output_format: one of FORMATS.
+    :param filename_prefix: the filename without the extension.
+    :param header_row: the column names of the CSV format.
+    """
+    filename = '{}.{}'.format (filename_prefix, EXTENSIONS [output_format])
+    if output_format == CSV:
+        return CSV_Writer (filename, header_row)
+    elif output_format == BINARY:
+        return Binary_Writer (filename)
+    else:
+        raise Exception ('[E] Unknown classifier output format {}'.format (output_format))
@@ -0,0 +1,299 @@
+"""
+Columnar store of classifier results.
+
+A store is a directory shared by all the runs of a campaign.  Runs are partitioned by key=value sub-directories, for
+instance algorithm=decision-tree/data_sets=DT_ALL.dataset/parameters=dt.yaml/seed=7/fraction_test=0.3.  Each partition holds
+one directory per table, with a schema.yaml file listing the columns and their numpy types, and one binary file per
+column.  Appending rows appends raw values to every column file while holding a lock on the table, so concurrent
+jobs can safely write to the same partition.  The values of an append that was interrupted before writing all the
+column files are discarded by the next append.
+
+A table may also have a ragged column, where each row holds a variable length array.  Its values are appended to
+file values.bin and the length of each row is kept in column values.length.
+
+Analysis code selects partitions by their keys and only reads the files of the requested columns, see function load.
+This module can also be run to export columns of a store to a CSV file.
+"""
+
+import argparse
+import csv
+import fcntl
+import numpy
+import os
+import os.path
+import yaml
+
+SCHEMA = 'schema.yaml'
+LOCK = 'lock'
+
+"""Name of the ragged column of a table."""
+RAGGED = 'values'
+
+"""Name of the column with the length of each row of the ragged column."""
+RAGGED_LENGTH = 'values.length'
+
+def partition_path (directory, partition):
+    # type: (str, list) -> str
+    """
+    Compute the directory of a partition.
+    :param directory: the store directory.
+    :param partition: list of (key, value) pairs, from the outermost to the innermost level.
+    """
+    return os.path.join (directory, *['{}={}'.format (key, value) for key, value in partition])
+
+class Table:
+    """
+    A table of a partition opened for appending rows.
+    """
+    def __init__ (self, directory, columns, ragged_type = None):
+        """
+        Open or create a table.
+        :param directory: the table directory.
+        :param columns: list of (name, numpy type) pairs.
+        :param ragged_type: numpy type of the ragged column, or None if the table does not have one.
+        """
+        self.directory = directory
+        self.columns = [(name, numpy.dtype (dtype)) for name, dtype in columns]
+        if ragged_type is not None:
+            self.columns.append ((RAGGED_LENGTH, numpy.dtype ('<i8')))
+            self.ragged_type = numpy.dtype (ragged_type)
+        else:
+            self.ragged_type = None
+        schema = {
+            'columns': [[name, dtype.str] for name, dtype in self.columns],
+            'ragged': None if self.ragged_type is None else self.ragged_type.str,
+        }
+        try:
+            os.makedirs (directory)
+        except OSError:
+            if not os.path.isdir (directory):
+                raise
+        with self.lock ():
+            schema_filename = os.path.join (directory, SCHEMA)
+            if os.path.exists (schema_filename):
+                with open (schema_filename, 'r') as fd:
+                    if yaml.safe_load (fd) != schema:
+                        raise Exception ('[E] Table {} has a different schema'.format (directory))
+            else:
+                with open (schema_filename, 'w') as fd:
+                    yaml.safe_dump (schema, fd)
+
+    def lock (self):
+        return _Lock (os.path.join (self.directory, LOCK))
+
+    def append (self, rows, ragged_rows = None):
+        """
+        Append rows to the table.
+        :param rows: list of rows, each one a list with a value per column, excluding the ragged column.
+        :param ragged_rows: list with the array of the ragged column of each row.
+        """
+        if self.ragged_type is not None:
+            rows = [list (row) + [len (values)] for row, values in zip (rows, ragged_rows)]
+        with self.lock ():
+            self.repair ()
+            for index, (name, dtype) in enumerate (self.columns):
+                column = numpy.array ([row [index] for row in rows], dtype = dtype)
+                with open (os.path.join (self.directory, name + '.bin'), 'ab') as fd:
+                    column.tofile (fd)
+            if self.ragged_type is not None:
+                with open (os.path.join (self.directory, RAGGED + '.bin'), 'ab') as fd:
+                    for values in ragged_rows:
+                        numpy.asarray (values, dtype = self.ragged_type).tofile (fd)
+
+    def append_columns (self, columns):
+        """
+        Append rows given as a dictionary of column arrays of the same length.
+        Only for tables without a ragged column.
+        """
+        with self.lock ():
+            self.repair ()
+            for name, dtype in self.columns:
+                with open (os.path.join (self.directory, name + '.bin'), 'ab') as fd:
+                    numpy.asarray (columns [name], dtype = dtype).tofile (fd)
+
+    def repair (self):
+        """
+        Truncate the column files to the rows that were completely written, so that an interrupted append does not
+        misalign the following rows.  Must be called while holding the lock.
+        """
+        number_rows = min (
+            column_length (os.path.join (self.directory, name + '.bin'), dtype)
+            for name, dtype in self.columns)
+        if self.ragged_type is not None:
+            ragged_filename = os.path.join (self.directory, RAGGED + '.bin')
+            lengths = numpy.fromfile (
+                os.path.join (self.directory, RAGGED_LENGTH + '.bin'), dtype = numpy.dtype ('<i8'), count = number_rows
+            ) if number_rows > 0 else numpy.zeros (0, dtype = numpy.dtype ('<i8'))
+            # the values of a row are written after its columns
+            ends = numpy.cumsum (lengths)
+            number_rows = int (numpy.searchsorted (ends, column_length (ragged_filename, self.ragged_type), side = 'right'))
+            _truncate (ragged_filename, (int (ends [number_rows - 1]) if number_rows > 0 else 0) * self.ragged_type.itemsize)
+        for name, dtype in self.columns:
+            _truncate (os.path.join (self.directory, name + '.bin'), number_rows * dtype.itemsize)
+
+def _truncate (filename, size):
+    """
+    Truncate a file that is longer than the given size in bytes.
+    """
+    if os.path.exists (filename) and os.path.getsize (filename) > size:
+        with open (filename, 'r+b') as fd:
+            fd.truncate (size)
+
+class _Lock:
+    """
+    Exclusive lock on a file, used in a with statement.
+    """
+    def __init__ (self, filename):
+        self.filename = filename
+        self.fd = None
+
+    def __enter__ (self):
+        self.fd = open (self.filename, 'a')
+        fcntl.flock (self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__ (self, exc_type, exc_value, traceback):
+        fcntl.flock (self.fd, fcntl.LOCK_UN)
+        self.fd.close ()
+        return False
+
+def list_partitions (directory, table):
+    """
+    Find the partitions of a store that have the given table.
+    :return: a list of tuples with the table directory and a dictionary with the partition keys.
+    """
+    result = []
+    for path, sub_directories, _files in os.walk (directory):
+        sub_directories.sort ()
+        if os.path.basename (path) == table and os.path.exists (os.path.join (path, SCHEMA)):
+            keys = {}
+            relative = os.path.relpath (os.path.dirname (path), directory)
+            for level in relative.split (os.sep):
+                if '=' in level:
+                    key, value = level.split ('=', 1)
+                    keys [key] = value
+            result.append ((path, keys))
+    return result
+
+def column_length (filename, dtype):
+    """
+    Return the number of values in a column file, which may not exist if no row was appended.
+    """
+    if os.path.exists (filename):
+        return os.path.getsize (filename) // dtype.itemsize
+    else:
+        return 0
+
+def load (directory, table, columns = None, filters = None):
+    """
+    Load columns of a table from all the partitions of a store that match the given filters.
+    Only the files of the requested columns are read.
+    :param directory: the store directory.
+    :param table: the table name.
+    :param columns: list of column names, or None to load all of them.  Partition keys can also be requested.
+    :param filters: dictionary mapping partition keys to a list of accepted values (as strings).
+    :return: a dictionary mapping column names to arrays.  The ragged column is returned as a list of arrays.
+    """
+    filters = {} if filters is None else filters
+    result = {}
+    for path, keys in list_partitions (directory, table):
+        if any (str (keys.get (key)) not in [str (v) for v in values] for key, values in filters.items ()):
+            continue
+        with open (os.path.join (path, SCHEMA), 'r') as fd:
+            schema = yaml.safe_load (fd)
+        types = dict ((name, numpy.dtype (dtype)) for name, dtype in schema ['columns'])
+        names = [name for name, _dtype in schema ['columns']] + (
+            [RAGGED] if schema ['ragged'] is not None else []) + sorted (keys.keys ())
+        selected = names if columns is None else columns
+        # an interrupted append may leave some column files longer than others until the next append repairs them
+        number_rows = min (
+            column_length (os.path.join (path, name + '.bin'), dtype)
+            for name, dtype in types.items ())
+        for name in selected:
+            if name in keys:
+                column = numpy.array ([keys [name]] * number_rows)
+            elif name == RAGGED:
+                lengths = numpy.fromfile (os.path.join (path, RAGGED_LENGTH + '.bin'), dtype = types [RAGGED_LENGTH], count = number_rows)
+                values = numpy.fromfile (os.path.join (path, RAGGED + '.bin'), dtype = numpy.dtype (schema ['ragged']))
+                column = numpy.split (values [:lengths.sum ()], numpy.cumsum (lengths) [:-1]) if number_rows > 0 else []
+            elif name in types:
+                column = numpy.fromfile (os.path.join (path, name + '.bin'), dtype = types [name], count = number_rows)
+            else:
+                raise Exception ('[E] Table {} does not have column {}'.format (path, name))
+            if name == RAGGED:
+                result.setdefault (name, []).extend (column)
+            else:
+                result.setdefault (name, []).append (column)
+    return dict (
+        (name, value if name == RAGGED else numpy.concatenate (value))
+        for name, value in result.items ()
+    )
+
+def column_names (directory, table):
+    """
+    Return the partition keys followed by the columns of a table, except the ragged column, in schema order.
+    """
+    partitions = list_partitions (directory, table)
+    if len (partitions) == 0:
+        return []
+    path, keys = partitions [0]
+    with open (os.path.join (path, SCHEMA), 'r') as fd:
+        schema = yaml.safe_load (fd)
+    return sorted (keys.keys ()) + [name for name, _dtype in schema ['columns'] if name != RAGGED_LENGTH]
+
+def main ():
+    args = parse_arguments ()
+    filters = {}
+    for a_filter in args.where:
+        key, value = a_filter.split ('=', 1)
+        filters.setdefault (key, []).append (value)
+    names = args.column if len (args.column) > 0 else column_names (args.DIRECTORY, args.TABLE)
+    data = load (args.DIRECTORY, args.TABLE, names, filters)
+    with open (args.output, 'w') as fd:
+        writer = csv.writer (fd, delimiter = ',', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
+        writer.writerow (names)
+        for row in zip (*[data [name].tolist () for name in names if name in data]):
+            writer.writerow (row)
+
+def parse_arguments ():
+    parser = argparse.ArgumentParser (
+        description = 'Export columns of a table of a columnar results store to a CSV file.'
+    )
+    parser.add_argument (
+        'DIRECTORY',
+        type = str,
+        help = 'the store directory'
+    )
+    parser.add_argument (
+        'TABLE',
+        type = str,
+        choices = ['results', 'classifier', 'output'],
+        help = 'the table to export'
+    )
+    parser.add_argument (
+        '--column',
+        type = str,
+        action = 'append',
+        default = [],
+        metavar = 'NAME',
+        help = 'column to export.  By default all columns except the ragged one are exported.'
+    )
+    parser.add_argument (
+        '--where',
+        type = str,
+        action = 'append',
+        default = [],
+        metavar = 'KEY=VALUE',
+        help = 'only export partitions where the partition key has this value.  Repeating a key accepts any of the values.'
+    )
+    parser.add_argument (
+        '--output',
+        type = str,
+        required = True,
+        metavar = 'PATH',
+        help = 'the CSV file to create'
+    )
+    return parser.parse_args ()
+
+if __name__ == '__main__':
+    main ()
@@ -7,6 +7,21 @@ VENTILATOR = 4557
 """Port number used by the sink to receive results from the workers."""
 SINK = 4558
 
+"""Port number used by the master to send samples to the workers."""
+DATA_SERVER = 4559
+
+"""Default maximum size in megabytes of the samples cached by a worker."""
+CACHE_MEMORY = 1024
+
+"""Default number of seconds between the heartbeats sent by a worker."""
+HEARTBEAT = 5.0
+
+"""Default number of seconds a task is leased to a worker without receiving a heartbeat for it."""
+LEASE = 60.0
+
+"""Default number of times a task is dispatched before it is considered lost."""
+MAX_ATTEMPTS = 3
+
 def argument_server (parser):
     parser.add_argument (
         "--server",
@@ -22,7 +37,7 @@ def argument_ventilator (parser):
         type = int,
         default = VENTILATOR,
         metavar = "PORT",
-        help = "port number used by the ventilator to send requests to the workers"
+        help = "port number used by the ventilator to send requests to the workers, which ask for them when they are idle"
     )
 
 def argument_sink (parser):
@@ -34,6 +49,190 @@ def argument_sink (parser):
         help = "port number used by the sink to receive results from the workers"
     )
 
+def argument_data_server (parser):
+    parser.add_argument (
+        "--data-server",
+        type = int,
+        default = DATA_SERVER,
+        metavar = "PORT",
+        help = "port number used by the master to send samples to the workers"
+    )
+
+def argument_data_source (parser):
+    parser.add_argument (
+        "--data-source",
+        type = str,
+        choices = ["file", "master"],
+        default = "file",
+        help = """Where a worker gets the samples that are not in its cache.
+
+            file, read the data sets file named in the task, which requires the same file system as the master.  If the file is missing or its contents changed, the samples are requested from the master.
+            master, request the samples from the master."""
+    )
+
+def argument_cache_memory (parser):
+    parser.add_argument (
+        "--cache-memory",
+        type = int,
+        default = CACHE_MEMORY,
+        metavar = "MB",
+        help = "maximum size of the samples kept in memory by a worker.  The least recently used samples are evicted first."
+    )
+
+def argument_heartbeat (parser):
+    parser.add_argument (
+        "--heartbeat",
+        type = float,
+        default = HEARTBEAT,
+        metavar = "SECONDS",
+        help = "time between the heartbeats sent by a worker to the master, while idle and while performing a task"
+    )
+
+def argument_lease (parser):
+    parser.add_argument (
+        "--lease",
+        type = float,
+        default = LEASE,
+        metavar = "SECONDS",
+        help = "a task is dispatched again if no heartbeat for it arrives within this time.  It should be several times the heartbeat period of the workers."
+    )
+
+def argument_max_attempts (parser):
+    parser.add_argument (
+        "--max-attempts",
+        type = int,
+        default = MAX_ATTEMPTS,
+        metavar = "N",
+        help = "number of times a task whose lease expired is dispatched before it is reported as lost"
+    )
+
+def argument_task_time_limit (parser):
+    parser.add_argument (
+        "--task-time-limit",
+        type = float,
+        default = None,
+        metavar = "SECONDS",
+        help = "workers kill a task that runs for longer than this and report it as failed.  By default tasks have no time limit."
+    )
+
+def argument_cost_history (parser):
+    parser.add_argument (
+        "--cost-history",
+        type = str,
+        default = None,
+        metavar = "PATH",
+        help = "YAML file with the task timings used to predict task costs, see module cost_model.  The timings of this campaign are appended to it."
+    )
+
+def argument_metrics (parser):
+    parser.add_argument (
+        "--metrics",
+        type = str,
+        default = None,
+        metavar = "PATH",
+        help = "file where the metrics of the campaign or of the service are written periodically, in the Prometheus text format.  See module metrics."
+    )
+
+def argument_trees (parser):
+    parser.add_argument (
+        "--trees",
+        type = str,
+        nargs = "+",
+        default = [],
+        metavar = "STORE",
+        help = "tree stores written by decision tree runs with option --classifier-format binary.  All their trees are members of the ensemble."
+    )
+
+def argument_networks (parser):
+    parser.add_argument (
+        "--networks",
+        type = str,
+        nargs = "+",
+        default = [],
+        metavar = "STORE",
+        help = "weight stores written by neural network runs with option --classifier-format binary.  All their networks are members of the ensemble."
+    )
+
+def argument_endpoint (parser):
+    parser.add_argument (
+        "--endpoint",
+        type = str,
+        default = None,
+        metavar = "ENDPOINT",
+        help = "ZeroMQ endpoint, such as ipc:///tmp/optigrape-inference or tcp://127.0.0.1:5570, where batches of records are received.  By default they are read from the standard input."
+    )
+
+def argument_ipc (parser):
+    parser.add_argument (
+        "--ipc",
+        type = str,
+        default = None,
+        metavar = "PATH",
+        help = "use inter-process endpoints PATH.ventilator, PATH.sink and PATH.data instead of TCP ports.  The master and the workers must run in the same machine."
+    )
+
+def arguments_sockets (parser):
+    parser.add_argument (
+        "--io-threads",
+        type = int,
+        default = None,
+        metavar = "N",
+        help = "number of ZeroMQ I/O threads.  One thread handles about a gigabyte per second."
+    )
+    parser.add_argument (
+        "--send-hwm",
+        type = int,
+        default = None,
+        metavar = "N",
+        help = "maximum number of outgoing messages queued per peer of a socket (ZeroMQ default is 1000)"
+    )
+    parser.add_argument (
+        "--receive-hwm",
+        type = int,
+        default = None,
+        metavar = "N",
+        help = "maximum number of incoming messages queued per peer of a socket (ZeroMQ default is 1000)"
+    )
+    parser.add_argument (
+        "--linger",
+        type = int,
+        default = None,
+        metavar = "MILLISECONDS",
+        help = "time that unsent messages are kept after closing a socket, -1 to wait until they are sent (ZeroMQ default is -1)"
+    )
+    parser.add_argument (
+        "--tcp-keepalive",
+        type = int,
+        default = None,
+        metavar = "SECONDS",
+        help = "enable TCP keepalive probes after this idle time and with this interval, to detect peers in dead hosts"
+    )
+
+def argument_campaign (parser):
+    parser.add_argument (
+        "--campaign",
+        type = str,
+        required = True,
+        metavar = "PATH",
+        help = "YAML file describing the runs of the campaign, see module campaign"
+    )
+
+def argument_workers (parser):
+    parser.add_argument (
+        "--workers",
+        type = int,
+        default = 1,
+        metavar = "N",
+        help = "number of workers.  Workers request a task when they are idle.  The master uses N to predict the campaign makespan, and stops N workers at the end of the campaign."
+    )
+
+def argument_local (parser):
+    parser.add_argument (
+        "--local",
+        action = "store_true",
+        help = "start the workers in this machine, connected through the loopback interface or through the inter-process endpoints given by --ipc"
+    )
+
 def data_set (parser):
     parser.add_argument (
         "--data-set",
@@ -71,6 +270,18 @@ def fraction_test (parser):
         help = "Fraction of the data set to be used as test set"
     )
 
+def split_mode (parser):
+    parser.add_argument (
+        "--split-mode",
+        type = str,
+        choices = ["compatible", "vectorized"],
+        default = "compatible",
+        help = """How rows are assigned to the train and test sets.
+
+            compatible, one draw per row in the same order as previous versions, so a seed gives the same partitions.
+            vectorized, the assignments of all rows are drawn in a single call."""
+    )
+
 def number_repeats (parser):
     parser.add_argument (
         "--number-repeats",
@@ -80,6 +291,112 @@ def number_repeats (parser):
         help = "how many repeats to perform"
     )
 
+def data_type (parser):
+    parser.add_argument (
+        "--data-type",
+        type = str,
+        choices = ["float64", "float32"],
+        default = "float64",
+        help = "floating point type used to store the data sets in memory.  Use float32 to halve the memory used by large data sets."
+    )
+
+def cache_directory (parser):
+    parser.add_argument (
+        "--cache",
+        dest = "cache_directory",
+        type = str,
+        nargs = "?",
+        const = "",
+        default = None,
+        metavar = "DIRECTORY",
+        help = "cache parsed data set files in binary form.  Without a DIRECTORY, cache files are placed next to each data set file."
+    )
+
+def jobs (parser):
+    parser.add_argument (
+        "--jobs",
+        type = int,
+        default = None,
+        metavar = "N",
+        help = "run the repeats in a pool of N processes.  With this option each repeat uses its own pseudo-random number generator derived from the seed and the repeat index, so results do not depend on N.  Without it, all repeats run in this process and share a single generator."
+    )
+
+def output_format (parser):
+    parser.add_argument (
+        "--output-format",
+        type = str,
+        choices = ["csv", "binary"],
+        default = "csv",
+        help = """Format of the file with the classifier output on the test sets.
+
+            csv, one text row per test sample with the predicted and real classes and the repeat index.
+            binary, fixed-size records with the predicted and real class numbers and the repeat index, see module classifier_output."""
+    )
+
+def classifier_format (parser):
+    parser.add_argument (
+        "--classifier-format",
+        type = str,
+        choices = ["csv", "binary"],
+        default = "csv",
+        help = """Format of the file with the classifiers of each repeat.
+
+            csv, one text row per repeat.
+            binary, a store of typed arrays that can be memory mapped, see modules tree_store and weight_store."""
+    )
+
+def results_store (parser):
+    parser.add_argument (
+        "--results-store",
+        type = str,
+        default = None,
+        metavar = "DIRECTORY",
+        help = "append the results, classifiers and classifier output to the partition of this run in a columnar store shared by a campaign, instead of writing CSV files.  See module columnar_store."
+    )
+
+def shard (parser):
+    parser.add_argument (
+        "--shard",
+        type = str,
+        default = None,
+        metavar = "INDEX/COUNT",
+        help = "only perform the repeats, or grid points of repeats, of shard INDEX (starting at zero) of COUNT, and write their rows to a shard file instead of the results files.  Use sge to take the shard from the variables of a Sun Grid Engine array job.  Option --jobs is ignored.  See module shards."
+    )
+
+def shard_directory (parser):
+    parser.add_argument (
+        "--shard-directory",
+        type = str,
+        default = ".",
+        metavar = "DIRECTORY",
+        help = "directory where shard files are written"
+    )
+
+def merge_shards (parser):
+    parser.add_argument (
+        "--merge-shards",
+        type = str,
+        default = None,
+        metavar = "DIRECTORY",
+        help = "merge the shard files of this run found in DIRECTORY and write their rows to the results files or store, as if the run had been performed with option --jobs"
+    )
+
+def aggregates (parser):
+    parser.add_argument (
+        "--aggregates",
+        type = str,
+        default = None,
+        metavar = "DIRECTORY",
+        help = "keep the confusion matrix and the mean and variance of the scores of the run, per grid point, and checkpoint them to a YAML file in DIRECTORY.  Not used with option --shard, use it when merging.  See module aggregates."
+    )
+
+def profile (parser):
+    parser.add_argument (
+        "--profile",
+        action = "store_true",
+        help = "profile the repeats with cProfile and dump the statistics next to the file with the time and memory used by each phase of the run"
+    )
+
 def RNG_seed (parser):
     parser.add_argument (
         "--RNG-seed",
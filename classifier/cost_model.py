@@ -0,0 +1,148 @@
+"""
+Model of the cost of campaign tasks, used by the master to dispatch the longest tasks first.
+
+The cost of a task is the wall time a worker takes to perform it.  It is modelled as proportional to the size of the
+data sets, rows times columns, with a rate in seconds per value.  The rate is the total time of the recorded tasks
+divided by their total size, estimated for each algorithm and parameters file contents.  When there are no timings for
+some parameters, the rate of the algorithm is used, then the rate of all timings and finally DEFAULT_RATE, so that
+without any timings tasks are ordered by size.
+
+The timings are appended to a YAML file, so that the model improves from one campaign to the next.
+"""
+
+import collections
+import heapq
+import os.path
+import yaml
+
+"""Seconds per data set value used when there are no timings."""
+DEFAULT_RATE = 1e-6
+
+class Cost_Model:
+    def __init__ (self, filename = None):
+        """
+        :param filename: the file with the timings of previous campaigns, or None to only use the timings of this campaign.
+        """
+        self.filename = filename
+        self.records = []
+        self.new_records = []
+        self.totals = {}
+        if filename is not None and os.path.exists (filename):
+            with open (filename, 'r') as fd:
+                for record in yaml.safe_load (fd) or []:
+                    self.add_record (record)
+            print ("Read {0} task timings from {1}".format (len (self.records), filename))
+
+    def add (self, features, seconds, worker = None):
+        """
+        Record the time taken by a task.
+        :param features: dictionary returned by method Campaign.cost_features.
+        """
+        record = dict (features)
+        record ['seconds'] = seconds
+        record ['worker'] = worker
+        self.add_record (record)
+        self.new_records.append (record)
+
+    def add_record (self, record):
+        self.records.append (record)
+        for key in _keys (record):
+            total = self.totals.setdefault (key, [0.0, 0])
+            total [0] += record ['seconds']
+            total [1] += record ['rows'] * record ['columns']
+
+    def rate (self, features):
+        """
+        Return the estimated seconds per data set value of tasks with the given features.
+        """
+        for key in _keys (features):
+            seconds, size = self.totals.get (key, (0.0, 0))
+            if size > 0 and seconds > 0:
+                return seconds / size
+        return DEFAULT_RATE
+
+    def predict (self, features):
+        """
+        Return the estimated wall time in seconds of a task with the given features.
+        """
+        return self.rate (features) * features ['rows'] * features ['columns']
+
+    def save (self):
+        """
+        Append the timings recorded in this campaign to the file.
+        """
+        if self.filename is None or len (self.new_records) == 0:
+            return
+        with open (self.filename, 'a') as fd:
+            yaml.safe_dump (self.new_records, fd, default_flow_style = False)
+        self.new_records = []
+
+class Task_Queue:
+    """
+    Campaign tasks waiting to be dispatched, longest expected first.
+    All the tasks of a run have the same predicted cost, so tasks are kept in a queue per run and the next task is taken
+    from the run with the highest predicted cost, which reflects the timings recorded so far.  Ties are broken by the
+    order of the runs in the campaign.
+    """
+    def __init__ (self, model, features):
+        """
+        :type model: Cost_Model
+        :param features: dictionary mapping each run to its features.
+        """
+        self.model = model
+        self.features = features
+        self.queues = collections.OrderedDict ((run, collections.deque ()) for run in features)
+        self.size = 0
+
+    def __len__ (self):
+        return self.size
+
+    def predict (self, task):
+        """
+        Return the predicted cost of a task.
+        """
+        return self.model.predict (self.features [_run (task)])
+
+    def append (self, task):
+        self.queues [_run (task)].append (task)
+        self.size += 1
+
+    def appendleft (self, task):
+        """
+        Add a task before the other tasks of its run, used for tasks that are dispatched again.
+        """
+        self.queues [_run (task)].appendleft (task)
+        self.size += 1
+
+    def popleft (self):
+        """
+        Remove and return the next task to dispatch.
+        """
+        costs = [(self.model.predict (self.features [run]), run) for run, queue in self.queues.items () if len (queue) > 0]
+        _cost, run = max (costs, key = lambda cost_run: cost_run [0])
+        self.size -= 1
+        return self.queues [run].popleft ()
+
+def _run (task):
+    return tuple (task ['run'])
+
+def _keys (features):
+    """
+    Return the keys of the totals used to estimate the rate, from the most to the least specific.
+    """
+    return [
+        (features ['algorithm'], features ['parameters']),
+        (features ['algorithm'], None),
+        (None, None),
+    ]
+
+def makespan (costs, number_workers):
+    """
+    Compute the makespan of tasks dispatched in the given order to the first idle worker.
+    :param costs: the wall time of each task.
+    :return: the time when the last task finishes.
+    """
+    finish_times = [0.0] * max (number_workers, 1)
+    for cost in costs:
+        heapq.heappush (finish_times, heapq.heappop (finish_times) + cost)
+    return max (finish_times)
@@ -1,20 +1,62 @@
 import csv
+import hashlib
+import numpy
 import yaml
 
+import dataset_cache
+
+"""Floating point types that can be used to store the rows of a data set."""
+DATA_TYPES = {
+    'float64': numpy.float64,
+    'float32': numpy.float32,
+}
+
+"""Default floating point type of the rows of a data set."""
+DATA_TYPE = 'float64'
+
+"""Split mode that draws one assignment per row in the same order as previous versions, so that a seed gives the same partitions."""
+SPLIT_COMPATIBLE = 'compatible'
+
+"""Split mode that draws the assignments of the rows of all data sets in a single call."""
+SPLIT_VECTORIZED = 'vectorized'
+
+SPLIT_MODES = [SPLIT_COMPATIBLE, SPLIT_VECTORIZED]
+
 class DataSet:
     CLASS_COUNTER = 0
 
-    def __init__ (self, filename, class_name, has_header):
-        print ("Reading CSV file {0}...".format (filename))
+    def __init__ (self, filename, class_name, has_header, data_type = DATA_TYPE, cache_directory = None, rows = None):
+        """
+        Read a data set from a TSV file.
+        The rows are stored in a single two-dimensional numpy array.
+        :param filename: the TSV file with the data set.
+        :param class_name: the class of the records in the data set.
+        :param has_header: whether the first line of the file contains the attribute names.
+        :param data_type: one of the keys of DATA_TYPES.
+        :param cache_directory: where parsed files are cached (see module dataset_cache), or None to always parse the file.
+        :param rows: the rows of the data set if they are already in memory.  The file is then not read and filename only describes where the rows come from.
+        """
         self.filename = filename
-        with open (filename, "r") as fd:
-            reader = csv.reader (fd, delimiter = '\t', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
-            if has_header:
-                reader.next ()
-            self.rows = [row for row in reader]
+        if rows is None:
+            print ("Reading CSV file {0}...".format (filename))
+            self.header, self.rows = read_data_set (filename, has_header, data_type, cache_directory)
+        else:
+            self.header = None
+            self.rows = numpy.array (rows, dtype = DATA_TYPES [data_type], ndmin = 2)
         self.class_name = class_name
         DataSet.CLASS_COUNTER += 1
         self.class_ID = DataSet.CLASS_COUNTER
+        self._from_file = rows is None
+        self._content_hash = None
+
+    def content_hash (self):
+        """
+        Return the SHA-1 digest of the contents of the data set file, which is computed once, or None if the rows were
+        given in memory.
+        """
+        if self._content_hash is None and self._from_file:
+            self._content_hash = dataset_cache.content_hash (self.filename)
+        return self._content_hash
 
     def split_two_sets (self, fraction_second, RNG):
         """
@@ -23,39 +65,29 @@ class DataSet:
         :type RNG: numpy.random.RandomState
         :param RNG:
         :param fraction_second: probability that an element is added to the second set.
-        :return: A pair of non-empty lists
+        :return: A pair of non-empty arrays
         """
-        result = {0: [], 1:[]}
-        for element in self.rows [1:]:
-            index = RNG.binomial (1, fraction_second)
-            result [index].append (element)
-        if len (result [0]) == 0:
-            index = 0
-        elif len (result [1]) == 0:
-            index = 1
-        else:
-            index = RNG.binomial (1, fraction_second)
-        result [index].append (self.rows [0])
-        return result [0], result [1]
+        first, second = split_indexes (len (self.rows), fraction_second, RNG)
+        return self.rows [first], self.rows [second]
 
     def __str__ (self):
         def add (result, rs, first = False):
-            for r in rs:
+            for r in rs.tolist ():
                 if shorten_horizontally:
                     result += "{0}, {2} {1}\n".format (
                         str (r [:idx1])[:-1],
                         str (r [idx2:])[1:],
-                        "... {0} columns ...".format (len (self.rows [0]) - 10) if first else "..."
+                        "... {0} columns ...".format (self.rows.shape [1] - 10) if first else "..."
                     )
                 else:
                     result += "{0}\n".format (r)
                 first = False
             return result
         result = "Data set in file {0}\nClass {1}\n".format (self.filename, self.class_name)
-        shorten_horizontally = len (self.rows [0]) > 12
+        shorten_horizontally = self.rows.shape [1] > 12
         if shorten_horizontally:
             idx1 = 5
-            idx2 = len (self.rows [0]) - 5
+            idx2 = self.rows.shape [1] - 5
         if len (self.rows) > 12:
             result = add (result, self.rows [:5], True)
             result += "... {0} rows ...\n".format (len (self.rows) - 10)
@@ -64,14 +96,83 @@ class DataSet:
             result = add (result, self.rows)
         return result
 
+class Samples:
+    """
+    The rows of a list of data sets stacked in a single matrix, together with the class of each row.
+    Train and test sets are represented by index arrays into this matrix.
+    """
+    def __init__ (self, list_data_sets):
+        """
+        Stack the rows of the given data sets.
+        The rows of each data set become a view of the stacked matrix, so they are not kept twice in memory.
+        :type list_data_sets: list(DataSet)
+        """
+        self.list_data_sets = list_data_sets
+        sizes = [len (d.rows) for d in list_data_sets]
+        self.bounds = numpy.cumsum ([0] + sizes)
+        self.xs = numpy.concatenate ([d.rows for d in list_data_sets])
+        self.ys = numpy.repeat (numpy.array ([d.class_name for d in list_data_sets]), sizes, axis = 0)
+        self.IDs = numpy.repeat ([d.class_ID for d in list_data_sets], sizes)
+        for d, start, stop in zip (list_data_sets, self.bounds [:-1], self.bounds [1:]):
+            d.rows = self.xs [start:stop]
+
+    def split (self, fraction_second, RNG, mode = SPLIT_COMPATIBLE):
+        """
+        Randomly divide the rows into two sets.
+        Each data set with at least two rows contributes at least one row to each set.
+        :type fraction_second: float
+        :type RNG: numpy.random.RandomState
+        :param fraction_second: probability that a row is added to the second set.
+        :param mode: one of SPLIT_MODES.
+        :return: A pair of index arrays into the stacked matrix.
+        """
+        if mode == SPLIT_COMPATIBLE:
+            splits = [
+                split_indexes (stop - start, fraction_second, RNG)
+                for start, stop in zip (self.bounds [:-1], self.bounds [1:])
+            ]
+            return tuple (
+                numpy.concatenate ([s [index] + start for s, start in zip (splits, self.bounds [:-1])])
+                for index in range (2)
+            )
+        elif mode == SPLIT_VECTORIZED:
+            second = RNG.random_sample (len (self.xs)) < fraction_second
+            sizes = numpy.diff (self.bounds)
+            count_second = numpy.add.reduceat (second, self.bounds [:-1], dtype = int)
+            for start, size, count in zip (self.bounds [:-1], sizes, count_second):
+                if size == 1:
+                    second [start] = False
+                elif count == 0:
+                    second [start + RNG.randint (size)] = True
+                elif count == size:
+                    second [start + RNG.randint (size)] = False
+            return numpy.flatnonzero (~second), numpy.flatnonzero (second)
+        else:
+            raise Exception ('[E] Unknown split mode {}'.format (mode))
+
+    def function (self, indexes):
+        """
+        Return the function, i.e. the inputs and the classes, of the rows with the given indexes.
+        :type indexes: numpy.ndarray
+        :rtype: Function
+        """
+        result = Function ()
+        result.indexes = indexes
+        result.xs = self.xs [indexes]
+        result.ys = self.ys [indexes]
+        result.IDs = self.IDs [indexes]
+        return result
+
 class Function:
     def __init__ (self):
-        self.xs = []
-        self.ys = []
-        self.IDs = []
+        self.indexes = numpy.empty (0, dtype = int)
+        self.xs = numpy.empty ((0, 0))
+        self.ys = numpy.empty (0)
+        self.IDs = numpy.empty (0, dtype = int)
 
     def __str__ (self):
         def add (result, x, y, first = False):
+            x = x.tolist ()
             result += "{0} = ".format (y)
             if shorten_horizontally:
                 result += "{0}, {2} {1}\n".format (
@@ -93,7 +194,37 @@ class Function:
             #result += "{0} = {1}\n".format (y, x)
         return result
 
-def load_data_sets (config_filename):
+def read_data_set (filename, has_header, data_type = DATA_TYPE, cache_directory = None):
+    """
+    Read a data set file, using the binary cache if a cache directory is given.
+    :return: a tuple with the list of attribute names (or None) and a two-dimensional numpy array with the rows.
+    """
+    if cache_directory is None:
+        return read_data_file (filename, has_header, data_type)
+    result = dataset_cache.load (filename, has_header, data_type, cache_directory)
+    if result is None:
+        result = read_data_file (filename, has_header, data_type)
+        dataset_cache.store (filename, has_header, data_type, cache_directory, result [0], result [1])
+    return result
+
+def read_data_file (filename, has_header, data_type = DATA_TYPE):
+    """
+    Parse a TSV file with a data set.
+    Attribute names in the header row are quoted while the remaining rows only contain numbers.
+    :param filename: the TSV file with the data set.
+    :param has_header: whether the first line of the file contains the attribute names.
+    :param data_type: one of the keys of DATA_TYPES.
+    :return: a tuple with the list of attribute names (or None) and a two-dimensional numpy array with the rows.
+    """
+    with open (filename, "r") as fd:
+        header = None
+        if has_header:
+            reader = csv.reader ([fd.readline ()], delimiter = '\t', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
+            header = next (reader)
+        rows = numpy.loadtxt (fd, dtype = DATA_TYPES [data_type], delimiter = '\t', ndmin = 2)
+    return header, numpy.ascontiguousarray (rows)
+
+def load_data_sets (config_filename, data_type = DATA_TYPE, cache_directory = None):
     """
     Load a configuration file specifying which data sets to use.
     The file should use a YAML format.
@@ -104,27 +235,94 @@ def load_data_sets (config_filename):
     ...
     - {class: CLASSn, filename: FILENAMEn}
     has_header: BOOLEAN
+    :param data_type: one of the keys of DATA_TYPES.
+    :param cache_directory: where parsed files are cached (see module dataset_cache), or None to always parse the files.
     """
     with open (config_filename, "r") as fd:
         dictionary = yaml.load (fd)
-        result = [DataSet (d ["filename"], d ["class"], dictionary ["has_header"]) for d in dictionary ["datasets"]]
+        result = [
+            DataSet (d ["filename"], d ["class"], dictionary ["has_header"], data_type, cache_directory)
+            for d in dictionary ["datasets"]
+        ]
     return result
 
-def split_data_sets_train_test (list_data_sets, fraction_test, RNG):
+def data_sets_id (config_filename, data_type = DATA_TYPE):
     """
+    Compute the identifier of the samples of the data sets listed in a configuration file (see function load_data_sets).
+    It is the SHA-1 digest of the data type, the header flag, and the class and the content hash of each data set file,
+    so it changes when the contents of a data set file change but not when the files are moved.
+    :param data_type: one of the keys of DATA_TYPES.
+    :rtype: str
+    """
+    with open (config_filename, "r") as fd:
+        dictionary = yaml.load (fd)
+    result = hashlib.sha1 ()
+    result.update (repr ((data_type, dictionary ["has_header"])).encode ('utf-8'))
+    for d in dictionary ["datasets"]:
+        result.update (repr ((d ["class"], dataset_cache.content_hash (d ["filename"]))).encode ('utf-8'))
+    return result.hexdigest ()
 
+def records_id (list_data_sets):
+    """
+    Compute an identifier of the records of a list of data sets that does not depend on their classes, so runs on data
+    sets files that list the same files in the same order, with classes in different representations, have the same
+    identifier.  It is the SHA-1 digest of the content hash of each data set file.
+    :type list_data_sets: list(DataSet)
+    :return: the identifier, or None if the rows of some data set were given in memory.
+    """
+    hashes = [d.content_hash () for d in list_data_sets]
+    if None in hashes:
+        return None
+    result = hashlib.sha1 ()
+    for a_hash in hashes:
+        result.update (a_hash.encode ('utf-8'))
+    return result.hexdigest ()
+
+def samples_from_arrays (list_rows, list_class_names, data_type = DATA_TYPE):
+    """
+    Create the samples of data sets whose rows are already in memory, for instance to run a classifier algorithm from other Python code.
+    :param list_rows: list with the two-dimensional array of the rows of each data set.
+    :param list_class_names: list with the class of each data set.
+    :param data_type: one of the keys of DATA_TYPES.
+    :rtype: Samples
+    """
+    return Samples ([
+        DataSet (None, class_name, False, data_type, rows = rows)
+        for rows, class_name in zip (list_rows, list_class_names)
+    ])
+
+def split_indexes (size, fraction_second, RNG):
+    """
+    Randomly divide the indexes of a data set into two sets using one Bernoulli trial per row.
+    The first row is drawn last and goes to an empty set if there is one, so both sets are non-empty when size is at least two.
+    This is the sequence of draws used by previous versions, so a seed always gives the same partitions.
+    :param size: number of rows in the data set.
+    :param fraction_second: probability that a row is added to the second set.
     :type RNG: numpy.random.RandomState
-    :param list_data_sets:
-    :param fraction_test:
-    :return:
-    """
-    xs_splits = [d.split_two_sets (fraction_test, RNG) for d in list_data_sets]
-    ys_splits = [(len (xs [0]) * [d.class_name], len (xs [1]) * [d.class_name]) for xs, d in zip (xs_splits, list_data_sets)]
-    IDs_splits = [(len (xs [0]) * [d.class_ID], len (xs [1]) * [d.class_ID]) for xs, d in zip (xs_splits, list_data_sets)]
-    result = {0: Function (), 1: Function ()}
-    for xs, ys, IDs in zip (xs_splits, ys_splits, IDs_splits):
-        for index in range (2):
-            result [index].xs.extend (xs [index])
-            result [index].ys.extend (ys [index])
-            result [index].IDs.extend (IDs [index])
+    :return: A pair of index arrays.
+    """
+    if size == 0:
+        return numpy.empty (0, dtype = int), numpy.empty (0, dtype = int)
+    rest = numpy.arange (1, size)
+    second = RNG.binomial (1, fraction_second, size = size - 1) == 1
+    result = [rest [~second], rest [second]]
+    if len (result [0]) == 0:
+        index = 0
+    elif len (result [1]) == 0:
+        index = 1
+    else:
+        index = RNG.binomial (1, fraction_second)
+    result [index] = numpy.append (result [index], 0)
     return result [0], result [1]
+
+def split_data_sets_train_test (samples, fraction_test, RNG, mode = SPLIT_COMPATIBLE):
+    """
+    Randomly divide the rows of the data sets into a train and a test set.
+    :type samples: Samples
+    :type RNG: numpy.random.RandomState
+    :param fraction_test: probability that a row is added to the test set.
+    :param mode: one of SPLIT_MODES.
+    :return: A pair of functions with the train and test sets.
+    """
+    train_indexes, test_indexes = samples.split (fraction_test, RNG, mode)
+    return samples.function (train_indexes), samples.function (test_indexes)
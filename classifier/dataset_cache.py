@@ -0,0 +1,147 @@
+"""
+Binary cache of parsed data set files.
+
+Parsing a large TSV file is slow, so the first time a data set file is read its rows are saved in a numpy .npy file
+together with a YAML file holding the header row and the size, modification time and content hash of the data set
+file.  Later reads memory-map the .npy file instead of parsing the TSV file again.
+
+Cache files are stored either next to the data set file or in a cache directory shared by several data set files.
+"""
+
+import hashlib
+import numpy
+import os
+import os.path
+import yaml
+
+"""Value of the cache directory that places the cache files next to the data set file."""
+NEXT_TO_FILE = ''
+
+"""Size of the blocks used to compute the content hash of a data set file."""
+BLOCK_SIZE = 1 << 20
+
+def cache_filenames (filename, data_type, directory):
+    # type: (str, str, str) -> (str, str)
+    """
+    Compute the names of the files used to cache a data set file.
+    :param filename: the data set file.
+    :param data_type: the floating point type of the cached rows.
+    :param directory: the cache directory or NEXT_TO_FILE.
+    :return: a tuple with the name of the .npy file with the rows and the name of the YAML file with the header and the file signature.
+    """
+    if directory == NEXT_TO_FILE:
+        base = "{0}.{1}".format (filename, data_type)
+    else:
+        key = hashlib.sha1 (os.path.abspath (filename).encode ('utf-8')).hexdigest () [:16]
+        base = os.path.join (directory, "{0}_{1}.{2}".format (key, os.path.basename (filename), data_type))
+    return base + '.npy', base + '.yaml'
+
+def content_hash (filename):
+    # type: (str) -> str
+    """
+    Compute the SHA-1 digest of the contents of the given file.
+    """
+    result = hashlib.sha1 ()
+    with open (filename, 'rb') as fd:
+        block = fd.read (BLOCK_SIZE)
+        while block:
+            result.update (block)
+            block = fd.read (BLOCK_SIZE)
+    return result.hexdigest ()
+
+def load (filename, has_header, data_type, directory):
+    """
+    Read the cached image of a data set file.
+    The cache is valid if the data set file has the same size and modification time it had when the cache was created.
+    If only the modification time differs, the content hash decides and the cache is refreshed when the contents are unchanged.
+    :param filename: the data set file.
+    :param has_header: whether the first line of the data set file contains the attribute names.
+    :param data_type: the floating point type of the cached rows.
+    :param directory: the cache directory or NEXT_TO_FILE.
+    :return: a tuple with the header and a read-only memory-mapped array with the rows, or None if the cache is missing or stale.
+    """
+    matrix_filename, info_filename = cache_filenames (filename, data_type, directory)
+    try:
+        with open (info_filename, 'r') as fd:
+            info = yaml.safe_load (fd)
+        stat = os.stat (filename)
+    except (IOError, OSError, yaml.YAMLError):
+        return None
+    if not isinstance (info, dict) or info.get ('has_header') != has_header or info.get ('size') != stat.st_size:
+        return None
+    if info.get ('mtime') != stat.st_mtime:
+        if content_hash (filename) != info.get ('hash'):
+            return None
+        info ['mtime'] = stat.st_mtime
+        write_info (info_filename, info)
+    try:
+        rows = numpy.load (matrix_filename, mmap_mode = 'r')
+    except (IOError, OSError, ValueError):
+        return None
+    if list (rows.shape) != info.get ('shape'):
+        return None
+    return info ['header'], rows
+
+def store (filename, has_header, data_type, directory, header, rows):
+    """
+    Save the parsed contents of a data set file in the cache.
+    Files are written under a temporary name and then renamed, so that concurrent jobs never read a partial cache.
+    Failing to write the cache, for instance in a read-only directory, only prints a warning.
+    :param filename: the data set file.
+    :param has_header: whether the first line of the data set file contains the attribute names.
+    :param data_type: the floating point type of the cached rows.
+    :param directory: the cache directory or NEXT_TO_FILE.
+    :param header: the attribute names or None.
+    :param rows: two-dimensional numpy array with the rows of the data set.
+    """
+    matrix_filename, info_filename = cache_filenames (filename, data_type, directory)
+    try:
+        stat = os.stat (filename)
+        info = {
+            'filename': os.path.abspath (filename),
+            'has_header': has_header,
+            'data_type': data_type,
+            'header': header,
+            'shape': list (rows.shape),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'hash': content_hash (filename),
+        }
+        if directory != NEXT_TO_FILE and not os.path.isdir (directory):
+            os.makedirs (directory)
+        temporary_filename = "{0}.{1}.tmp".format (matrix_filename, os.getpid ())
+        with open (temporary_filename, 'wb') as fd:
+            numpy.save (fd, rows)
+        os.rename (temporary_filename, matrix_filename)
+        write_info (info_filename, info)
+    except (IOError, OSError) as error:
+        print ("[W] Could not cache data set file {0}: {1}".format (filename, error))
+
+def write_info (info_filename, info):
+    """
+    Atomically write the YAML file with the header and the signature of a cached data set file.
+    """
+    temporary_filename = "{0}.{1}.tmp".format (info_filename, os.getpid ())
+    try:
+        with open (temporary_filename, 'w') as fd:
+            yaml.safe_dump (info, fd)
+        os.rename (temporary_filename, info_filename)
+    except (IOError, OSError) as error:
+        print ("[W] Could not write cache file {0}: {1}".format (info_filename, error))
+
+def remove (filename, data_types, directory):
+    # type: (str, list, str) -> int
+    """
+    Delete the cache files of a data set file.
+    :param filename: the data set file.
+    :param data_types: the floating point types whose cache files are deleted.
+    :param directory: the cache directory or NEXT_TO_FILE.
+    :return: the number of deleted files.
+    """
+    result = 0
+    for a_data_type in data_types:
+        for a_filename in cache_filenames (filename, a_data_type, directory):
+            if os.path.exists (a_filename):
+                os.remove (a_filename)
+                result += 1
+    return result
@@ -1,86 +1,177 @@
 import csv
+import numpy
 import sklearn.tree
 import yaml
 
 import base_algorithm
+import binning
+import classifier_output
 import dataset
+import tree_store
 
 class Decision_Tree (base_algorithm.Base_Algorithm):
-    def __init__ (self):
+    NAME = 'decision-tree'
+    PARAMETERS = 'decision_tree'
+
+    def __init__ (self, samples, parameters, RNG_seed, grid = None, split_mode = dataset.SPLIT_COMPATIBLE, a_profiler = None):
+        """
+        If the parameters, or a grid point, have a max_bins value, trees are trained on the bin indexes of the samples
+        (see module binning) instead of the attribute values.  The bin indexes are computed here, so that the
+        processes of a pool inherit them.
+        """
         print ("I'm going to run decision tree")
-        base_algorithm.Base_Algorithm.__init__ (self)
+        base_algorithm.Base_Algorithm.__init__ (self, samples, parameters, RNG_seed, grid, split_mode, a_profiler)
+        for point in [parameters] if grid is None else grid:
+            if point.get ("max_bins") is not None:
+                with self.profiler.phase ('bin'):
+                    binning.binned_samples (samples, point ["max_bins"])
 
-    def load_parameters (self, filename):
+    @staticmethod
+    def load_parameters (filename):
         with open (filename, "r") as fd:
             dictionary = yaml.load (fd)
             result = dictionary ["decision_tree"]
             print ("Parameters of the decision tree: {0}".format (result))
             return result
 
-    def open_results_file (self):
-        # type: () -> (object, object)
-        results_file = open ("decision-tree_results_{0}.csv".format (self.suffix), "w")
-        results_writer = csv.writer (results_file, delimiter = ',', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
-        header_row = [
-            "time",
-            "run",
-            "criterion",
-            'max.depth',
-            "min.samples.split",
-            "all.score",
-        ] + ["partial.score.{}".format (index) for index in range (dataset.DataSet.CLASS_COUNTER)] + [
-            "random.chance.win"
+    def results_columns (self):
+        return [
+            ("time", 'f8'),
+            ("run", 'i4'),
+            ("criterion", 'S16'),
+            ('max.depth', 'f8'),
+            ("min.samples.split", 'f8'),
+        ] + ([("max.bins", 'i4')] if self.has_bins () else []) + [
+            ("all.score", 'f8'),
+        ] + [("partial.score.{}".format (index), 'f8') for index in range (self.number_classes)] + [
+            ("random.chance.win", 'f8')
+        ]
+
+    def classifier_columns (self):
+        columns = [
+            ("time", 'f8'),
+            ("run", 'i4'),
+            ("node.count", 'i4'),
         ]
+        return columns, 'f8'
+
+    def open_results_file (self, suffix):
+        # type: (str) -> (object, object)
+        results_file = open ("decision-tree_results_{0}.csv".format (suffix), "w")
+        results_writer = csv.writer (results_file, delimiter = ',', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
+        header_row = [name for name, _type in self.results_columns ()]
         results_writer.writerow (header_row)
         return results_file, results_writer
 
-    def open_classifier_file (self):
-        classifier_file = open ("decision-tree_structure_{0}.csv".format (self.suffix), "w")
+    def open_classifier_file (self, suffix, classifier_format):
+        if classifier_format == classifier_output.BINARY:
+            classifier_writer = tree_store.Tree_Store_Writer (
+                "decision-tree_structure_{0}.{1}".format (suffix, tree_store.EXTENSION),
+                classes = [d.class_name for d in self.samples.list_data_sets],
+                records_id = dataset.records_id (self.samples.list_data_sets))
+            return classifier_writer, classifier_writer
+        classifier_file = open ("decision-tree_structure_{0}.csv".format (suffix), "w")
         classifier_writer = csv.writer (classifier_file, delimiter = ',', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
         return classifier_file, classifier_writer
 
-    def open_output_file (self):
-        filename = 'decision-tree_output_{0}.csv'.format (self.suffix)
-        output_file = open (filename, 'w')
-        output_writer = csv.writer (output_file, delimiter = ',', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
+    def open_output_file (self, suffix, output_format):
         header_row = ['predicted.class', 'real.class', 'run']
-        output_writer.writerow (header_row)
-        return output_file, output_writer
+        return self.open_classifier_output ('decision-tree', header_row, suffix, output_format)
 
-    def run (self, fraction_test, index_repeat):
-        train, test = dataset.split_data_sets_train_test (self.data_sets, fraction_test, self.RNG)
+    def file_classifier_row (self, classifier_row):
+        """
+        The node classes at the end of the classifier row are only written to tree stores.
+        """
+        return classifier_row [:3 + 4 * int (classifier_row [2])]
+
+    def write_classifier (self, classifier_writer, results_row, classifier_row):
+        if isinstance (classifier_writer, tree_store.Tree_Store_Writer):
+            classifier_writer.writerow (classifier_row)
+        else:
+            base_algorithm.Base_Algorithm.write_classifier (self, classifier_writer, results_row, classifier_row)
+
+    def has_bins (self):
+        """
+        Return whether the results file has the max.bins column, which is the case when the run or one of its grid
+        points trains trees on bin indexes.
+        """
+        return any (point.get ("max_bins") is not None for point in ([self.parameters] if self.grid is None else self.grid))
+
+    def evaluate (self, train, test, index_repeat, RNG, parameters):
         clf = sklearn.tree.DecisionTreeClassifier (
-            criterion = self.parameters ["criterion"],
-            max_depth = self.parameters ["max_depth"],
-            min_samples_split = self.parameters ["min_samples_split"],
-            random_state = self.RNG
+            criterion = parameters ["criterion"],
+            max_depth = parameters ["max_depth"],
+            min_samples_split = parameters ["min_samples_split"],
+            random_state = RNG
+        )
+        if parameters.get ("max_bins") is None:
+            current_time, ys, score, hit = self.run_classifier (clf, train, test)
+            thresholds = None
+        else:
+            binned = binning.binned_samples (self.samples, parameters ["max_bins"])
+            current_time, ys, score, hit = self.run_classifier (clf, binned.function (train), binned.function (test))
+            thresholds = binned.real_thresholds (clf.tree_)
+        return (
+            self.decision_tree_results_row (current_time, index_repeat, parameters, score, hit),
+            self.decision_tree_structure_row (current_time, index_repeat, clf, thresholds) + self.node_classes (clf),
+            ys,
+            test.ys
         )
-        current_time, score, hit = self.run_classifier (clf, train, test, index_repeat)
-        self.write_decision_tree_results (current_time, index_repeat, score, hit)
-        self.write_decision_tree_structure (current_time, index_repeat, clf)
 
-    def write_decision_tree_results (self, current_time, index_repeat, score, hit):
-        row = [
+    def decision_tree_results_row (self, current_time, index_repeat, parameters, score, hit):
+        """
+        The max.bins column is zero for the points trained on the attribute values.
+        """
+        return [
             current_time,
             index_repeat,
-            self.parameters ["criterion"],
-            self.parameters ["max_depth"],
-            self.parameters ["min_samples_split"],
-        ] + score + [
+            parameters ["criterion"],
+            parameters ["max_depth"],
+            parameters ["min_samples_split"],
+        ] + ([parameters.get ("max_bins") or 0] if self.has_bins () else []) + score + [
             hit
         ]
-        self.results_writer.writerow (row)
 
-    def write_decision_tree_structure (self, current_time, index_repeat, classifier):
-        row = [
+    def node_classes (self, classifier):
+        """
+        Return the class predicted by each node of a tree, as the index of the data set with that class, or -1 if it
+        is not the class of any data set, as when a tree trained on one-hot classes predicts no class.
+        """
+        value = classifier.tree_.value
+        if classifier.n_outputs_ == 1:
+            predicted = classifier.classes_ [numpy.argmax (value [:, 0, :], axis = 1)]
+        else:
+            predicted = numpy.column_stack ([
+                classes [numpy.argmax (value [:, index, :len (classes)], axis = 1)]
+                for index, classes in enumerate (classifier.classes_)
+            ])
+        indexes = dict (
+            (_class_key (d.class_name), index)
+            for index, d in enumerate (self.samples.list_data_sets))
+        return [indexes.get (_class_key (class_name), -1) for class_name in predicted]
+
+    @staticmethod
+    def decision_tree_structure_row (current_time, index_repeat, classifier, thresholds = None):
+        """
+        :param thresholds: the thresholds to write instead of the ones of the classifier, see method
+        binning.Binned_Samples.real_thresholds.
+        """
+        if thresholds is None:
+            thresholds = classifier.tree_.threshold
+        return [
             current_time,
             index_repeat,
             classifier.tree_.node_count
         ] + [x for x in classifier.tree_.children_left] + \
               [x for x in classifier.tree_.children_right] + \
               [x for x in classifier.tree_.feature] + \
-              [x for x in classifier.tree_.threshold]
-        self.classifier_writer.writerow (row)
+              [x for x in thresholds]
+
+def _class_key (class_name):
+    """
+    Return a hashable key of a class, which can be a vector.
+    """
+    return tuple (numpy.ravel (class_name).tolist ())
 
 if __name__ == '__main__':
-    Decision_Tree ()
+    base_algorithm.main (Decision_Tree)
@@ -0,0 +1,128 @@
+"""
+Ensemble of the classifiers saved by runs in the binary classifier format, used to classify new records.
+
+The members of an ensemble are the decision trees of tree stores (see module tree_store) and the neural networks of
+weight stores (see module weight_store), usually the classifiers of all the repeats of a run.  Each member votes for
+the class it predicts, and the class with most votes is the prediction of the ensemble.
+
+Classes are identified by the index of their data set in the data sets file, so stores written by runs of different
+algorithms on the same data sets can be combined, even if the classes of the decision trees are class numbers and
+the ones of the neural networks are one-hot vectors.  The names of the classes are the ones of the first store.
+Stores are rejected if their records identifier (see function dataset.records_id) differs, or if their classes differ
+from the ones of a store with the same class representation.
+"""
+
+import numpy
+
+import tree_store
+import weight_store
+
+class Ensemble:
+    def __init__ (self, tree_stores = (), weight_stores = ()):
+        """
+        Load the classifiers of some stores.
+        :param tree_stores: list of tree store directories, written by runs so that they have the node classes.
+        :param weight_stores: list of weight store directories.
+        """
+        self.classes = None
+        self.records_id = None
+        self.representations = {}
+        self.members = []
+        for directory in tree_stores:
+            store = tree_store.Tree_Store (directory)
+            if store.classes is None:
+                raise Exception ('[E] Tree store {} does not have the node classes, only stores written by runs do'.format (directory))
+            self.add_classes (store.classes, store.records_id, directory)
+            self.members.extend (_Tree_Member (tree) for tree in store)
+        for directory in weight_stores:
+            store = weight_store.Weight_Store (directory)
+            self.add_classes (store.classes, store.records_id, directory)
+            self.members.extend (_Network_Member (store.classifier (index), store.classes) for index in range (len (store)))
+        if len (self.members) == 0:
+            raise Exception ('[E] The ensemble has no classifiers')
+        self.number_attributes = max (member.number_attributes for member in self.members)
+
+    def add_classes (self, classes, records_id, directory):
+        """
+        Check that a store was written by a run on the same data sets as the previous stores.
+        Stores written before the records identifier was kept only have their classes checked.
+        """
+        if self.classes is None:
+            self.classes = classes
+        elif len (classes) != len (self.classes):
+            raise Exception ('[E] Store {} has {} classes, expected {}'.format (directory, len (classes), len (self.classes)))
+        if records_id is not None:
+            if self.records_id is None:
+                self.records_id = records_id
+            elif records_id != self.records_id:
+                raise Exception ('[E] Store {} was written by a run on different data sets'.format (directory))
+        representation = numpy.shape (classes)
+        if representation not in self.representations:
+            self.representations [representation] = classes
+        elif classes != self.representations [representation]:
+            raise Exception ('[E] Store {} has classes {}, expected {}'.format (directory, classes, self.representations [representation]))
+
+    def votes (self, xs):
+        """
+        Count the votes of the members for each record.
+        :param xs: two-dimensional array with a row per record.
+        :return: a matrix with a row per record and a column per class, plus a last column with the members that did
+        not predict a class.
+        """
+        if xs.shape [1] < self.number_attributes or any (
+                xs.shape [1] != member.number_attributes for member in self.members if isinstance (member, _Network_Member)):
+            raise Exception ('[E] The records have {} attributes, the classifiers use {}'.format (xs.shape [1], self.number_attributes))
+        result = numpy.zeros ((len (xs), len (self.classes) + 1), dtype = numpy.int32)
+        rows = numpy.arange (len (xs))
+        for member in self.members:
+            # index -1 is the last column
+            result [rows, member.predict (xs)] += 1
+        return result
+
+    def predict (self, xs):
+        """
+        Classify some records.
+        :return: a tuple with the array of the index of the class with most votes of each record, or -1 if no member
+        predicted a class, and the votes returned by method votes.
+        """
+        votes = self.votes (xs)
+        result = numpy.argmax (votes [:, :-1], axis = 1)
+        result [votes [:, :-1].sum (axis = 1) == 0] = -1
+        return result, votes
+
+class _Tree_Member:
+    def __init__ (self, tree):
+        """
+        :type tree: tree_store.Tree
+        """
+        self.tree = tree
+        internal = tree.feature [tree.children_left != -1]
+        self.number_attributes = int (internal.max ()) + 1 if len (internal) > 0 else 0
+
+    def predict (self, xs):
+        return tree_store.predict_classes (self.tree, xs)
+
+class _Network_Member:
+    def __init__ (self, classifier, classes):
+        """
+        :type classifier: sklearn.neural_network.MLPClassifier
+        :param classes: list with the class of each data set.
+        """
+        self.classifier = classifier
+        self.classes = numpy.array (classes).reshape (len (classes), -1)
+        self.number_attributes = classifier.coefs_ [0].shape [0]
+
+    def predict (self, xs):
+        """
+        Return the index of the data set of the class predicted for each record, or -1 when the output is not a
+        class, such as a one-hot output without any one.
+        """
+        ys = numpy.asarray (self.classifier.predict (xs))
+        matches = (ys.reshape (len (xs), 1, -1) == self.classes [numpy.newaxis]).all (axis = 2)
+        return numpy.where (matches.any (axis = 1), numpy.argmax (matches, axis = 1), -1)
+
+def class_label (class_name):
+    """
+    Return the text of a class, which can be a vector, as in the data sets of the neural network.
+    """
+    return '-'.join (str (value) for value in numpy.ravel (class_name).tolist ())
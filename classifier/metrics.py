@@ -0,0 +1,196 @@
+"""
+Metrics of the master and the workers of a campaign, written in the Prometheus text exposition format.
+
+A registry holds counters, gauges and histograms, each with a name, a help text and a list of label names.  A value is
+kept for each combination of label values.  The registry is written periodically to a file that can be read by a
+person or collected by the textfile collector of the Prometheus node exporter.  The file is replaced atomically, so it
+is never read half written.
+
+Histograms have cumulative buckets, as in Prometheus, with upper bounds given in seconds by default (see
+DEFAULT_BUCKETS).  Quantiles are estimated as the upper bound of the bucket where they fall.
+"""
+
+import bisect
+import collections
+import os
+
+"""Upper bounds in seconds of the buckets of the latency histograms."""
+DEFAULT_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 1000.0]
+
+"""Prefix of the names of the metrics."""
+PREFIX = 'optigrape_'
+
+class _Metric:
+    TYPE = None
+
+    def __init__ (self, name, help, labels):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = tuple (labels)
+        self.values = collections.OrderedDict ()
+
+    def key (self, labels):
+        if set (labels.keys ()) != set (self.labels):
+            raise Exception ('[E] Metric {} has labels {}, got {}'.format (self.name, self.labels, sorted (labels.keys ())))
+        return tuple (str (labels [name]) for name in self.labels)
+
+    def get (self, **labels):
+        return self.values.get (self.key (labels), 0)
+
+    def set (self, value, **labels):
+        self.values [self.key (labels)] = value
+
+    def lines (self):
+        for key, value in self.values.items ():
+            yield '{0}{1} {2}'.format (self.name, _format_labels (self.labels, key), _format_value (value))
+
+class Counter (_Metric):
+    TYPE = 'counter'
+
+    def inc (self, amount = 1, **labels):
+        key = self.key (labels)
+        self.values [key] = self.values.get (key, 0) + amount
+
+    def total (self):
+        return sum (self.values.values ())
+
+class Gauge (_Metric):
+    TYPE = 'gauge'
+
+class Histogram (_Metric):
+    TYPE = 'histogram'
+
+    def __init__ (self, name, help, labels, buckets = None):
+        _Metric.__init__ (self, name, help, labels)
+        self.buckets = list (DEFAULT_BUCKETS if buckets is None else buckets)
+
+    def observe (self, value, **labels):
+        key = self.key (labels)
+        if key not in self.values:
+            self.values [key] = _Buckets (len (self.buckets))
+        self.values [key].add (bisect.bisect_left (self.buckets, value), value)
+
+    def merged (self, **labels):
+        """
+        Return the observations of the label values that match the given labels, which can be a subset of the labels.
+        :rtype: _Buckets
+        """
+        result = _Buckets (len (self.buckets))
+        for key, value in self.values.items ():
+            if all (key [self.labels.index (name)] == str (label) for name, label in labels.items ()):
+                result.merge (value)
+        return result
+
+    def label_values (self, name):
+        """
+        Return the values of a label that have observations, in the order they were first observed.
+        """
+        index = self.labels.index (name)
+        return list (collections.OrderedDict ((key [index], None) for key in self.values))
+
+    def quantile (self, buckets, q):
+        """
+        Estimate a quantile of the given observations as the upper bound of the bucket where it falls.
+        :type buckets: _Buckets
+        """
+        target = q * buckets.count
+        cumulative = 0
+        for bound, count in zip (self.buckets + [float ('inf')], buckets.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float ('inf')
+
+    def lines (self):
+        for key, value in self.values.items ():
+            cumulative = 0
+            for bound, count in zip (self.buckets + [float ('inf')], value.counts):
+                cumulative += count
+                yield '{0}_bucket{1} {2}'.format (
+                    self.name, _format_labels (self.labels + ('le',), key + (_format_value (bound),)), cumulative)
+            yield '{0}_sum{1} {2}'.format (self.name, _format_labels (self.labels, key), _format_value (value.sum))
+            yield '{0}_count{1} {2}'.format (self.name, _format_labels (self.labels, key), value.count)
+
+class _Buckets:
+    """
+    Observations of a histogram with some label values: the count of each bucket, the last one unbounded, their number and their sum.
+    """
+    def __init__ (self, number_buckets):
+        self.counts = [0] * (number_buckets + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def add (self, index, value):
+        self.counts [index] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge (self, other):
+        self.counts = [a + b for a, b in zip (self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    def mean (self):
+        return self.sum / self.count if self.count > 0 else 0.0
+
+class Registry:
+    def __init__ (self):
+        self.metrics = collections.OrderedDict ()
+
+    def counter (self, name, help, labels = ()):
+        """
+        :rtype: Counter
+        """
+        return self.add (Counter (name, help, labels))
+
+    def gauge (self, name, help, labels = ()):
+        """
+        :rtype: Gauge
+        """
+        return self.add (Gauge (name, help, labels))
+
+    def histogram (self, name, help, labels = (), buckets = None):
+        """
+        :rtype: Histogram
+        """
+        return self.add (Histogram (name, help, labels, buckets))
+
+    def add (self, metric):
+        if metric.name in self.metrics:
+            raise Exception ('[E] Metric {} is already registered'.format (metric.name))
+        self.metrics [metric.name] = metric
+        return metric
+
+    def exposition (self):
+        """
+        Return the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self.metrics.values ():
+            lines.append ('# HELP {0} {1}'.format (metric.name, metric.help.replace ('\\', '\\\\').replace ('\n', '\\n')))
+            lines.append ('# TYPE {0} {1}'.format (metric.name, metric.TYPE))
+            lines.extend (metric.lines ())
+        return '\n'.join (lines) + '\n'
+
+    def write (self, filename):
+        """
+        Replace the contents of a file with the metrics.
+        """
+        with open (filename + '.tmp', 'w') as fd:
+            fd.write (self.exposition ())
+        os.rename (filename + '.tmp', filename)
+
+def _format_labels (names, values):
+    if len (names) == 0:
+        return ''
+    return '{' + ','.join (
+        '{0}="{1}"'.format (name, value.replace ('\\', '\\\\').replace ('"', '\\"').replace ('\n', '\\n'))
+        for name, value in zip (names, values)) + '}'
+
+def _format_value (value):
+    if value == float ('inf'):
+        return '+Inf'
+    elif isinstance (value, float):
+        return repr (value)
+    else:
+        return str (value)
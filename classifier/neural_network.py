@@ -0,0 +1,141 @@
+import csv
+import sklearn.neural_network
+import yaml
+
+import base_algorithm
+import classifier_output
+import dataset
+import weight_store
+
+class Neural_Network (base_algorithm.Base_Algorithm):
+    NAME = 'neural-network'
+    PARAMETERS = 'neural_network'
+
+    def __init__ (self, samples, parameters, RNG_seed, grid = None, split_mode = dataset.SPLIT_COMPATIBLE, a_profiler = None):
+        print ("I'm going to run neural network")
+        base_algorithm.Base_Algorithm.__init__ (self, samples, parameters, RNG_seed, grid, split_mode, a_profiler)
+
+    @staticmethod
+    def load_parameters (filename):
+        with open (filename, "r") as fd:
+            dictionary = yaml.load (fd)
+            result = dictionary ["neural_network"]
+            print ("Parameters of the neural network: {0}".format (result))
+            return result
+
+    def results_columns (self):
+        return [
+            ("time", 'f8'),
+            ("run", 'i4'),
+            ("activation", 'S16'),
+            ('solver', 'S16'),
+            ("alpha", 'f8'),
+            ('early.activation', 'b1'),
+            ('max.iterations', 'i4')
+        ] + [
+            ('hidden.layer.{0:d}.size'.format (index + 1), 'i4') for index in range (self.number_hidden_layers ())
+        ] + [
+            ("num.iterations", 'i4'),
+            ("all.score", 'f8'),
+        ] + [("partial.score.{}".format (index), 'f8') for index in range (self.number_classes)] + [
+            ("random.chance.win", 'f8')
+        ]
+
+    def classifier_columns (self):
+        columns = [
+            ("time", 'f8'),
+            ("run", 'i4'),
+            ("out.activation", 'S16'),
+            ("number.layers", 'i4'),
+            ("number.outputs", 'i4'),
+        ]
+        return columns, 'f8'
+
+    def open_results_file (self, suffix):
+        results_file = open ("neural-network_results_{0}.csv".format (suffix), "w")
+        results_writer = csv.writer (results_file, delimiter = ',', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
+        header_row = [name for name, _type in self.results_columns ()]
+        results_writer.writerow (header_row)
+        return results_file, results_writer
+
+    def open_classifier_file (self, suffix, classifier_format):
+        if classifier_format == classifier_output.BINARY:
+            NN_writer = weight_store.Weight_Store_Writer (
+                "neural-network_classifier_{0}.{1}".format (suffix, weight_store.EXTENSION),
+                [d.class_name for d in self.samples.list_data_sets],
+                dataset.records_id (self.samples.list_data_sets))
+            return NN_writer, NN_writer
+        NN_file = open ("neural-network_classifier_{0}.csv".format (suffix), "w")
+        NN_writer = csv.writer (NN_file, delimiter = ',', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
+        return NN_file, NN_writer
+
+    def open_output_file (self, suffix, output_format):
+        header_row = [
+            'predicted.class.{}'.format (index + 1)
+            for index in range (self.number_classes)
+        ] + [
+            'real.class.{}'.format (index + 1)
+            for index in range (self.number_classes)
+        ] + [
+            'run'
+        ]
+        return self.open_classifier_output ('neural-network', header_row, suffix, output_format)
+
+    def file_classifier_row (self, classifier_row):
+        """
+        The classifier row of a repeat is its network, see function weight_store.model_from_classifier, which is only
+        flattened to a row with a column per weight for the CSV files and the columnar store.
+        """
+        return weight_store.model_row (classifier_row)
+
+    def write_classifier (self, classifier_writer, results_row, classifier_row):
+        if isinstance (classifier_writer, weight_store.Weight_Store_Writer):
+            classifier_writer.write (classifier_row)
+        else:
+            base_algorithm.Base_Algorithm.write_classifier (self, classifier_writer, results_row, classifier_row)
+
+    def number_hidden_layers (self):
+        """
+        Return the number of hidden layer size columns of the results file, the largest number of hidden layers of the run or of its grid points.
+        """
+        if self.grid is None:
+            return len (self.parameters ["hidden_layers_size"])
+        else:
+            return max (len (parameters ["hidden_layers_size"]) for parameters in self.grid)
+
+    def evaluate (self, train, test, index_repeat, RNG, parameters):
+        clf = sklearn.neural_network.MLPClassifier (
+            activation = parameters ["activation"],
+            solver = parameters ["solver"],
+            alpha = parameters ["alpha"],
+            hidden_layer_sizes = parameters ["hidden_layers_size"],
+            random_state = RNG,
+            max_iter = parameters ["max_iterations"],
+            early_stopping = parameters ["early_stopping"]
+            )
+        current_time, ys, score, hit = self.run_classifier (clf, train, test)
+        return (
+            self.neural_network_results_row (current_time, index_repeat, parameters, clf, score, hit),
+            weight_store.model_from_classifier (current_time, index_repeat, clf),
+            ys,
+            test.ys
+        )
+
+    def neural_network_results_row (self, current_time, index_repeat, parameters, clf, score, hit):
+        """
+        Hidden layer sizes are padded with zeros when the grid has points with more hidden layers.
+        """
+        hidden_layers_size = list (parameters ["hidden_layers_size"])
+        return [
+            current_time,
+            index_repeat,
+            parameters ["activation"],
+            parameters ["solver"],
+            parameters ["alpha"],
+            parameters ["early_stopping"],
+            parameters ["max_iterations"]
+        ] + hidden_layers_size + [0] * (self.number_hidden_layers () - len (hidden_layers_size)) + [
+            clf.n_iter_,
+        ] + score + [
+            hit
+        ]
@@ -0,0 +1,185 @@
+"""
+Per-phase instrumentation of classifier runs.
+
+A run is divided in phases: load (data sets and parameters), and for each repeat split, fit, predict, score and write.
+For each phase we record the wall time, the CPU time (user plus system) and the peak resident set size of the process
+at the end of the phase, as reported by getrusage (kilobytes in Linux).  Phases can also record the shape and size of
+the arrays they handle.  A phase costs two getrusage calls and two clock reads, which is negligible compared to
+fitting a classifier.
+
+The records are written to a YAML file per run with a summary per phase, next to the results files, in the partition
+of the run in a columnar store or in the shard directory.  When cProfile is enabled, the repeats are
+profiled and the statistics are dumped to a file that can be read with the pstats module.
+
+When repeats run in a pool, each pool process records the phases of its repeat in a new profiler, and the parent
+process merges what is returned (see methods fork, export and merge).
+"""
+
+import cProfile
+import pstats
+import resource
+import time
+import yaml
+
+"""Extension of the file with the phase records."""
+EXTENSION = 'yaml'
+
+"""Extension of the file with the cProfile statistics."""
+STATS_EXTENSION = 'prof'
+
+class Profiler:
+    def __init__ (self, use_cprofile = False):
+        """
+        :param use_cprofile: whether repeats are profiled with cProfile.
+        """
+        self.use_cprofile = use_cprofile
+        self.cprofile = cProfile.Profile () if use_cprofile else None
+        self.records = []
+        self.stats = []
+        self.index_repeat = None
+
+    def phase (self, name, index_repeat = None):
+        """
+        Return a context manager that records a phase.
+        :param name: the phase name.
+        :param index_repeat: the repeat index, by default the repeat that is running, if any.
+        """
+        return _Phase (self, name, self.index_repeat if index_repeat is None else index_repeat)
+
+    def repeat (self, index_repeat):
+        """
+        Return a context manager for running a repeat.  The phases recorded inside are assigned to this repeat, and
+        the repeat is profiled if cProfile is enabled.
+        """
+        return _Repeat (self, index_repeat)
+
+    def fork (self):
+        """
+        Create an empty profiler with the same options, used to record a repeat in a pool process.
+        """
+        return Profiler (self.use_cprofile)
+
+    def export (self):
+        """
+        Return the records and the cProfile statistics of this profiler, in a form that can be sent to another process.
+        """
+        if self.cprofile is not None:
+            self.cprofile.create_stats ()
+            return self.records, self.stats + [self.cprofile.stats]
+        else:
+            return self.records, self.stats
+
+    def merge (self, exported):
+        """
+        Add the records and statistics returned by method export of another profiler.
+        """
+        records, stats = exported
+        self.records.extend (records)
+        self.stats.extend (stats)
+
+    def summary (self):
+        """
+        Compute the number of records, total wall and CPU time, and the maximum peak resident set size of each phase.
+        """
+        result = {}
+        for record in self.records:
+            a_phase = result.setdefault (record ['phase'], {
+                'count': 0,
+                'wall.time': 0.0,
+                'cpu.time': 0.0,
+                'peak.rss.kB': 0,
+            })
+            a_phase ['count'] += 1
+            a_phase ['wall.time'] += record ['wall.time']
+            a_phase ['cpu.time'] += record ['cpu.time']
+            a_phase ['peak.rss.kB'] = max (a_phase ['peak.rss.kB'], record ['peak.rss.kB'])
+        return result
+
+    def write (self, filename_prefix, run):
+        """
+        Write the file with the phase records and, if cProfile is enabled, the file with the statistics.
+        :param filename_prefix: the filename without the extension.
+        :param run: dictionary describing the run.
+        """
+        profile = {
+            'run': run,
+            'peak.rss.kB': resource.getrusage (resource.RUSAGE_SELF).ru_maxrss,
+            'children.peak.rss.kB': resource.getrusage (resource.RUSAGE_CHILDREN).ru_maxrss,
+            'phases': self.summary (),
+            'records': self.records,
+        }
+        with open ('{}.{}'.format (filename_prefix, EXTENSION), 'w') as fd:
+            yaml.safe_dump (profile, fd, default_flow_style = False)
+        _records, stats = self.export ()
+        stats = [s for s in stats if len (s) > 0]
+        if len (stats) > 0:
+            result = pstats.Stats (_Stats (stats [0]))
+            for s in stats [1:]:
+                result.add (pstats.Stats (_Stats (s)))
+            result.dump_stats ('{}.{}'.format (filename_prefix, STATS_EXTENSION))
+
+def array_size (array):
+    """
+    Describe the shape, type and size in bytes of a numpy array.
+    """
+    return {
+        'shape': [int (n) for n in array.shape],
+        'dtype': array.dtype.str,
+        'bytes': int (array.nbytes),
+    }
+
+class _Phase:
+    def __init__ (self, profiler, name, index_repeat):
+        self.profiler = profiler
+        self.record = {
+            'phase': name,
+            'run': index_repeat,
+        }
+
+    def arrays (self, **arrays):
+        """
+        Record the size of the given arrays.
+        """
+        self.record.setdefault ('arrays', {}).update (
+            (name, array_size (array)) for name, array in arrays.items ())
+
+    def __enter__ (self):
+        self.usage = resource.getrusage (resource.RUSAGE_SELF)
+        self.start = time.time ()
+        return self
+
+    def __exit__ (self, exc_type, exc_value, traceback):
+        end = time.time ()
+        usage = resource.getrusage (resource.RUSAGE_SELF)
+        self.record ['wall.time'] = end - self.start
+        self.record ['cpu.time'] = (usage.ru_utime + usage.ru_stime) - (self.usage.ru_utime + self.usage.ru_stime)
+        self.record ['peak.rss.kB'] = usage.ru_maxrss
+        self.profiler.records.append (self.record)
+        return False
+
+class _Repeat:
+    def __init__ (self, profiler, index_repeat):
+        self.profiler = profiler
+        self.index_repeat = index_repeat
+
+    def __enter__ (self):
+        self.profiler.index_repeat = self.index_repeat
+        if self.profiler.cprofile is not None:
+            self.profiler.cprofile.enable ()
+        return self
+
+    def __exit__ (self, exc_type, exc_value, traceback):
+        if self.profiler.cprofile is not None:
+            self.profiler.cprofile.disable ()
+        self.profiler.index_repeat = None
+        return False
+
+class _Stats:
+    """
+    Holds cProfile statistics returned by another process, so that they can be loaded by pstats.Stats.
+    """
+    def __init__ (self, stats):
+        self.stats = stats
+
+    def create_stats (self):
+        pass
@@ -0,0 +1,112 @@
+"""
+Destinations of the rows produced by the repeats of a classifier algorithm.
+
+A sink receives the tuple returned by method run of an algorithm for each repeat, in repeat order.
+CSV_Sink writes the results, classifier and output files of a run, while Columnar_Sink appends the rows to a partition
+of a campaign columnar store (see module columnar_store).
+
+Rows of a run with a grid arrive ordered by repeat and then by grid point, so the grid point of a row is given by the
+number of rows received so far.  As the classifier and output rows do not have the parameters, each grid point has its
+own classifier and output files, whose suffix ends with point=N, and its own partition of the columnar store, whose
+innermost key is point.
+"""
+
+import os.path
+
+import classifier_output
+import columnar_store
+
+class CSV_Sink:
+    def __init__ (self, algorithm, suffix, output_format = classifier_output.CSV, classifier_format = classifier_output.CSV):
+        """
+        Open the files created by the given algorithm.
+        :type algorithm: base_algorithm.Base_Algorithm
+        :param suffix: the filename suffix of the run.
+        :param output_format: the format of the classifier output file, one of classifier_output.FORMATS.
+        :param classifier_format: the format of the classifier file, one of classifier_output.FORMATS.
+        """
+        self.algorithm = algorithm
+        self.results_file, self.results_writer = algorithm.open_results_file (suffix)
+        self.classifier_files = []
+        self.classifier_writers = []
+        self.output_writers = []
+        for point_suffix in point_suffixes (algorithm, suffix):
+            classifier_file, classifier_writer = algorithm.open_classifier_file (point_suffix, classifier_format)
+            self.classifier_files.append (classifier_file)
+            self.classifier_writers.append (classifier_writer)
+            self.output_writers.append (algorithm.open_output_file (point_suffix, output_format))
+        self.number_rows = 0
+
+    def write_repeat (self, index_repeat, repeat):
+        results_row, classifier_row, classifier_ys, test_ys = repeat
+        index_point = self.number_rows % len (self.output_writers)
+        self.number_rows += 1
+        self.results_writer.writerow (results_row)
+        self.algorithm.write_classifier (self.classifier_writers [index_point], results_row, classifier_row)
+        self.output_writers [index_point].write (classifier_ys, test_ys, index_repeat)
+
+    def close (self):
+        self.results_file.close ()
+        for classifier_file, output_writer in zip (self.classifier_files, self.output_writers):
+            classifier_file.close ()
+            output_writer.close ()
+
+class Columnar_Sink:
+    def __init__ (self, algorithm, directory, partition):
+        """
+        Open the tables of the partition of the given algorithm run.
+        :type algorithm: base_algorithm.Base_Algorithm
+        :param directory: the store directory.
+        :param partition: list of (key, value) pairs identifying the run, see function columnar_store.partition_path.
+        """
+        self.algorithm = algorithm
+        classifier_columns, ragged_type = algorithm.classifier_columns ()
+        self.number_classifier_columns = len (classifier_columns)
+        self.tables = []
+        for point_partition in point_partitions (algorithm, partition):
+            path = columnar_store.partition_path (directory, point_partition)
+            self.tables.append ((
+                columnar_store.Table (os.path.join (path, 'results'), algorithm.results_columns ()),
+                columnar_store.Table (os.path.join (path, 'classifier'), classifier_columns, ragged_type),
+                columnar_store.Table (
+                    os.path.join (path, 'output'),
+                    [(name, classifier_output.RECORD_DTYPE [name]) for name in classifier_output.RECORD_DTYPE.names]),
+            ))
+        self.number_rows = 0
+
+    def write_repeat (self, index_repeat, repeat):
+        results_row, classifier_row, classifier_ys, test_ys = repeat
+        results, classifier, output = self.tables [self.number_rows % len (self.tables)]
+        self.number_rows += 1
+        classifier_row = self.algorithm.file_classifier_row (classifier_row)
+        results.append ([results_row])
+        classifier.append (
+            [classifier_row [:self.number_classifier_columns]],
+            [classifier_row [self.number_classifier_columns:]])
+        output.append_columns ({
+            'predicted.class': classifier_output.class_numbers (classifier_ys),
+            'real.class': classifier_output.class_numbers (test_ys),
+            'run': [index_repeat] * len (test_ys),
+        })
+
+    def close (self):
+        pass
+
+def point_suffixes (algorithm, suffix):
+    """
+    Return the filename suffix of the classifier and output files of each grid point of a run, or of the run if it
+    has no grid.
+    :type algorithm: base_algorithm.Base_Algorithm
+    """
+    if algorithm.grid is None:
+        return [suffix]
+    return ['{0}_point={1}'.format (suffix, index_point) for index_point in range (len (algorithm.grid))]
+
+def point_partitions (algorithm, partition):
+    """
+    Return the partition of each grid point of a run, or the partition of the run if it has no grid.
+    :type algorithm: base_algorithm.Base_Algorithm
+    """
+    if algorithm.grid is None:
+        return [partition]
+    return [partition + [('point', index_point)] for index_point in range (len (algorithm.grid))]
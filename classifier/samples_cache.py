@@ -0,0 +1,61 @@
+"""
+Bounded cache of the samples used by a worker.
+
+Samples are keyed by the identifier of their data sets (see function dataset.data_sets_id) and the least recently
+used ones are evicted when the size of their stacked matrices exceeds the cache capacity.  The most recently added
+samples are always kept, even if they alone exceed the capacity.
+"""
+
+import collections
+
+class Samples_Cache:
+    def __init__ (self, capacity):
+        """
+        :param capacity: maximum size in bytes of the cached samples.
+        """
+        self.capacity = capacity
+        self.entries = collections.OrderedDict ()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get (self, key):
+        """
+        Return the samples with the given identifier, or None if they are not in the cache.
+        :rtype: dataset.Samples
+        """
+        if key in self.entries:
+            self.hits += 1
+            result = self.entries.pop (key)
+            self.entries [key] = result
+            return result
+        else:
+            self.misses += 1
+            return None
+
+    def put (self, key, samples):
+        """
+        Add samples to the cache, evicting the least recently used ones if needed.
+        :type samples: dataset.Samples
+        """
+        if key in self.entries:
+            self.size -= self.entries.pop (key).xs.nbytes
+        self.entries [key] = samples
+        self.size += samples.xs.nbytes
+        while self.size > self.capacity and len (self.entries) > 1:
+            _key, evicted = self.entries.popitem (last = False)
+            self.size -= evicted.xs.nbytes
+            self.evictions += 1
+
+    def statistics (self):
+        """
+        Return a dictionary with the number of hits, misses and evictions, and the number and size of the cached samples.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len (self.entries),
+            'bytes': self.size,
+        }
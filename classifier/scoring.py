@@ -0,0 +1,95 @@
+"""
+Classification scores computed on integer class indexes.
+
+Class labels are either scalars, the output of uni-dimensional classifiers, or rows of a one-hot matrix, the output of
+multi-dimensional classifiers.  Both are decoded into indexes of the sorted list of classes present in the test set.
+A classifier output that is not one of these classes, such as a neural network output without any active neuron,
+is decoded as NO_CLASS.
+"""
+
+import numpy
+
+"""Index of a classifier output that does not correspond to any class."""
+NO_CLASS = -1
+
+def classes_of (ys):
+    # type: (numpy.ndarray) -> (numpy.ndarray, numpy.ndarray)
+    """
+    Compute the sorted classes of the given labels and the index of each label.
+    One-hot labels are sorted lexicographically, as tuples are.
+    :param ys: one or two-dimensional array with class labels.
+    :return: a tuple with the array of classes and the array with the class index of each label.
+    """
+    ys = numpy.asarray (ys)
+    if ys.ndim == 2:
+        return numpy.unique (ys, return_inverse = True, axis = 0)
+    elif ys.ndim == 1:
+        return numpy.unique (ys, return_inverse = True)
+    else:
+        raise Exception ('[E] Unknown class type of {}'.format (ys))
+
+def class_indexes (ys, classes):
+    # type: (numpy.ndarray, numpy.ndarray) -> numpy.ndarray
+    """
+    Compute the index of each label in the given sorted classes.
+    :param ys: one or two-dimensional array with class labels, such as a classifier output.
+    :param classes: the array of classes returned by classes_of.
+    :return: an array with the class index of each label, or NO_CLASS.
+    """
+    ys = numpy.asarray (ys)
+    if ys.ndim != classes.ndim:
+        raise Exception ('[E] Class labels {} do not match classes {}'.format (ys, classes))
+    if ys.ndim == 2:
+        matches = (ys [:, numpy.newaxis, :] == classes [numpy.newaxis, :, :]).all (axis = 2)
+        return numpy.where (matches.any (axis = 1), matches.argmax (axis = 1), NO_CLASS)
+    else:
+        result = numpy.searchsorted (classes, ys)
+        found = result < len (classes)
+        found [found] = classes [result [found]] == ys [found]
+        return numpy.where (found, result, NO_CLASS)
+
+def compute_score (classifier_ys, test_ys):
+    """
+    Compute the classification score, meaning the fraction of correctly classified records, overall and per class.
+    :param classifier_ys: The classifier output.
+    :param test_ys: The correct class.
+    :return: A list with the overall score followed by the score of each class, in the order of the sorted classes.
+    """
+    classes, real = classes_of (test_ys)
+    predicted = class_indexes (classifier_ys, classes)
+    hits = predicted == real
+    count_real = numpy.bincount (real, minlength = len (classes))
+    count_hits = numpy.bincount (real [hits], minlength = len (classes))
+    all_score = int (hits.sum ()) / float (len (real))
+    partial_score = (count_hits / count_real.astype (float)).tolist ()
+    return [all_score] + partial_score
+
+def confusion_matrix (predicted, real, number_classes):
+    # type: (numpy.ndarray, numpy.ndarray, int) -> numpy.ndarray
+    """
+    Count how many records of each class were assigned to each class.
+    :param predicted: class indexes of the classifier output, possibly NO_CLASS.
+    :param real: class indexes of the correct classes.
+    :param number_classes: the number of classes.
+    :return: a matrix where rows are the correct classes and columns the predicted classes, with an extra last column for NO_CLASS.
+    """
+    columns = numpy.where (predicted == NO_CLASS, number_classes, predicted)
+    counts = numpy.bincount (real * (number_classes + 1) + columns, minlength = number_classes * (number_classes + 1))
+    return counts.reshape (number_classes, number_classes + 1)
+
+def random_chance_to_hit (train_IDs, test_IDs):
+    # type: (numpy.ndarray, numpy.ndarray) -> float
+    """
+    Compute the chance of a random classifier to correctly classify a sample in the test set, given a training set.
+    The classifier picks the class of a random sample of the training set.
+    :param train_IDs: class IDs of the training set.
+    :param test_IDs: class IDs of the test set.
+    """
+    train_IDs = numpy.asarray (train_IDs)
+    test_IDs = numpy.asarray (test_IDs)
+    size = max (train_IDs.max (), test_IDs.max ()) + 1
+    count_classes_train = numpy.bincount (train_IDs, minlength = size)
+    count_classes_test = numpy.bincount (test_IDs, minlength = size)
+    result = int (numpy.dot (count_classes_train, count_classes_test))
+    result = result / float (len (train_IDs) * len (test_IDs))
+    return result
@@ -0,0 +1,178 @@
+"""
+Sharding of a classifier run among the tasks of a cluster array job.
+
+The work of a run is divided in units, one per repeat, or one per grid point of each repeat if the parameters file
+declares a grid.  Units are numbered by repeat and then by grid point, and shard I of N performs the units whose
+number modulo N is I, so each shard gets a similar mix of repeats and grid points.  Each unit uses the pseudo-random
+number generator of its repeat (see function base_algorithm.repeat_RNG), so the union of the shards has the same rows
+as a run with option --jobs.
+
+A shard writes its rows to a shard file, a stream of pickled records in unit order preceded by a header.  The file is
+written under a temporary name and renamed when complete, so the shards of failed tasks are not merged.  The merge
+reads the shard files of all N shards and writes their rows in unit order to the usual results files or columnar store.
+
+In a Sun Grid Engine array job, the shard index and count are computed from variables SGE_TASK_ID, SGE_TASK_FIRST,
+SGE_TASK_LAST and SGE_TASK_STEPSIZE.
+"""
+
+import heapq
+import os
+import os.path
+import re
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+"""Extension of the shard files."""
+EXTENSION = 'shard'
+
+def parse_shard (text):
+    # type: (str) -> (int, int)
+    """
+    Parse the value of option --shard, either I/N or sge.
+    :return: a tuple with the shard index, starting at zero, and the number of shards.
+    """
+    if text == 'sge':
+        return sge_shard ()
+    match = re.match (r'^(\d+)/(\d+)$', text)
+    if match is None:
+        raise Exception ('[E] Invalid shard {}, expected INDEX/COUNT or sge'.format (text))
+    index, count = int (match.group (1)), int (match.group (2))
+    if index >= count:
+        raise Exception ('[E] Shard index {} should be less than the shard count {}'.format (index, count))
+    return index, count
+
+def sge_shard ():
+    # type: () -> (int, int)
+    """
+    Compute the shard index and count of a Sun Grid Engine array job task.
+    """
+    task_id = os.getenv ('SGE_TASK_ID')
+    if task_id is None or task_id == 'undefined':
+        raise Exception ('[E] Variable SGE_TASK_ID is not set, this is not an array job task')
+    first = int (os.getenv ('SGE_TASK_FIRST', '1'))
+    last = int (os.getenv ('SGE_TASK_LAST', task_id))
+    step = int (os.getenv ('SGE_TASK_STEPSIZE', '1'))
+    return (int (task_id) - first) // step, (last - first) // step + 1
+
+def shard_units (number_repeats, number_points, index, count):
+    # type: (int, int, int, int) -> list
+    """
+    Compute the units of a shard.
+    :param number_points: the number of grid points, one if there is no grid.
+    :return: a list of (unit number, repeat index, grid point index) tuples in unit order.
+    """
+    return [
+        (unit, unit // number_points, unit % number_points)
+        for unit in range (index, number_repeats * number_points, count)
+    ]
+
+def shard_filename (directory, name, run_key, index, count):
+    return os.path.join (directory, '{0}_shard_{1}_{2}-of-{3}.{4}'.format (name, run_key, index, count, EXTENSION))
+
+def run_key (data_sets, learning_parameters, RNG_seed, fraction_test):
+    # type: (str, str, int, float) -> str
+    """
+    Compute the part of the shard filenames that identifies the run.
+    """
+    return '{0}_{1}_{2}_{3}'.format (
+        os.path.basename (data_sets),
+        os.path.basename (learning_parameters),
+        RNG_seed,
+        fraction_test)
+
+class Shard_Sink:
+    """
+    Writes the rows of the units of a shard to a shard file.
+    """
+    def __init__ (self, filename, units, header):
+        """
+        :param units: the list returned by function shard_units.
+        :param header: dictionary describing the run, checked when merging.
+        """
+        self.filename = filename
+        self.units = units
+        self.next_unit = 0
+        directory = os.path.dirname (filename) or os.curdir
+        # the tasks of an array job may create the shard directory at the same time
+        try:
+            os.makedirs (directory)
+        except OSError:
+            if not os.path.isdir (directory):
+                raise
+        self.file = open (filename + '.tmp', 'wb')
+        pickle.dump (header, self.file, -1)
+
+    def write_repeat (self, index_repeat, repeat):
+        unit, unit_repeat, _index_point = self.units [self.next_unit]
+        if unit_repeat != index_repeat:
+            raise Exception ('[E] Received repeat {} for unit {} of repeat {}'.format (index_repeat, unit, unit_repeat))
+        pickle.dump ((unit, index_repeat, repeat), self.file, -1)
+        self.next_unit += 1
+
+    def close (self):
+        self.file.close ()
+        if self.next_unit == len (self.units):
+            os.rename (self.filename + '.tmp', self.filename)
+        else:
+            print ('[W] Shard {} is incomplete, it was left in {}.tmp'.format (self.filename, self.filename))
+
+def read_shard (filename):
+    """
+    Read the header and the records of a shard file.
+    :return: a tuple with the header and a generator of (unit number, repeat index, rows) tuples.
+    """
+    fd = open (filename, 'rb')
+    header = pickle.load (fd)
+    def records ():
+        try:
+            while True:
+                yield pickle.load (fd)
+        except EOFError:
+            pass
+        finally:
+            fd.close ()
+    return header, records ()
+
+def merge_shards (directory, name, a_run_key, header):
+    """
+    Read the shard files of a run and yield their rows in unit order.
+    The shard files are checked before returning.
+    :param header: the header the shards should have, except for the shard index.
+    :return: a generator of tuples with the repeat index and the rows of a unit.
+    """
+    pattern = shard_filename (directory, name, a_run_key, 'I', 'N')
+    expression = re.compile ('^{0}_shard_{1}_(\\d+)-of-(\\d+)\\.{2}$'.format (re.escape (name), re.escape (a_run_key), EXTENSION))
+    shards = {}
+    for basename in os.listdir (directory):
+        match = expression.match (basename)
+        if match is not None:
+            shards [int (match.group (1)), int (match.group (2))] = os.path.join (directory, basename)
+    counts = set (count for _index, count in shards)
+    if len (counts) != 1:
+        raise Exception ('[E] Expected the shards of a single shard count in {}, found counts {}'.format (pattern, sorted (counts)))
+    count = counts.pop ()
+    missing = [index for index in range (count) if (index, count) not in shards]
+    if len (missing) > 0:
+        raise Exception ('[E] Shards {} of {} are missing in {}'.format (missing, count, pattern))
+    print ("Merging {0} shards {1}".format (count, pattern))
+    readers = []
+    for index in range (count):
+        shard_header, records = read_shard (shards [index, count])
+        expected = dict (header, shard_index = index, shard_count = count)
+        if shard_header != expected:
+            raise Exception ('[E] Shard {} was computed with {}, expected {}'.format (shards [index, count], shard_header, expected))
+        readers.append (records)
+    return _merge (readers, header ['number_repeats'] * header ['number_points'])
+
+def _merge (readers, expected_units):
+    number_units = 0
+    for unit, index_repeat, repeat in heapq.merge (*readers):
+        if unit != number_units:
+            raise Exception ('[E] Unit {} is missing in the shards'.format (number_units))
+        number_units += 1
+        yield index_repeat, repeat
+    if number_units != expected_units:
+        raise Exception ('[E] The shards have {} units, expected {}'.format (number_units, expected_units))
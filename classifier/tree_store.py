@@ -0,0 +1,267 @@
+"""
+Binary store of the decision trees of a run, an alternative to the CSV file with the decision tree structures.
+
+A store is a directory with a file per node array, holding the arrays of all the trees one after the other:
+
+children_left.bin   int32, index of the left child of each node, or -1 in leaves
+children_right.bin  int32, index of the right child of each node, or -1 in leaves
+feature.bin         int32, attribute tested by each node, or -2 in leaves
+threshold.bin       float64 or float32, threshold of the test of each node, or -2 in leaves
+node_class.bin      int32, class predicted by each node, as an index into the classes of the header, or -1 if the
+                    prediction is not one of these classes.  Only in stores whose header has the classes
+index.bin           a record per tree (see INDEX_DTYPE) with the time and repeat index of the row, the number of
+                    nodes and the offset of the first node of the tree in the node arrays
+header.yaml         the format version, the threshold type and, optionally, the class of each data set and the
+                    identifier of their records (see function dataset.records_id)
+
+Node indexes are relative to the first node of their tree, as in sklearn.  Trees are appended by writing their nodes
+before their index record, so a reader never sees a tree whose nodes are incomplete (see module binary_store).  The
+node arrays are memory mapped by the reader, so tree k is read by looking up its index record without parsing the
+other trees.  Function predict_classes applies the trees of a store with classes to new records.
+
+This module can also be run to convert CSV files with decision tree structures to stores.
+"""
+
+import argparse
+import collections
+import csv
+import numpy
+import os
+import os.path
+import yaml
+
+import binary_store
+
+"""Version of the store format."""
+VERSION = 1
+
+"""Extension of the store directories."""
+EXTENSION = 'trees'
+
+HEADER = 'header.yaml'
+INDEX = 'index.bin'
+
+"""Record of the index of a store."""
+INDEX_DTYPE = numpy.dtype ([
+    ('time', '<f8'),
+    ('run', '<i4'),
+    ('node.count', '<i4'),
+    ('offset', '<i8'),
+])
+
+"""Node arrays of a store and their types, except for the threshold whose type is given in the header."""
+NODE_ARRAYS = [
+    ('children_left', numpy.dtype ('<i4')),
+    ('children_right', numpy.dtype ('<i4')),
+    ('feature', numpy.dtype ('<i4')),
+    ('threshold', None),
+]
+
+"""Types of the thresholds, by name."""
+THRESHOLD_TYPES = {
+    'float64': numpy.dtype ('<f8'),
+    'float32': numpy.dtype ('<f4'),
+}
+
+"""Optional node array of a store with classes."""
+NODE_CLASS = ('node_class', numpy.dtype ('<i4'))
+
+"""A tree read from a store, with the node arrays as read-only views of the store files.  node_class may be None."""
+Tree = collections.namedtuple ('Tree', ['time', 'run', 'children_left', 'children_right', 'feature', 'threshold', 'node_class'])
+Tree.__new__.__defaults__ = (None,)
+
+def row_tree (row):
+    """
+    Convert a row of the CSV file with the decision tree structures to a tree.
+    :param row: list with the time, the repeat index, the node count and the arrays of the tree, see method
+    Decision_Tree.decision_tree_structure_row, optionally followed by the node classes, see method
+    Decision_Tree.node_classes.
+    :rtype: Tree
+    """
+    number_nodes = int (row [2])
+    if len (row) not in [3 + 4 * number_nodes, 3 + 5 * number_nodes]:
+        raise Exception ('[E] A decision tree row with {} nodes has {} values'.format (number_nodes, len (row)))
+    number_arrays = (len (row) - 3) // number_nodes
+    arrays = [row [3 + index * number_nodes:3 + (index + 1) * number_nodes] for index in range (number_arrays)]
+    return Tree (float (row [0]), int (row [1]), *arrays)
+
+class Tree_Store_Writer:
+    """
+    Appends trees to a store.  It has the interface of the CSV writers used by the result sinks.
+    """
+    def __init__ (self, directory, threshold_type = 'float64', classes = None, records_id = None):
+        """
+        Open or create a store.
+        :param threshold_type: one of the keys of THRESHOLD_TYPES.
+        :param classes: list with the class of each data set, as given in the data sets file, to store the class
+        predicted by each node, or None.
+        :param records_id: the identifier of the records of the data sets, or None if it is not known.
+        """
+        self.directory = directory
+        header = {
+            'version': VERSION,
+            'threshold': threshold_type,
+        }
+        if classes is not None:
+            header ['classes'] = classes
+        if records_id is not None:
+            header ['records'] = records_id
+        if not os.path.isdir (directory):
+            os.makedirs (directory)
+        header_filename = os.path.join (directory, HEADER)
+        if os.path.exists (header_filename):
+            with open (header_filename, 'r') as fd:
+                if yaml.safe_load (fd) != header:
+                    raise Exception ('[E] Tree store {} has a different header'.format (directory))
+        else:
+            with open (header_filename, 'w') as fd:
+                yaml.safe_dump (header, fd, default_flow_style = False)
+        self.types = [
+            (name, THRESHOLD_TYPES [threshold_type] if dtype is None else dtype)
+            for name, dtype in NODE_ARRAYS
+        ] + ([] if classes is None else [NODE_CLASS])
+        index_filename = os.path.join (directory, INDEX)
+        self.index = binary_store.open_append (index_filename, binary_store.whole_records (index_filename, INDEX_DTYPE))
+        index = read_index (directory)
+        self.offset = 0 if len (index) == 0 else int (index ['offset'][-1] + index ['node.count'][-1])
+        self.files = [
+            binary_store.open_append (os.path.join (directory, name + '.bin'), self.offset * numpy.dtype (dtype).itemsize)
+            for name, dtype in self.types
+        ]
+
+    def writerow (self, row):
+        """
+        Append a tree given as a row of the CSV file with the decision tree structures.
+        """
+        self.write (row_tree (row))
+
+    def write (self, tree):
+        """
+        Append a tree.
+        :type tree: Tree
+        """
+        number_nodes = len (tree.children_left)
+        if len (self.types) > len (NODE_ARRAYS) and tree.node_class is None:
+            raise Exception ('[E] Tree store {} needs the node classes of the trees'.format (self.directory))
+        for fd, (_name, dtype), values in zip (self.files, self.types, tree [2:]):
+            numpy.asarray (values, dtype = dtype).tofile (fd)
+            fd.flush ()
+        record = numpy.zeros (1, dtype = INDEX_DTYPE)
+        record ['time'] = tree.time
+        record ['run'] = tree.run
+        record ['node.count'] = number_nodes
+        record ['offset'] = self.offset
+        record.tofile (self.index)
+        self.index.flush ()
+        self.offset += number_nodes
+
+    def close (self):
+        for fd in self.files:
+            fd.close ()
+        self.index.close ()
+
+def read_index (directory):
+    return binary_store.read_records (os.path.join (directory, INDEX), INDEX_DTYPE)
+
+class Tree_Store:
+    """
+    Reads the trees of a store.
+    """
+    def __init__ (self, directory):
+        with open (os.path.join (directory, HEADER), 'r') as fd:
+            header = yaml.safe_load (fd)
+        if header ['version'] != VERSION:
+            raise Exception ('[E] Tree store {} has version {}, expected {}'.format (directory, header ['version'], VERSION))
+        self.directory = directory
+        self.classes = header.get ('classes')
+        self.records_id = header.get ('records')
+        self.index = read_index (directory)
+        self.arrays = []
+        for name, dtype in NODE_ARRAYS + ([] if self.classes is None else [NODE_CLASS]):
+            dtype = THRESHOLD_TYPES [header ['threshold']] if dtype is None else dtype
+            self.arrays.append (binary_store.memmap (os.path.join (directory, name + '.bin'), dtype))
+
+    def __len__ (self):
+        return len (self.index)
+
+    def __getitem__ (self, index_tree):
+        """
+        Return a tree.
+        :rtype: Tree
+        """
+        record = self.index [index_tree]
+        start = int (record ['offset'])
+        end = start + int (record ['node.count'])
+        return Tree (float (record ['time']), int (record ['run']), *[array [start:end] for array in self.arrays])
+
+    def __iter__ (self):
+        for index_tree in range (len (self)):
+            yield self [index_tree]
+
+def predict_classes (tree, xs):
+    """
+    Apply a tree with node classes to some records.
+    All the records move down a level at a time, the ones in internal nodes going to the child given by their test.
+    :type tree: Tree
+    :param xs: two-dimensional array with a row per record.
+    :return: array with the index of the class predicted for each record, or -1, see NODE_CLASS.
+    """
+    nodes = numpy.zeros (len (xs), dtype = numpy.intp)
+    rows = numpy.arange (len (xs))
+    while True:
+        internal = numpy.flatnonzero (tree.children_left [nodes [rows]] != -1)
+        if len (internal) == 0:
+            break
+        rows = rows [internal]
+        current = nodes [rows]
+        left = xs [rows, tree.feature [current]] <= tree.threshold [current]
+        nodes [rows] = numpy.where (left, tree.children_left [current], tree.children_right [current])
+    return numpy.asarray (tree.node_class) [nodes]
+
+def store_name (csv_filename):
+    """
+    Return the name of the store converted from a CSV file.
+    """
+    return '{}.{}'.format (os.path.splitext (csv_filename) [0], EXTENSION)
+
+def main ():
+    args = parse_arguments ()
+    for filename in args.FILE:
+        output = store_name (filename) if args.output is None else args.output
+        writer = Tree_Store_Writer (output, args.threshold_type)
+        number_trees = 0
+        with open (filename, 'r') as fd:
+            for row in csv.reader (fd, delimiter = ',', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"'):
+                writer.writerow (row)
+                number_trees += 1
+        writer.close ()
+        print ("Converted {0} trees of {1} to {2}".format (number_trees, filename, output))
+
+def parse_arguments ():
+    parser = argparse.ArgumentParser (
+        description = 'Convert CSV files with decision tree structures to binary tree stores.'
+    )
+    parser.add_argument (
+        'FILE',
+        type = str,
+        nargs = '+',
+        help = 'a CSV file with a decision tree per row'
+    )
+    parser.add_argument (
+        '--output',
+        type = str,
+        default = None,
+        metavar = 'DIRECTORY',
+        help = 'the store where the trees of all the files are appended.  By default each file is converted to a store with the same name and extension {}.'.format (EXTENSION)
+    )
+    parser.add_argument (
+        '--threshold-type',
+        type = str,
+        choices = sorted (THRESHOLD_TYPES.keys ()),
+        default = 'float64',
+        help = 'type of the thresholds.  float32 halves their size, but thresholds may be rounded.'
+    )
+    return parser.parse_args ()
+
+if __name__ == '__main__':
+    main ()
@@ -0,0 +1,281 @@
+"""
+Binary store of the trained neural networks of a run, an alternative to the CSV file with the neural network weights.
+
+A store is a directory with the weights and layer sizes of all the networks one after the other:
+
+weights.bin   float32, the coefficient matrices of each layer in row-major order followed by the intercept vectors,
+              in the order of the CSV rows
+layers.bin    int32, the number of units of each layer, from the input layer to the output layer
+index.bin     a record per network (see INDEX_DTYPE) with the time and repeat index of the row, the activation
+              functions, and the number and offset of its layer sizes and of its weights
+header.yaml   the format version, the classes of the data sets, used to rebuild the label binarizer, and optionally the
+              identifier of their records (see function dataset.records_id)
+
+Networks are appended by writing their weights and layer sizes before their index record, so a reader never sees a
+network whose weights are incomplete (see module binary_store).  The weights and layer sizes are memory mapped by the
+reader, so network k is read by looking up its index record.  Method Weight_Store.classifier rebuilds a sklearn
+MLPClassifier that predicts as the trained network, up to the rounding of the weights to float32.
+
+This module can also be run to export stores to the CSV format.
+"""
+
+import argparse
+import collections
+import csv
+import numpy
+import os
+import os.path
+import sklearn.neural_network
+import sklearn.preprocessing
+import yaml
+
+import binary_store
+
+"""Version of the store format."""
+VERSION = 1
+
+"""Extension of the store directories."""
+EXTENSION = 'weights'
+
+HEADER = 'header.yaml'
+INDEX = 'index.bin'
+WEIGHTS = 'weights.bin'
+LAYERS = 'layers.bin'
+
+"""Record of the index of a store."""
+INDEX_DTYPE = numpy.dtype ([
+    ('time', '<f8'),
+    ('run', '<i4'),
+    ('activation', 'S16'),
+    ('out.activation', 'S16'),
+    ('layer.count', '<i4'),
+    ('layers.offset', '<i8'),
+    ('weight.count', '<i8'),
+    ('weights.offset', '<i8'),
+])
+
+WEIGHT_DTYPE = numpy.dtype ('<f4')
+LAYER_DTYPE = numpy.dtype ('<i4')
+
+"""
+A neural network: the activation functions of the hidden and output layers, the number of units of each layer, and
+the lists of coefficient matrices and intercept vectors as in MLPClassifier.
+"""
+Model = collections.namedtuple ('Model', ['time', 'run', 'activation', 'out_activation', 'layer_units', 'coefs', 'intercepts'])
+
+def model_from_classifier (current_time, index_repeat, classifier):
+    """
+    :type classifier: sklearn.neural_network.MLPClassifier
+    :rtype: Model
+    """
+    return Model (
+        current_time,
+        index_repeat,
+        classifier.activation,
+        classifier.out_activation_,
+        [classifier.coefs_ [0].shape [0]] + [intercept.shape [0] for intercept in classifier.intercepts_],
+        classifier.coefs_,
+        classifier.intercepts_)
+
+def model_from_weights (current_time, index_repeat, activation, out_activation, layer_units, weights):
+    """
+    Create a network from its weights in the order of the CSV rows and of the store.
+    :param layer_units: list with the number of units of each layer.
+    :param weights: one-dimensional array with the weights.
+    :rtype: Model
+    """
+    weights = numpy.asarray (weights)
+    sizes = [(a, b) for a, b in zip (layer_units [:-1], layer_units [1:])]
+    if len (weights) != sum (a * b + b for a, b in sizes):
+        raise Exception ('[E] A network with layers {} cannot have {} weights'.format (list (layer_units), len (weights)))
+    coefs = []
+    offset = 0
+    for a, b in sizes:
+        coefs.append (weights [offset:offset + a * b].reshape (a, b))
+        offset += a * b
+    intercepts = []
+    for _a, b in sizes:
+        intercepts.append (weights [offset:offset + b])
+        offset += b
+    return Model (current_time, index_repeat, activation, out_activation, list (layer_units), coefs, intercepts)
+
+def model_row (model):
+    """
+    Convert a network to a row of the CSV file with the neural network weights: the time, the repeat index, the output
+    activation function, the number of layers, the number of outputs and the weights in the order of the store.
+    :type model: Model
+    """
+    row = [model.time, model.run, model.out_activation, len (model.layer_units), model.layer_units [-1]]
+    for array in list (model.coefs) + list (model.intercepts):
+        row.extend (numpy.ravel (array).tolist ())
+    return row
+
+class Weight_Store_Writer:
+    """
+    Appends networks to a store.
+    """
+    def __init__ (self, directory, classes, records_id = None):
+        """
+        Open or create a store.
+        :param classes: list with the class of each data set, as given in the data sets file.
+        :param records_id: the identifier of the records of the data sets, or None if it is not known.
+        """
+        self.directory = directory
+        header = {
+            'version': VERSION,
+            'classes': classes,
+        }
+        if records_id is not None:
+            header ['records'] = records_id
+        if not os.path.isdir (directory):
+            os.makedirs (directory)
+        header_filename = os.path.join (directory, HEADER)
+        if os.path.exists (header_filename):
+            with open (header_filename, 'r') as fd:
+                if yaml.safe_load (fd) != header:
+                    raise Exception ('[E] Weight store {} has a different header'.format (directory))
+        else:
+            with open (header_filename, 'w') as fd:
+                yaml.safe_dump (header, fd, default_flow_style = False)
+        index_filename = os.path.join (directory, INDEX)
+        self.index = binary_store.open_append (index_filename, binary_store.whole_records (index_filename, INDEX_DTYPE))
+        index = read_index (directory)
+        if len (index) == 0:
+            self.layers_offset = 0
+            self.weights_offset = 0
+        else:
+            self.layers_offset = int (index ['layers.offset'][-1] + index ['layer.count'][-1])
+            self.weights_offset = int (index ['weights.offset'][-1] + index ['weight.count'][-1])
+        self.weights = binary_store.open_append (os.path.join (directory, WEIGHTS), self.weights_offset * WEIGHT_DTYPE.itemsize)
+        self.layers = binary_store.open_append (os.path.join (directory, LAYERS), self.layers_offset * LAYER_DTYPE.itemsize)
+
+    def write (self, model):
+        """
+        Append a network.
+        :type model: Model
+        """
+        number_weights = 0
+        for array in list (model.coefs) + list (model.intercepts):
+            numpy.asarray (array, dtype = WEIGHT_DTYPE).tofile (self.weights)
+            number_weights += numpy.size (array)
+        self.weights.flush ()
+        numpy.asarray (model.layer_units, dtype = LAYER_DTYPE).tofile (self.layers)
+        self.layers.flush ()
+        record = numpy.zeros (1, dtype = INDEX_DTYPE)
+        record ['time'] = model.time
+        record ['run'] = model.run
+        record ['activation'] = model.activation
+        record ['out.activation'] = model.out_activation
+        record ['layer.count'] = len (model.layer_units)
+        record ['layers.offset'] = self.layers_offset
+        record ['weight.count'] = number_weights
+        record ['weights.offset'] = self.weights_offset
+        record.tofile (self.index)
+        self.index.flush ()
+        self.layers_offset += len (model.layer_units)
+        self.weights_offset += number_weights
+
+    def close (self):
+        self.weights.close ()
+        self.layers.close ()
+        self.index.close ()
+
+def read_index (directory):
+    return binary_store.read_records (os.path.join (directory, INDEX), INDEX_DTYPE)
+
+class Weight_Store:
+    """
+    Reads the networks of a store.
+    """
+    def __init__ (self, directory):
+        with open (os.path.join (directory, HEADER), 'r') as fd:
+            header = yaml.safe_load (fd)
+        if header ['version'] != VERSION:
+            raise Exception ('[E] Weight store {} has version {}, expected {}'.format (directory, header ['version'], VERSION))
+        self.directory = directory
+        self.classes = header ['classes']
+        self.records_id = header.get ('records')
+        self.index = read_index (directory)
+        self.weights = binary_store.memmap (os.path.join (directory, WEIGHTS), WEIGHT_DTYPE)
+        self.layers = binary_store.memmap (os.path.join (directory, LAYERS), LAYER_DTYPE)
+
+    def __len__ (self):
+        return len (self.index)
+
+    def __getitem__ (self, index_model):
+        """
+        Return a network, whose weights are read-only views of the store file.
+        :rtype: Model
+        """
+        record = self.index [index_model]
+        layers_offset = int (record ['layers.offset'])
+        weights_offset = int (record ['weights.offset'])
+        return model_from_weights (
+            float (record ['time']),
+            int (record ['run']),
+            record ['activation'].decode ('ascii'),
+            record ['out.activation'].decode ('ascii'),
+            [int (units) for units in self.layers [layers_offset:layers_offset + int (record ['layer.count'])]],
+            self.weights [weights_offset:weights_offset + int (record ['weight.count'])])
+
+    def __iter__ (self):
+        for index_model in range (len (self)):
+            yield self [index_model]
+
+    def classifier (self, index_model):
+        """
+        Rebuild a network as a classifier that can predict.
+        :rtype: sklearn.neural_network.MLPClassifier
+        """
+        model = self [index_model]
+        result = sklearn.neural_network.MLPClassifier (
+            activation = model.activation,
+            hidden_layer_sizes = tuple (model.layer_units [1:-1]))
+        result.coefs_ = list (model.coefs)
+        result.intercepts_ = list (model.intercepts)
+        result.n_layers_ = len (model.layer_units)
+        result.n_outputs_ = model.layer_units [-1]
+        result.out_activation_ = model.out_activation
+        result._label_binarizer = sklearn.preprocessing.LabelBinarizer ()
+        result._label_binarizer.fit (numpy.array (self.classes))
+        result.classes_ = result._label_binarizer.classes_
+        return result
+
+def csv_name (directory):
+    """
+    Return the name of the CSV file exported from a store.
+    """
+    return '{}.csv'.format (os.path.splitext (directory.rstrip (os.path.sep)) [0])
+
+def main ():
+    args = parse_arguments ()
+    for directory in args.STORE:
+        output = csv_name (directory) if args.output is None else args.output
+        store = Weight_Store (directory)
+        with open (output, 'a' if args.output is not None else 'w') as fd:
+            writer = csv.writer (fd, delimiter = ',', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
+            for model in store:
+                writer.writerow (model_row (model))
+        print ("Exported {0} networks of {1} to {2}".format (len (store), directory, output))
+
+def parse_arguments ():
+    parser = argparse.ArgumentParser (
+        description = 'Export binary neural network weight stores to CSV files with a network per row.'
+    )
+    parser.add_argument (
+        'STORE',
+        type = str,
+        nargs = '+',
+        help = 'a weight store directory'
+    )
+    parser.add_argument (
+        '--output',
+        type = str,
+        default = None,
+        metavar = 'FILENAME',
+        help = 'the CSV file where the networks of all the stores are appended.  By default each store is exported to a file with the same name and extension csv.'
+    )
+    return parser.parse_args ()
+
+if __name__ == '__main__':
+    main ()
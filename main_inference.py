@@ -0,0 +1,193 @@
+import argparse
+import numpy
+import signal
+import sys
+import time
+import zmq
+
+import command_line_arguments
+import ensemble
+import metrics
+import socket_operations
+
+"""Seconds between writes of the metrics file."""
+METRICS_INTERVAL = 10
+
+"""Upper bounds in seconds of the buckets of the batch latency histogram."""
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005] + metrics.DEFAULT_BUCKETS
+
+class Inference_Service:
+    """
+    Classifies batches of new records with an ensemble of saved classifiers (see module ensemble), which is loaded once.
+
+    Records are TSV rows with the attribute values, as in the data set files without the header.  They are read from
+    the standard input, where a batch ends with an empty line or at the end of the input, or received as messages on a
+    ZeroMQ reply socket.  A message is a dictionary with either a two-dimensional array in key rows or the TSV text in
+    key tsv (see function request_predictions).
+
+    For each record, the service answers the class with most votes and the votes of each class, the last count being
+    the members that did not predict a class.  In the standard input mode, the answers of a batch are written as TSV
+    rows to the standard output followed by an empty line, and the other messages go to the standard error.
+
+    The latency of each batch and the number of records are kept as metrics, which are written to a file every
+    METRICS_INTERVAL seconds if option --metrics is given, and summarised when the service stops, either by an
+    interrupt or by a SIGTERM signal.
+    """
+    def __init__ (self, args):
+        start = time.time ()
+        self.ensemble = ensemble.Ensemble (args.trees, args.networks)
+        self.labels = [ensemble.class_label (class_name) for class_name in self.ensemble.classes]
+        log ("Loaded {0} classifiers of {1} classes in {2:.2f} s".format (
+            len (self.ensemble.members), len (self.labels), time.time () - start))
+        self.endpoint = args.endpoint
+        if self.endpoint is not None:
+            socket_operations.configure_from_arguments (args)
+        self.registry = metrics.Registry ()
+        self.batches = self.registry.counter ('inference_batches_total', 'Batches of records classified.')
+        self.records = self.registry.counter ('inference_records_total', 'Records classified.')
+        self.failed = self.registry.counter ('inference_failed_batches_total', 'Batches that could not be classified.')
+        self.latency = self.registry.histogram (
+            'inference_batch_seconds', 'Time to classify a batch, from parsing its records to having the votes.',
+            buckets = LATENCY_BUCKETS)
+        self.members = self.registry.gauge ('inference_classifiers', 'Classifiers in the ensemble.')
+        self.members.set (len (self.ensemble.members))
+        self.metrics_file = args.metrics
+        self.next_metrics = time.time () + METRICS_INTERVAL
+
+    def loop (self):
+        start = time.time ()
+        signal.signal (signal.SIGTERM, _terminate)
+        try:
+            if self.endpoint is None:
+                self.serve_stream (sys.stdin, sys.stdout)
+            else:
+                self.serve_socket ()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.write_metrics ()
+            socket_operations.close_all ()
+        self.summary (time.time () - start)
+
+    def serve_stream (self, input, output):
+        output.write ('\t'.join (['"predicted.class"'] + ['"votes.{}"'.format (label) for label in self.labels] + ['"votes.no.output"']) + '\n')
+        output.flush ()
+        batch = []
+        # readline does not wait for the read-ahead buffer of file iteration to fill
+        for line in iter (input.readline, ''):
+            if line.strip () != '':
+                batch.append (line)
+            elif len (batch) > 0:
+                self.write_batch (output, batch)
+                batch = []
+        if len (batch) > 0:
+            self.write_batch (output, batch)
+
+    def write_batch (self, output, lines):
+        try:
+            predicted, votes = self.classify (lambda: numpy.loadtxt (lines, dtype = numpy.float64, delimiter = '\t', ndmin = 2))
+        except Exception as error:
+            log ('[W] Batch of {0} records not classified: {1}'.format (len (lines), error))
+        else:
+            for index_class, record_votes in zip (predicted, votes):
+                output.write ('\t'.join (['"{}"'.format (self.label (index_class))] + [str (count) for count in record_votes]) + '\n')
+        output.write ('\n')
+        output.flush ()
+
+    def serve_socket (self):
+        socket = socket_operations.bind_endpoint (zmq.REP, self.endpoint)
+        log ("Waiting for batches on {0}".format (self.endpoint))
+        while True:
+            message = socket_operations.recv (socket)
+            try:
+                if 'rows' in message:
+                    parse = lambda: numpy.array (message ['rows'], dtype = numpy.float64, ndmin = 2)
+                else:
+                    parse = lambda: numpy.loadtxt (message ['tsv'].splitlines (), dtype = numpy.float64, delimiter = '\t', ndmin = 2)
+                start = time.time ()
+                predicted, votes = self.classify (parse)
+                answer = {
+                    'classes': self.labels,
+                    'predicted': predicted,
+                    'votes': votes,
+                    'seconds': time.time () - start,
+                }
+            except Exception as error:
+                log ('[W] Batch not classified: {0}'.format (error))
+                answer = {'error': str (error)}
+            socket_operations.send (socket, answer)
+
+    def classify (self, parse):
+        """
+        Parse and classify a batch of records and update the metrics.
+        :param parse: function that returns the two-dimensional array of the records.
+        :return: the tuple returned by method ensemble.Ensemble.predict.
+        """
+        start = time.time ()
+        try:
+            xs = parse ()
+            result = self.ensemble.predict (xs)
+        except Exception:
+            self.failed.inc ()
+            raise
+        self.latency.observe (time.time () - start)
+        self.batches.inc ()
+        self.records.inc (len (xs))
+        if self.metrics_file is not None and time.time () >= self.next_metrics:
+            self.write_metrics ()
+            self.next_metrics = time.time () + METRICS_INTERVAL
+        return result
+
+    def label (self, index_class):
+        return 'no output' if index_class == -1 else self.labels [index_class]
+
+    def write_metrics (self):
+        if self.metrics_file is not None:
+            self.registry.write (self.metrics_file)
+
+    def summary (self, elapsed):
+        """
+        Print the number of records classified, the throughput and the batch latency.
+        """
+        buckets = self.latency.merged ()
+        records = self.records.total ()
+        log ("Classified {0:.0f} records in {1} batches, {2:.0f} failed".format (records, buckets.count, self.failed.total ()))
+        if buckets.count > 0:
+            log ("Throughput: {0:.0f} records/s while classifying, {1:.0f} records/s since the start".format (
+                records / buckets.sum if buckets.sum > 0 else float ('inf'), records / elapsed))
+            log ("Batch latency: mean {0:.6f} s, median <= {1} s, 99% <= {2} s".format (
+                buckets.mean (), self.latency.quantile (buckets, 0.5), self.latency.quantile (buckets, 0.99)))
+
+def _terminate (_signal_number, _frame):
+    # stop as on an interrupt, so that the metrics are written
+    raise KeyboardInterrupt ()
+
+def request_predictions (endpoint, rows):
+    """
+    Ask the service listening on an endpoint to classify some records.
+    :param rows: two-dimensional array with a row per record.
+    :return: a dictionary with the class labels, the predicted class index of each record (-1 if none), the votes and
+    the seconds taken by the service, or with the error if the batch could not be classified.
+    The socket is kept in the pool of module socket_operations for the next requests, see function
+    socket_operations.close_all.
+    """
+    return socket_operations.send_recv (socket_operations.connect_endpoint (zmq.REQ, endpoint), {'rows': rows})
+
+def log (message):
+    sys.stderr.write (message + '\n')
+    sys.stderr.flush ()
+
+def parse_arguments ():
+    parser = argparse.ArgumentParser (
+        description = "Optigrape inference service"
+    )
+    command_line_arguments.argument_trees (parser)
+    command_line_arguments.argument_networks (parser)
+    command_line_arguments.argument_endpoint (parser)
+    command_line_arguments.arguments_sockets (parser)
+    command_line_arguments.argument_metrics (parser)
+    return parser.parse_args ()
+
+if __name__ == '__main__':
+    service = Inference_Service (parse_arguments ())
+    service.loop ()
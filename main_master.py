@@ -1,33 +1,374 @@
-
 import argparse
+import collections
+import os.path
+import subprocess
+import sys
+import time
 import zmq
 
+import campaign
 import command_line_arguments
+import cost_model
+import metrics
 import socket_operations
 
+"""Milliseconds between checks of the task leases."""
+POLL_INTERVAL = 1000
+
+"""Seconds between progress reports."""
+PROGRESS_INTERVAL = 10
+
 class Master:
+    """
+    Sends the tasks of a campaign through the ventilator socket and writes the rows that the workers send to the sink socket.
+    Workers request the samples of the campaign data sets through the data server socket.
+
+    Workers ask for a task through the ventilator socket when they are idle, so fast workers perform more tasks than
+    slow ones.  Tasks are dispatched longest expected first, as predicted by a cost model (see module cost_model) which
+    is updated with the time of each completed task.  The rows of completed tasks are written by a thread, so that
+    writing does not delay dispatching tasks and collecting their results.
+
+    Each dispatched task is leased until a deadline, which is renewed by the heartbeats that the worker holding it
+    sends to the sink socket.  When a lease expires, because the worker died or stalled, the task is dispatched again,
+    up to a maximum number of attempts.  The first completion of a task is written and later ones are ignored.
+
+    The master keeps metrics of the tasks, the workers and the sockets (see class Master_Metrics), which are written
+    to a file every PROGRESS_INTERVAL seconds if option --metrics is given, and summarised at the end of the campaign.
+    """
     def __init__ (self, args):
+        self.campaign = campaign.Campaign (args.campaign)
+        self.number_workers = args.workers
+        server = "127.0.0.1" if args.local else "*"
+        socket_operations.configure_from_arguments (args)
         print ("Creating socket to send requests...")
-        self.sender = socket_operations.bind (zmq.PUSH, args.ventilator)
+        self.ventilator = socket_operations.bind_endpoint (
+            zmq.ROUTER, socket_operations.endpoint (server, args.ventilator, args.ipc, "ventilator"))
         print ("Creating socket to receive answers...")
-        self.receiver = socket_operations.bind (zmq.PULL, args.sink)
+        self.receiver = socket_operations.bind_endpoint (
+            zmq.PULL, socket_operations.endpoint (server, args.sink, args.ipc, "sink"))
+        print ("Creating socket to serve data sets...")
+        self.data_server = socket_operations.bind_endpoint (
+            zmq.REP, socket_operations.endpoint (server, args.data_server, args.ipc, "data"))
+        self.cost_model = cost_model.Cost_Model (args.cost_history)
+        self.cache_statistics = {}
+        self.lease = args.lease
+        self.max_attempts = args.max_attempts
+        self.task_time_limit = args.task_time_limit
+        self.leases = {}
+        self.attempts = collections.Counter ()
+        self.idle = collections.deque ()
+        self.last_seen = {}
+        self.lost_workers = set ()
+        self.metrics = Master_Metrics ()
+        self.metrics_file = args.metrics
+        self.workers = []
+        if args.local:
+            self.workers = start_local_workers (args)
 
     def loop (self):
         print ("Entering main loop...")
-        self.hello_world()
-
-    def hello_world (self):
-        print ("Sending hello...")
-        socket_operations.send (self.sender, "Hello")
-        print ("Waiting for answer...")
-        answer = socket_operations.recv (self.receiver)
-        print (answer)
-
-parser = argparse.ArgumentParser (
-    description = "Optigrape master"
-)
-command_line_arguments.argument_sink (parser)
-command_line_arguments.argument_ventilator (parser)
-args = parser.parse_args ()
-master = Master (args)
-master.loop ()
+        self.tasks = self.campaign.tasks (self.task_time_limit)
+        print ("Campaign {0} has {1} runs and {2} tasks".format (
+            self.campaign.filename, len (self.campaign.runs), len (self.tasks)))
+        self.features = dict ((run, self.campaign.cost_features (run)) for run in self.campaign.runs)
+        self.pending = cost_model.Task_Queue (self.cost_model, self.features)
+        for task in sorted (self.tasks, key = self.pending.predict, reverse = True):
+            self.pending.append (task)
+        predicted_makespan = cost_model.makespan (
+            sorted ([self.pending.predict (task) for task in self.tasks], reverse = True), self.number_workers)
+        print ("Predicted makespan with {0} workers is {1:.1f} seconds".format (self.number_workers, predicted_makespan))
+        self.metrics.tasks.set (len (self.tasks))
+        self.writer = campaign.Background_Writer (campaign.Campaign_Writer (self.campaign))
+        poller = zmq.Poller ()
+        poller.register (self.ventilator, zmq.POLLIN)
+        poller.register (self.receiver, zmq.POLLIN)
+        poller.register (self.data_server, zmq.POLLIN)
+        self.done = set ()
+        self.failed = 0
+        start = None
+        next_progress = time.time () + PROGRESS_INTERVAL
+        try:
+            while len (self.done) < len (self.tasks):
+                while len (self.pending) > 0 and len (self.idle) > 0:
+                    start = time.time () if start is None else start
+                    task = self.pending.popleft ()
+                    if task ['id'] not in self.done:
+                        self.dispatch (self.idle.popleft (), task)
+                sockets = dict (poller.poll (POLL_INTERVAL))
+                if self.data_server in sockets:
+                    self.serve_samples ()
+                # handle all the messages that arrived, so that a burst of answers costs a single poll
+                while self.ventilator.poll (0):
+                    identity, request = socket_operations.recv_from (self.ventilator)
+                    self.worker_seen (request)
+                    self.idle.append (identity)
+                while self.receiver.poll (0):
+                    self.handle_answer (socket_operations.recv (self.receiver))
+                for task_id in self.expired_leases ():
+                    if self.attempts [task_id] >= self.max_attempts:
+                        self.done.add (task_id)
+                        self.failed += 1
+                        self.metrics.failed.inc (reason = 'lost')
+                        print ('[E] Task {0} was lost {1} times'.format (self.tasks [task_id], self.attempts [task_id]))
+                    else:
+                        print ('[W] Lease of task {0} expired, dispatching it again'.format (task_id))
+                        self.metrics.redispatched.inc ()
+                        self.pending.appendleft (self.tasks [task_id])
+                if time.time () >= next_progress:
+                    self.report_progress (start)
+                    self.write_metrics ()
+                    next_progress = time.time () + PROGRESS_INTERVAL
+        finally:
+            self.writer.close ()
+            self.stop_workers ()
+            self.cost_model.save ()
+            self.write_metrics ()
+            socket_operations.close_all ()
+        print ("Performed {0} tasks, {1} failed".format (len (self.tasks), self.failed))
+        if start is not None:
+            print ("Makespan: predicted {0:.1f} seconds, actual {1:.1f} seconds".format (predicted_makespan, time.time () - start))
+        for worker, statistics in sorted (self.cache_statistics.items ()):
+            print ("Worker {0} samples cache: {1[hits]} hits, {1[misses]} misses, {1[evictions]} evictions".format (worker, statistics))
+        self.metrics.summary ()
+
+    def handle_answer (self, answer):
+        """
+        Handle a message received in the sink socket: a heartbeat or the result of a task.
+        """
+        self.worker_seen (answer)
+        if 'heartbeat' in answer:
+            for task_id in answer ['ids']:
+                if task_id in self.leases:
+                    self.leases [task_id] = time.time () + self.lease
+            return
+        self.metrics.transport.observe (time.time () - answer ['dispatched'] - answer ['held'], worker = answer ['worker'])
+        if answer ['id'] in self.done:
+            print ("Ignoring duplicate completion of task {0} by worker {1}".format (answer ['id'], answer ['worker']))
+            self.metrics.duplicates.inc ()
+        else:
+            task = self.tasks [answer ['id']]
+            self.done.add (task ['id'])
+            self.leases.pop (task ['id'], None)
+            if 'error' in answer:
+                self.failed += 1
+                self.metrics.failed.inc (reason = 'timeout' if 'timeout' in answer else 'error')
+                print ('[E] Task {0} failed in worker {1}:\n{2}'.format (task, answer ['worker'], answer ['error']))
+            else:
+                self.metrics.completed.inc (worker = answer ['worker'])
+                self.metrics.task_seconds.observe (answer ['seconds'], worker = answer ['worker'])
+                for phase, seconds in answer ['phases'].items ():
+                    self.metrics.phase_seconds.observe (seconds, worker = answer ['worker'], phase = phase)
+                self.writer.add (task, answer ['repeats'])
+                self.cost_model.add (self.features [campaign.Run (*task ['run'])], answer ['seconds'], answer ['worker'])
+
+    def report_progress (self, start):
+        elapsed = 0 if start is None else time.time () - start
+        print ("Progress: {0} of {1} tasks done, {2:.1f} tasks per second, {3} in flight, {4} waiting to be written".format (
+            len (self.done), len (self.tasks), len (self.done) / elapsed if elapsed > 0 else 0.0,
+            len (self.leases), self.writer.backlog ()))
+
+    def write_metrics (self):
+        """
+        Update the gauges and the traffic counters, and write the metrics file, if any.
+        """
+        self.metrics.pending.set (len (self.pending))
+        self.metrics.in_flight.set (len (self.leases))
+        self.metrics.write_backlog.set (self.writer.backlog ())
+        self.metrics.idle_workers.set (len (self.idle))
+        self.metrics.lost_workers.set (len (self.lost_workers))
+        for name, a_socket in [('ventilator', self.ventilator), ('sink', self.receiver), ('data', self.data_server)]:
+            for direction in [socket_operations.SENT, socket_operations.RECEIVED]:
+                self.metrics.traffic.set (socket_operations.transferred (a_socket, direction), socket = name, direction = direction)
+        for worker, statistics in self.cache_statistics.items ():
+            for event in ['hits', 'misses', 'evictions']:
+                self.metrics.cache.set (statistics [event], worker = worker, event = event)
+            self.metrics.cache_bytes.set (statistics ['bytes'], worker = worker)
+        if self.metrics_file is not None:
+            self.metrics.registry.write (self.metrics_file)
+
+    def dispatch (self, identity, task):
+        """
+        Send a task to the idle worker with the given identity and lease it.
+        """
+        self.metrics.dispatched.inc ()
+        self.attempts [task ['id']] += 1
+        self.leases [task ['id']] = time.time () + self.lease
+        # the worker returns the dispatch time in the answer, so each attempt of the task has its own
+        socket_operations.send_to (self.ventilator, identity, dict (task, dispatched = time.time ()))
+
+    def expired_leases (self):
+        """
+        Remove the leases whose deadline has passed and return their task identifiers.
+        Workers that did not send anything for longer than a lease are reported once.
+        """
+        now = time.time ()
+        result = [task_id for task_id, deadline in self.leases.items () if deadline < now]
+        for task_id in result:
+            del self.leases [task_id]
+        for worker, last_seen in self.last_seen.items ():
+            if last_seen + self.lease < now and worker not in self.lost_workers:
+                print ('[W] Worker {0} did not send heartbeats for {1:.0f} seconds'.format (worker, now - last_seen))
+                self.lost_workers.add (worker)
+        return result
+
+    def worker_seen (self, message):
+        """
+        Record a message from a worker.
+        """
+        self.last_seen [message ['worker']] = time.time ()
+        self.lost_workers.discard (message ['worker'])
+        self.cache_statistics [message ['worker']] = message ['cache']
+        if message.get ('send') is not None:
+            self.metrics.serialize.observe (message ['send']['seconds'], worker = message ['worker'])
+            self.metrics.answer_bytes.observe (message ['send']['bytes'], worker = message ['worker'])
+
+    def serve_samples (self):
+        """
+        Answer a request for the samples of a data sets file.
+        """
+        request = socket_operations.recv (self.data_server)
+        data_sets = self.campaign.data_sets_files.get (request ['data_sets_id'])
+        if data_sets is None:
+            socket_operations.send (self.data_server, {'error': 'Unknown data sets {}'.format (request ['data_sets_id'])})
+        else:
+            print ("Sending data sets {0} to worker {1}".format (data_sets, request ['worker']))
+            self.metrics.samples_served.inc (worker = request ['worker'])
+            socket_operations.send (self.data_server, campaign.samples_message (self.campaign.load_samples (data_sets)))
+
+    def stop_workers (self):
+        """
+        Answer the task requests of the workers with a stop message, until N workers are stopped or no request arrives
+        for the duration of a lease.  Local workers that did not receive the stop message are terminated.
+        """
+        print ("Stopping workers...")
+        stopped = 0
+        while stopped < self.number_workers:
+            if len (self.idle) == 0:
+                if not self.ventilator.poll (self.lease * 1000):
+                    print ('[W] Only {0} of {1} workers asked for a task to receive the stop message'.format (stopped, self.number_workers))
+                    break
+                identity, _request = socket_operations.recv_from (self.ventilator)
+                self.idle.append (identity)
+            socket_operations.send_to (self.ventilator, self.idle.popleft (), {'stop': True})
+            stopped += 1
+        for process in self.workers:
+            if stopped < self.number_workers and process.poll () is None:
+                process.terminate ()
+            process.wait ()
+
+class Master_Metrics:
+    """
+    Metrics of a campaign kept by the master, see module metrics.
+
+    The time of the phases of each task is measured by the worker (see module profiler), as is the time that the worker
+    takes to serialise and send the answer.  The transport time is the time from dispatching a task until its answer
+    is received, both on the clock of the master, minus the time the worker held the task.  It is the time that the
+    task and its answer spent in transit, and does not depend on the clocks of the hosts being synchronised.
+    """
+    def __init__ (self):
+        self.registry = metrics.Registry ()
+        self.tasks = self.registry.gauge ('campaign_tasks', 'Number of tasks of the campaign.')
+        self.dispatched = self.registry.counter ('tasks_dispatched_total', 'Tasks sent to a worker, including tasks dispatched again.')
+        self.redispatched = self.registry.counter ('tasks_redispatched_total', 'Tasks dispatched again because their lease expired.')
+        self.completed = self.registry.counter ('tasks_completed_total', 'Tasks whose rows were received.', ['worker'])
+        self.failed = self.registry.counter ('tasks_failed_total', 'Tasks that failed, by reason: error, timeout or lost.', ['reason'])
+        self.duplicates = self.registry.counter ('duplicate_completions_total', 'Completions of tasks that were already done.')
+        self.pending = self.registry.gauge ('tasks_pending', 'Tasks waiting to be dispatched.')
+        self.in_flight = self.registry.gauge ('tasks_in_flight', 'Tasks dispatched whose lease has not expired.')
+        self.write_backlog = self.registry.gauge ('write_backlog_tasks', 'Completed tasks whose rows are waiting to be written.')
+        self.idle_workers = self.registry.gauge ('workers_idle', 'Workers waiting for a task.')
+        self.lost_workers = self.registry.gauge ('workers_lost', 'Workers that did not send heartbeats for longer than a lease.')
+        self.task_seconds = self.registry.histogram ('task_seconds', 'Wall time of a task in a worker.', ['worker'])
+        self.phase_seconds = self.registry.histogram ('task_phase_seconds', 'Wall time of each phase of a task in a worker.', ['worker', 'phase'])
+        self.serialize = self.registry.histogram ('answer_serialize_seconds', 'Time taken by a worker to serialise and send an answer.', ['worker'])
+        self.transport = self.registry.histogram ('task_transport_seconds', 'Time that a task and its answer spent in transit between the master and a worker.', ['worker'])
+        self.answer_bytes = self.registry.histogram (
+            'answer_bytes', 'Size of the answers sent by a worker.', ['worker'], [1 << n for n in range (10, 31, 2)])
+        self.traffic = self.registry.counter ('bytes_total', 'Bytes sent and received by the master through each socket.', ['socket', 'direction'])
+        self.samples_served = self.registry.counter ('samples_served_total', 'Data sets sent to a worker by the master.', ['worker'])
+        self.cache = self.registry.counter ('worker_samples_cache_total', 'Hits, misses and evictions of the samples cache of each worker.', ['worker', 'event'])
+        self.cache_bytes = self.registry.gauge ('worker_samples_cache_bytes', 'Size of the samples in the cache of each worker.', ['worker'])
+
+    def summary (self):
+        """
+        Print where the time of the workers went, the traffic of the master and the samples cache hit rate.
+        """
+        print ("Tasks: {0:.0f} dispatched, {1:.0f} dispatched again, {2:.0f} completed, {3:.0f} failed".format (
+            self.dispatched.total (), self.redispatched.total (), self.completed.total (), self.failed.total ()))
+        histograms = [('task', self.task_seconds, {})] + [
+            (phase, self.phase_seconds, {'phase': phase}) for phase in self.phase_seconds.label_values ('phase')
+        ] + [('serialize', self.serialize, {}), ('transport', self.transport, {})]
+        for name, histogram, labels in histograms:
+            buckets = histogram.merged (**labels)
+            if buckets.count > 0:
+                print ("  {0:<10} {1:6d} times, total {2:9.2f} s, mean {3:8.4f} s, median <= {4} s, 90% <= {5} s".format (
+                    name, buckets.count, buckets.sum, buckets.mean (),
+                    histogram.quantile (buckets, 0.5), histogram.quantile (buckets, 0.9)))
+        for worker in self.task_seconds.label_values ('worker'):
+            buckets = self.task_seconds.merged (worker = worker)
+            print ("Worker {0}: {1} tasks, {2:.2f} s busy".format (worker, buckets.count, buckets.sum))
+        print ("Master traffic: {0:.0f} bytes sent, {1:.0f} bytes received".format (
+            sum (v for (_socket, direction), v in self.traffic.values.items () if direction == socket_operations.SENT),
+            sum (v for (_socket, direction), v in self.traffic.values.items () if direction == socket_operations.RECEIVED)))
+        hits = sum (v for (_worker, event), v in self.cache.values.items () if event == 'hits')
+        misses = sum (v for (_worker, event), v in self.cache.values.items () if event == 'misses')
+        if hits + misses > 0:
+            print ("Samples cache hit rate: {0:.1%}".format (float (hits) / (hits + misses)))
+
+def start_local_workers (args):
+    """
+    Start the workers as processes in this machine.
+    :return: the list of processes.
+    """
+    command = [
+        sys.executable,
+        os.path.join (os.path.dirname (os.path.abspath (__file__)), "main_worker.py"),
+        "--server", "127.0.0.1",
+        "--ventilator", str (args.ventilator),
+        "--sink", str (args.sink),
+        "--data-server", str (args.data_server),
+        "--data-source", args.data_source,
+        "--cache-memory", str (args.cache_memory),
+        "--heartbeat", str (args.heartbeat),
+    ]
+    if args.ipc is not None:
+        command += ["--ipc", args.ipc]
+    for option, value in [
+            ("--io-threads", args.io_threads),
+            ("--send-hwm", args.send_hwm),
+            ("--receive-hwm", args.receive_hwm),
+            ("--linger", args.linger),
+            ("--tcp-keepalive", args.tcp_keepalive)]:
+        if value is not None:
+            command += [option, str (value)]
+    if args.cache_directory is not None:
+        command += ["--cache", args.cache_directory]
+    print ("Starting {0} local workers...".format (args.workers))
+    return [subprocess.Popen (command) for _index in range (args.workers)]
+
+def parse_arguments ():
+    parser = argparse.ArgumentParser (
+        description = "Optigrape master"
+    )
+    command_line_arguments.argument_campaign (parser)
+    command_line_arguments.argument_sink (parser)
+    command_line_arguments.argument_ventilator (parser)
+    command_line_arguments.argument_data_server (parser)
+    command_line_arguments.argument_ipc (parser)
+    command_line_arguments.argument_workers (parser)
+    command_line_arguments.argument_local (parser)
+    command_line_arguments.cache_directory (parser)
+    command_line_arguments.argument_data_source (parser)
+    command_line_arguments.argument_cache_memory (parser)
+    command_line_arguments.argument_heartbeat (parser)
+    command_line_arguments.arguments_sockets (parser)
+    command_line_arguments.argument_lease (parser)
+    command_line_arguments.argument_max_attempts (parser)
+    command_line_arguments.argument_task_time_limit (parser)
+    command_line_arguments.argument_cost_history (parser)
+    command_line_arguments.argument_metrics (parser)
+    return parser.parse_args ()
+
+if __name__ == '__main__':
+    master = Master (parse_arguments ())
+    master.loop ()
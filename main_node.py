@@ -1,5 +1,4 @@
 import argparse
-import collections
 import csv
 import datetime
 import numpy.random
@@ -8,19 +7,22 @@ import sklearn.neural_network
 import time
 import yaml
 
+import classifier_output
 import command_line_arguments
 import dataset
+import scoring
+import weight_store
 
 def main ():
     args = parse_arguments ()
     RNG = numpy.random.RandomState (args.RNG_seed)
-    data_sets = dataset.load_data_sets (args.data_sets)
+    samples = dataset.Samples (dataset.load_data_sets (args.data_sets))
     parameters = load_neural_network_parameters (args.learning_parameters)
     suffix = filename_suffix (args)
     results_file, results_writer = open_results_file (suffix, parameters)
-    NN_file, NN_writer = open_neural_network_file (suffix)
+    NN_file, NN_writer = open_neural_network_file (suffix, args.classifier_format, samples)
     for index in range (args.number_repeats):
-        run_neural_network (RNG, args.fraction_test, data_sets, parameters, results_writer, NN_writer, index)
+        run_neural_network (RNG, args.fraction_test, samples, parameters, results_writer, NN_writer, index)
     results_file.close ()
     NN_file.close ()
 
@@ -33,6 +35,7 @@ def parse_arguments ():
     command_line_arguments.learning_parameters_file (parser)
     command_line_arguments.RNG_seed (parser)
     command_line_arguments.number_repeats (parser)
+    command_line_arguments.classifier_format (parser)
     return parser.parse_args ()
 
 def load_neural_network_parameters (parameters_filename):
@@ -42,9 +45,9 @@ def load_neural_network_parameters (parameters_filename):
         print ("Parameters of the neural network: {0}".format (result))
         return result
 
-def run_neural_network (RNG, fraction_test, data_sets, parameters, results_writer, NN_writer, index_repeat):
+def run_neural_network (RNG, fraction_test, samples, parameters, results_writer, NN_writer, index_repeat):
     print ("I'm going to run neural network")
-    train, test = dataset.split_data_sets_train_test (data_sets, fraction_test, RNG)
+    train, test = dataset.split_data_sets_train_test (samples, fraction_test, RNG)
     clf = sklearn.neural_network.MLPClassifier (
         activation = parameters ["activation"],
         solver = parameters ["solver"],
@@ -64,11 +67,7 @@ def run_neural_network (RNG, fraction_test, data_sets, parameters, results_write
     write_neural_network (NN_writer, current_time, index_repeat, clf)
 
 def compute_score (classifier_ys, test_ys):
-    score = 0
-    for an_y, a_test_y in zip (classifier_ys, test_ys):
-        if all ([ay == at for ay, at in zip (an_y, a_test_y)]):
-            score += 1
-    return score / float (len (test_ys))
+    return scoring.compute_score (classifier_ys, test_ys) [0]
 
 def random_chance_to_hit (train, test):
     # type: (dataset.Function, dataset.Function) -> float
@@ -78,20 +77,7 @@ def random_chance_to_hit (train, test):
     :type train: dataset.Function
     :type test: dataset.Function
     """
-    def compute_classes_occurrence (l):
-        # type: (collections.Iterable) -> dict
-        r = {}
-        for x in l:
-            if x in r:
-                r [x] = r [x] + 1
-            else:
-                r [x] = 1
-        return r
-    count_classes_train = compute_classes_occurrence (train.IDs)
-    count_classes_test = compute_classes_occurrence (test.IDs)
-    result = sum ([count_classes_train [key] * count_classes_test [key] for key in count_classes_test.keys ()])
-    result = result / float (len (train.IDs) * len (test.IDs))
-    return result
+    return scoring.random_chance_to_hit (train.IDs, test.IDs)
 
 def filename_suffix (args):
     # type: (argparse.Namespace) -> str
@@ -130,7 +116,13 @@ def open_results_file (suffix, parameters):
     results_writer.writerow (header_row)
     return results_file, results_writer
 
-def open_neural_network_file (suffix):
+def open_neural_network_file (suffix, classifier_format, samples):
+    if classifier_format == classifier_output.BINARY:
+        NN_writer = weight_store.Weight_Store_Writer (
+            "neural-network_{0}.{1}".format (suffix, weight_store.EXTENSION),
+            [d.class_name for d in samples.list_data_sets],
+            dataset.records_id (samples.list_data_sets))
+        return NN_writer, NN_writer
     NN_file = open ("neural-network_{0}.csv".format (suffix), "w")
     NN_writer = csv.writer (NN_file, delimiter = ',', quoting = csv.QUOTE_NONNUMERIC, quotechar = '"')
     return NN_file, NN_writer
@@ -152,6 +144,9 @@ def write_results (results_writer, current_time, index_repeat, parameters, clf,
     results_writer.writerow (row)
 
 def write_neural_network (NN_writer, current_time, index_repeat, clf):
+    if isinstance (NN_writer, weight_store.Weight_Store_Writer):
+        NN_writer.write (weight_store.model_from_classifier (current_time, index_repeat, clf))
+        return
     row = [current_time, index_repeat, clf.out_activation_, clf.n_layers_, clf.n_outputs_]
     for matrix in clf.coefs_:
         for cr in matrix:
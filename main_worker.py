@@ -1,44 +1,204 @@
 import argparse
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
 import zmq
 
+import campaign
 import command_line_arguments
 import dataset
 import socket_operations
 
 class Worker:
+    """
+    Asks the ventilator socket for a task when it is idle, performs it and sends its rows to the sink socket.
+    Samples that are not in the cache are read from the data sets file or requested from the master through the data server socket.
+
+    A thread sends heartbeats to the master through its own sink socket, with the task being performed, if any.
+    Tasks with a time limit run in a child process, which is killed if it exceeds the limit.  The child process
+    inherits the cached samples.  Other tasks run in this process, which avoids the cost of a fork per task.
+
+    The answer of a task has the time spent in each phase of the task (see module profiler), the dispatch time that the
+    master put in the task, and the time that this worker held the task until sending the answer.  The time and bytes
+    taken to send an answer are reported in the next task request.
+    """
     def __init__ (self, args):
+        socket_operations.configure_from_arguments (args)
         print ("Creating socket to receive requests...")
-        self.receiver = socket_operations.connect (zmq.PULL, args.server, args.ventilator)
+        self.receiver = socket_operations.connect_endpoint (
+            zmq.DEALER, socket_operations.endpoint (args.server, args.ventilator, args.ipc, "ventilator"))
         print ("creating socket to send answers...")
-        self.sender = socket_operations.connect (zmq.PUSH, args.server, args.sink)
-        print ("loading data sets...")
-        print (args.data_set)
-        self.list_data_sets = self.load_data_sets (args.data_set)
+        self.sink = socket_operations.endpoint (args.server, args.sink, args.ipc, "sink")
+        self.sender = socket_operations.connect_endpoint (zmq.PUSH, self.sink)
+        print ("creating socket to request data sets...")
+        self.data_client = socket_operations.connect_endpoint (
+            zmq.REQ, socket_operations.endpoint (args.server, args.data_server, args.ipc, "data"))
+        self.name = "{0}:{1}".format (socket.gethostname (), os.getpid ())
+        self.data_source = args.data_source
+        self.cache_directory = args.cache_directory
+        self.heartbeat = args.heartbeat
+        self.executor = campaign.Executor (args.cache_memory * 1024 * 1024, self.fetch_samples)
+        self.task = None
+        self.stopped = threading.Event ()
+        self.last_send = None
 
     def loop (self):
         print ("Entering main loop")
-        for d in self.list_data_sets:
-            print ("OI")
-            print (d)
-        return None
-
-    def load_data_sets (self, list_file_names):
-        # type: (list(str)) -> object
-        return [dataset.DataSet (filename) for filename in list_file_names]
-
-    def hello_world (self):
-        print ("Waiting for request...")
-        request = socket_operations.recv (self.receiver)
-        print ("Sending answer...")
-        socket_operations.send (self.sender, request + "I'm the worker")
-
-parser = argparse.ArgumentParser (
-    description = "Optigrape worker"
-)
-command_line_arguments.argument_server (parser)
-command_line_arguments.argument_sink (parser)
-command_line_arguments.argument_ventilator (parser)
-command_line_arguments.data_set (parser)
-args = parser.parse_args ()
-worker = Worker (args)
-worker.loop ()
+        heartbeats = threading.Thread (target = self.send_heartbeats, name = 'heartbeat')
+        heartbeats.daemon = True
+        heartbeats.start ()
+        while True:
+            socket_operations.send (self.receiver, {
+                'ready': True,
+                'worker': self.name,
+                'cache': self.executor.cache.statistics (),
+                'send': self.last_send,
+            })
+            task = socket_operations.recv (self.receiver)
+            received = time.time ()
+            if 'stop' in task:
+                break
+            answer = {
+                'id': task ['id'],
+                'worker': self.name,
+                'dispatched': task ['dispatched'],
+            }
+            self.task = task
+            start = time.time ()
+            try:
+                answer.update (self.perform (task))
+                answer ['seconds'] = time.time () - start
+            except Exception:
+                answer ['error'] = traceback.format_exc ()
+            self.task = None
+            answer ['cache'] = self.executor.cache.statistics ()
+            sent_bytes = socket_operations.transferred (self.sender, socket_operations.SENT)
+            answer ['sent'] = time.time ()
+            # a duration on the clock of this host, which may not be synchronised with the clock of the master
+            answer ['held'] = answer ['sent'] - received
+            socket_operations.send (self.sender, answer)
+            self.last_send = {
+                'seconds': time.time () - answer ['sent'],
+                'bytes': socket_operations.transferred (self.sender, socket_operations.SENT) - sent_bytes,
+            }
+        self.stopped.set ()
+        heartbeats.join ()
+        self.receiver.close ()
+        self.sender.close ()
+        self.data_client.close ()
+
+    def perform (self, task):
+        """
+        Perform a task, in a child process if it has a time limit.
+        :return: a dictionary with the rows of the task and the time of its phases, or with the error that occurred.
+        """
+        start = time.time ()
+        algorithm = self.executor.prepare (task)
+        prepare = time.time () - start
+        if task ['time_limit'] is None:
+            result = _run_repeat (algorithm, task)
+            result ['phases']['prepare'] = prepare
+            return result
+        receiver, sender = multiprocessing.Pipe (False)
+        process = multiprocessing.Process (target = _run_task, args = (algorithm, task, sender))
+        process.start ()
+        sender.close ()
+        try:
+            if not receiver.poll (task ['time_limit']):
+                return {
+                    'error': 'Task exceeded the time limit of {0} seconds'.format (task ['time_limit']),
+                    'timeout': True,
+                }
+            try:
+                result = receiver.recv ()
+                result.get ('phases', {})['prepare'] = prepare
+                return result
+            except EOFError:
+                return {'error': 'Task process exited with code {0}'.format (process.exitcode)}
+        finally:
+            if process.is_alive ():
+                process.terminate ()
+            process.join ()
+            receiver.close ()
+
+    def send_heartbeats (self):
+        """
+        Tell the master periodically that this worker is alive, and the task it is performing, if any.
+        Runs in a thread with its own socket, as sockets cannot be shared between threads.
+        """
+        sender = socket_operations.connect_endpoint (zmq.PUSH, self.sink)
+        while not self.stopped.wait (self.heartbeat):
+            task = self.task
+            socket_operations.send (sender, {
+                'heartbeat': True,
+                'ids': [] if task is None else [task ['id']],
+                'worker': self.name,
+                'cache': self.executor.cache.statistics (),
+            })
+        sender.close ()
+
+    def fetch_samples (self, task):
+        """
+        Get the samples of a task that are not in the cache.
+        :rtype: dataset.Samples
+        """
+        data_sets = task ['run'][1]
+        if self.data_source == "file" and os.path.exists (data_sets):
+            if dataset.data_sets_id (data_sets, task ['data_type']) == task ['data_sets_id']:
+                return dataset.Samples (dataset.load_data_sets (data_sets, task ['data_type'], self.cache_directory))
+            print ("[W] The contents of data sets {0} differ from the master's".format (data_sets))
+        print ("Requesting data sets {0} from the master...".format (data_sets))
+        socket_operations.send (self.data_client, {'data_sets_id': task ['data_sets_id'], 'worker': self.name})
+        message = socket_operations.recv (self.data_client)
+        if 'error' in message:
+            raise Exception ('[E] {}'.format (message ['error']))
+        return campaign.samples_from_message (message)
+
+def _run_repeat (algorithm, task):
+    """
+    Perform a task with the algorithm returned by Executor.prepare.
+    :return: a dictionary with the rows of the task and the wall time of each phase recorded by the algorithm profiler.
+    """
+    records = algorithm.profiler.records
+    mark = len (records)
+    repeats = algorithm.run_repeat (task ['fraction_test'], task ['index_repeat'])
+    phases = {}
+    for record in records [mark:]:
+        phases [record ['phase']] = phases.get (record ['phase'], 0.0) + record ['wall.time']
+    # the records are not written by workers, so they are dropped to keep memory bounded
+    del records [mark:]
+    return {'repeats': repeats, 'phases': phases}
+
+def _run_task (algorithm, task, connection):
+    """
+    Perform a task in the child process of a worker and send the result to the worker.
+    """
+    try:
+        result = _run_repeat (algorithm, task)
+    except Exception:
+        result = {'error': traceback.format_exc ()}
+    connection.send (result)
+    connection.close ()
+
+def parse_arguments ():
+    parser = argparse.ArgumentParser (
+        description = "Optigrape worker"
+    )
+    command_line_arguments.argument_server (parser)
+    command_line_arguments.argument_sink (parser)
+    command_line_arguments.argument_ventilator (parser)
+    command_line_arguments.argument_data_server (parser)
+    command_line_arguments.argument_ipc (parser)
+    command_line_arguments.cache_directory (parser)
+    command_line_arguments.argument_data_source (parser)
+    command_line_arguments.argument_cache_memory (parser)
+    command_line_arguments.argument_heartbeat (parser)
+    command_line_arguments.arguments_sockets (parser)
+    return parser.parse_args ()
+
+if __name__ == '__main__':
+    worker = Worker (parse_arguments ())
+    worker.loop ()
@@ -0,0 +1,72 @@
+#!/usr/bin/python
+
+import argparse
+import yaml
+
+import classifier.dataset
+import classifier.dataset_cache
+
+WARM = 'warm'
+PURGE = 'purge'
+
+def main ():
+    args = parse_arguments ()
+    cache_directory = classifier.dataset_cache.NEXT_TO_FILE if args.cache is None else args.cache
+    if args.command == WARM:
+        for a_data_sets_file in args.FILE:
+            classifier.dataset.load_data_sets (a_data_sets_file, args.data_type, cache_directory)
+    elif args.command == PURGE:
+        count = 0
+        for a_data_set_file in list_data_set_files (args.FILE):
+            count += classifier.dataset_cache.remove (
+                a_data_set_file,
+                classifier.dataset.DATA_TYPES.keys (),
+                cache_directory)
+        print ('Deleted {} cache files'.format (count))
+
+def list_data_set_files (list_data_sets_files):
+    """
+    Return the data set files mentioned in the given .dataset files, without repetitions.
+    """
+    result = []
+    for a_data_sets_file in list_data_sets_files:
+        with open (a_data_sets_file, 'r') as fd:
+            dictionary = yaml.safe_load (fd)
+        for d in dictionary ['datasets']:
+            if d ['filename'] not in result:
+                result.append (d ['filename'])
+    return result
+
+def parse_arguments ():
+    parser = argparse.ArgumentParser (
+        description = 'Pre-warm or purge the binary cache of the data set files used by the classifier algorithms.'
+    )
+    parser.add_argument (
+        'command',
+        choices = [WARM, PURGE],
+        help = 'warm parses the data set files and saves them in the cache, purge deletes their cache files'
+    )
+    parser.add_argument (
+        'FILE',
+        type = str,
+        nargs = '+',
+        help = '.dataset file listing the data set files to process'
+    )
+    parser.add_argument (
+        '--cache',
+        type = str,
+        metavar = 'DIRECTORY',
+        default = None,
+        help = 'cache directory.  By default, cache files are placed next to each data set file.'
+    )
+    parser.add_argument (
+        '--data-type',
+        type = str,
+        choices = sorted (classifier.dataset.DATA_TYPES.keys ()),
+        default = classifier.dataset.DATA_TYPE,
+        help = 'floating point type of the cached rows (only used by warm, purge deletes all types)'
+    )
+    return parser.parse_args ()
+
+if __name__ == '__main__':
+    main ()
@@ -1,30 +1,221 @@
-import pickle
+"""
+Sockets used by the master and the workers, and the format of the messages they exchange.
+
+A message is a Python object.  It is sent as a multipart message whose first frame is the pickled object, where each
+numpy array of at least MINIMUM_BUFFER_SIZE bytes is replaced by a reference to one of the following frames.  These
+frames hold the raw array data, which is not copied when sending, and the arrays are rebuilt on top of the received
+frames with numpy.frombuffer, so they are read-only.  Arrays of objects, structured arrays and small arrays are pickled
+as any other Python object.  A message without arrays is a single pickled frame, as in previous versions.
+
+The number of bytes sent and received through each socket, counting all frames, is returned by function transferred.
+
+All sockets are created by a shared context, which can be tuned with function configure before creating the first
+socket: number of I/O threads, send and receive high-water marks, linger period and TCP keepalive.  Sockets are pooled
+per thread, socket type and endpoint, so that asking again for the socket of an endpoint returns the open socket
+instead of creating a new one.  A socket that is closed is removed from the pool when it is asked for again.  The
+sockets left in the pool are closed when the interpreter exits.
+"""
+
+import atexit
+import collections
+import io
+import numpy
+import threading
+import weakref
 import zmq
 
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
 context = zmq.Context ()
 
+"""Options set on each socket that is created, see function configure."""
+_socket_options = {}
+
+"""Open sockets, indexed by thread identifier, socket type, endpoint and whether the socket is bound or connected."""
+_pool = {}
+
+"""Bytes sent and received through each socket, indexed by SENT and RECEIVED.  Each socket is used by a single thread."""
+_traffic = weakref.WeakKeyDictionary ()
+
+"""Directions of the counts returned by function transferred."""
+SENT = 'sent'
+RECEIVED = 'received'
+
+"""Minimum size in bytes of the arrays sent in their own frame.  Smaller arrays are cheaper to pickle than to send in a frame."""
+MINIMUM_BUFFER_SIZE = 1 << 16
+
 def connect (type, server, port):
-    result = context.socket (type)
-    result.connect ("tcp://{0}:{1}".format (server, port))
-    return result
+    return connect_endpoint (type, "tcp://{0}:{1}".format (server, port))
 
 def bind (type, port):
-    result = context.socket (type)
-    result.bind ("tcp://*:{0}".format (port))
+    return bind_endpoint (type, "tcp://*:{0}".format (port))
+
+def connect_endpoint (type, endpoint):
+    return _pooled (type, endpoint, False)
+
+def bind_endpoint (type, endpoint):
+    return _pooled (type, endpoint, True)
+
+def configure (io_threads = None, send_hwm = None, receive_hwm = None, linger = None, tcp_keepalive = None):
+    """
+    Configure the context and the sockets created after this call.  Options that are None keep the ZeroMQ default.
+    :param io_threads: number of I/O threads of the context, which can only be changed before creating sockets.
+    :param send_hwm: maximum number of outgoing messages queued per peer before sending blocks or drops messages.
+    :param receive_hwm: maximum number of incoming messages queued per peer.
+    :param linger: milliseconds that pending messages are kept after closing a socket, -1 to wait forever.
+    :param tcp_keepalive: seconds of idleness, and between probes, before TCP keepalive probes detect a dead peer.
+    """
+    if io_threads is not None and io_threads != context.get (zmq.IO_THREADS):
+        if len (_pool) > 0:
+            raise Exception ('[E] The number of I/O threads cannot be changed after creating sockets')
+        context.set (zmq.IO_THREADS, io_threads)
+    _socket_options.clear ()
+    if send_hwm is not None:
+        _socket_options [zmq.SNDHWM] = send_hwm
+    if receive_hwm is not None:
+        _socket_options [zmq.RCVHWM] = receive_hwm
+    if linger is not None:
+        _socket_options [zmq.LINGER] = linger
+    if tcp_keepalive is not None:
+        _socket_options [zmq.TCP_KEEPALIVE] = 1
+        _socket_options [zmq.TCP_KEEPALIVE_IDLE] = tcp_keepalive
+        _socket_options [zmq.TCP_KEEPALIVE_INTVL] = tcp_keepalive
+
+def configure_from_arguments (args):
+    """
+    Configure the context and the sockets with the options added by function command_line_arguments.arguments_sockets.
+    """
+    configure (args.io_threads, args.send_hwm, args.receive_hwm, args.linger, args.tcp_keepalive)
+
+def close_all ():
+    """
+    Close the sockets in the pool.
+    """
+    for a_socket in _pool.values ():
+        a_socket.close ()
+    _pool.clear ()
+
+# sockets still open when the modules are torn down fail in their destructor
+atexit.register (close_all)
+
+def _pooled (type, endpoint, bound):
+    key = (threading.current_thread ().ident, type, endpoint, bound)
+    result = _pool.get (key)
+    if result is None or result.closed:
+        result = context.socket (type)
+        for option, value in _socket_options.items ():
+            result.setsockopt (option, value)
+        if bound:
+            result.bind (endpoint)
+        else:
+            result.connect (endpoint)
+        _pool [key] = result
     return result
 
-def send (socket, data):
-    data_bytes = pickle.dumps (data, -1)
-    socket.send (data_bytes)
+def endpoint (server, port, ipc, name):
+    """
+    Compute the endpoint of a socket.
+    :param server: the host, or * to bind on all interfaces.
+    :param ipc: path prefix of inter-process endpoints, or None to use TCP.
+    :param name: the socket name, used in inter-process endpoints.
+    :return: ipc://IPC.NAME if ipc is given, otherwise tcp://SERVER:PORT.
+    """
+    if ipc is None:
+        return "tcp://{0}:{1}".format (server, port)
+    else:
+        return "ipc://{0}.{1}".format (ipc, name)
 
-def recv (socket):
+def send (socket, data, zero_copy = True):
+    """
+    Send a message.
+    :param zero_copy: whether large numpy arrays are sent in their own frames.  Otherwise the message is pickled in a single frame.
     """
+    if not zero_copy:
+        frame = pickle.dumps (data, -1)
+        _count (socket, SENT, len (frame))
+        socket.send (frame)
+        return
+    buffers = []
+    def persistent_id (an_object):
+        if isinstance (an_object, numpy.ndarray) and is_buffer_array (an_object):
+            buffers.append (numpy.ascontiguousarray (an_object))
+            return len (buffers) - 1, an_object.dtype.str, an_object.shape
+        return None
+    header = io.BytesIO ()
+    pickler = pickle.Pickler (header, -1)
+    pickler.persistent_id = persistent_id
+    pickler.dump (data)
+    frame = header.getvalue ()
+    _count (socket, SENT, len (frame) + sum (a_buffer.nbytes for a_buffer in buffers))
+    if len (buffers) == 0:
+        socket.send (frame)
+    else:
+        socket.send (frame, zmq.SNDMORE)
+        for a_buffer in buffers [:-1]:
+            socket.send (a_buffer, zmq.SNDMORE, copy = False)
+        socket.send (buffers [-1], copy = False)
 
+def recv (socket):
+    """
+    Receive a message sent by function send.
     :rtype: object
     """
-    data_bytes = socket.recv ()
-    data = pickle.loads (data_bytes)
-    return data
+    frames = socket.recv_multipart (copy = False)
+    _count (socket, RECEIVED, sum (len (frame) for frame in frames))
+    return _load (frames)
+
+def send_to (socket, identity, data):
+    """
+    Send a message through a router socket to the peer with the given identity.
+    """
+    _count (socket, SENT, len (identity))
+    socket.send (identity, zmq.SNDMORE)
+    send (socket, data)
+
+def recv_from (socket):
+    """
+    Receive a message sent by function send through a router socket.
+    :return: a tuple with the identity of the peer that sent the message and the message.
+    """
+    frames = socket.recv_multipart (copy = False)
+    _count (socket, RECEIVED, sum (len (frame) for frame in frames))
+    return frames [0].bytes, _load (frames [1:])
+
+def transferred (socket, direction):
+    """
+    Return the number of bytes sent or received through a socket.
+    :param direction: SENT or RECEIVED.
+    """
+    return _traffic.get (socket, {}).get (direction, 0)
+
+def _count (socket, direction, size):
+    counts = _traffic.get (socket)
+    if counts is None:
+        counts = _traffic [socket] = collections.Counter ()
+    counts [direction] += size
+
+def _load (frames):
+    if len (frames) == 1:
+        return pickle.loads (frames [0].bytes)
+    def persistent_load (persistent_id):
+        index, dtype, shape = persistent_id
+        return numpy.frombuffer (frames [index + 1], dtype = dtype).reshape (shape)
+    unpickler = pickle.Unpickler (io.BytesIO (frames [0].bytes))
+    unpickler.persistent_load = persistent_load
+    return unpickler.load ()
+
+def is_buffer_array (array):
+    # type: (numpy.ndarray) -> bool
+    """
+    Check if an array is sent in its own frame.
+    """
+    return type (array) is numpy.ndarray and \
+        not array.dtype.hasobject and \
+        array.dtype.fields is None and \
+        array.nbytes >= MINIMUM_BUFFER_SIZE
 
 def send_recv (socket, data):
     send (socket, data)
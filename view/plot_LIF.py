@@ -3,6 +3,7 @@ from __future__ import print_function
 import argparse
 import matplotlib
 import matplotlib.pyplot
+import numpy
 import os.path
 
 import classifier.dataset
@@ -26,12 +27,9 @@ def main ():
     for a_label, a_data_set in zip (labels, args.data_set):
         single_axes = new_figure (a_label)
         d = classifier.dataset.DataSet (a_data_set, a_label)
-        xs = []
-        ys = []
-        for row in d.rows:
-            xs.extend (WAVE_LENGTHS)
-            ys.extend (row)
-        max_y = max ([max_y, max (ys)])
+        xs = numpy.tile (WAVE_LENGTHS, d.rows.shape [0])
+        ys = d.rows.ravel ()
+        max_y = max ([max_y, ys.max ()])
         pc = compare_axes.scatter (xs, ys, marker = '.', label = a_label, alpha = 0.25)
         single_axes.scatter (xs, ys, marker = '.', label = a_label, alpha = 0.25, c = pc.get_facecolor ())
         single_axes.set_title(a_label, fontsize = 24)
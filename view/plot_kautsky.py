@@ -6,6 +6,7 @@ from __future__ import print_function
 import argparse
 import matplotlib
 import matplotlib.pyplot
+import numpy
 import os.path
 import sys
 
@@ -42,15 +43,12 @@ def main ():
     for a_label, a_data_set in zip (labels, args.data_set):
         single_axes = new_figure (a_label)
         d = classifier.dataset.DataSet (a_data_set, a_label, has_header = args.with_header)
-        xs = []
-        ys = []
-        for row in d.rows:
-            if args.timestamps == TS_DEFAULT:
-                xs.extend (TIMESTAMPs)
-            elif args.timestamps == TS_ABSTRACT:
-                xs.extend ([t for t in range (len (row))])
-            ys.extend (row)
-        max_y = max ([max_y, max (ys)])
+        if args.timestamps == TS_DEFAULT:
+            xs = numpy.tile (TIMESTAMPs, d.rows.shape [0])
+        elif args.timestamps == TS_ABSTRACT:
+            xs = numpy.tile (numpy.arange (d.rows.shape [1]), d.rows.shape [0])
+        ys = d.rows.ravel ()
+        max_y = max ([max_y, ys.max ()])
         pc = compare_axes.scatter (xs, ys, marker = '.', label = a_label, alpha = 0.25)
         single_axes.scatter (xs, ys, marker = '.', label = a_label, alpha = 0.25, c = pc.get_facecolor ())
         single_axes.set_title(a_label, fontsize = 24)